@@ -0,0 +1,184 @@
+"""
+Admission Control for ReadyReserve AI Chatbot
+Per-client token buckets and a bounded queue in front of the upstream work, so
+overload is refused quickly instead of timing out
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import Counter, OrderedDict
+
+# Weight of the newest sample in the moving average of slot hold times
+HOLD_TIME_SMOOTHING = 0.2
+
+
+class AdmissionRejected(Exception):
+    """A request refused by admission control, with the HTTP status and Retry-After to send"""
+
+    def __init__(self, status_code, detail, retry_after):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+    def headers(self):
+        return {"Retry-After": str(self.retry_after)}
+
+
+class RateLimiter:
+    """Token bucket per client key, refilled at rate tokens per second up to burst
+
+    Buckets are kept in last-used order and the least recently used are dropped
+    past max_clients; a dropped client simply starts again with a full bucket.
+    """
+
+    def __init__(self, rate=1.0, burst=10, max_clients=100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self.limited = 0
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def check(self, *keys, amount=1):
+        """Take amount tokens from every key's bucket, or raise AdmissionRejected (429) if any is short"""
+        self.charge(dict.fromkeys(keys, amount))
+
+    def charge(self, amounts):
+        """Take amounts[key] tokens from each key's bucket, or raise AdmissionRejected (429) if any is short
+
+        Either every bucket is charged or none is. A charge larger than burst
+        goes through on a full bucket and leaves it in debt, so big batches
+        are slowed down rather than refused forever.
+        """
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        buckets = {}
+        shortfall = 0.0
+        for key, amount in amounts.items():
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            buckets[key] = tokens
+            shortfall = max(shortfall, min(amount, self.burst) - tokens)
+        charged = shortfall <= 0
+        for key, tokens in buckets.items():
+            self._buckets[key] = (tokens - amounts[key] if charged else tokens, now)
+            self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        if not charged:
+            self.limited += 1
+            raise AdmissionRejected(429, "Too many requests", math.ceil(shortfall / self.rate))
+
+
+class Ticket:
+    """A held work slot; release() is idempotent so every exit path may call it"""
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.started = time.monotonic()
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.controller._release(self)
+
+
+class AdmissionController:
+    """Bounded concurrency for upstream work with a bounded wait queue
+
+    Up to max_active requests run at once. Up to max_queue more wait, each for
+    at most queue_timeout seconds; anything beyond that is refused immediately
+    with 503. Retry-After is estimated from the queue depth and the average time
+    a slot is held.
+    """
+
+    def __init__(self, max_active=64, max_queue=256, queue_timeout=10.0, rate_limiter=None):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.rate_limiter = rate_limiter or RateLimiter(rate=0)
+        self._semaphore = asyncio.Semaphore(max_active)
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed = 0  # queue full; timeouts are counted in timed_out
+        self.timed_out = 0
+        self.hold_time = 1.0
+
+    @classmethod
+    def from_env(cls):
+        """Build from CHATBOT_MAX_ACTIVE_CHATS / CHATBOT_MAX_QUEUED_CHATS / CHATBOT_QUEUE_TIMEOUT
+        and CHATBOT_RATE_LIMIT / CHATBOT_RATE_BURST (per-client requests per second; 0 disables)"""
+        return cls(
+            max_active=int(os.getenv("CHATBOT_MAX_ACTIVE_CHATS", "64")),
+            max_queue=int(os.getenv("CHATBOT_MAX_QUEUED_CHATS", "256")),
+            queue_timeout=float(os.getenv("CHATBOT_QUEUE_TIMEOUT", "10")),
+            rate_limiter=RateLimiter(
+                rate=float(os.getenv("CHATBOT_RATE_LIMIT", "0")),
+                burst=int(os.getenv("CHATBOT_RATE_BURST", "10")),
+            ),
+        )
+
+    def check_rate(self, client_keys, amount=1):
+        """Charge amount requests to each of a client's keys, raising AdmissionRejected (429) over any limit"""
+        self.rate_limiter.check(*client_keys, amount=amount)
+
+    def check_rate_batch(self, client_keys):
+        """Charge one request per item of a batch (an iterable of each item's keys) in one all-or-nothing step"""
+        self.rate_limiter.charge(Counter(key for keys in client_keys for key in keys))
+
+    def retry_after(self):
+        """Seconds until a slot is likely to free up for a new request"""
+        backlog = self.waiting + 1
+        return max(1, math.ceil(self.hold_time * backlog / self.max_active))
+
+    def _busy(self):
+        return AdmissionRejected(503, "Server busy, please retry", self.retry_after())
+
+    async def acquire(self):
+        """Wait for a work slot and return its Ticket, or raise AdmissionRejected (503)"""
+        if self._semaphore.locked():
+            if self.waiting >= self.max_queue:
+                self.shed += 1
+                raise self._busy()
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                raise self._busy() from None
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self.active += 1
+        self.admitted += 1
+        return Ticket(self)
+
+    def _release(self, ticket):
+        self.active -= 1
+        held = time.monotonic() - ticket.started
+        self.hold_time += HOLD_TIME_SMOOTHING * (held - self.hold_time)
+        self._semaphore.release()
+
+    def stats(self):
+        """Return admission counters"""
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_active": self.max_active,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "queue_timeouts": self.timed_out,
+            "rate_limited": self.rate_limiter.limited,
+            "hold_time": round(self.hold_time, 3),
+        }
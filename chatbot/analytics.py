@@ -0,0 +1,355 @@
+"""
+Chat Analytics for ReadyReserve AI Chatbot
+Records every chat exchange through a bounded in-process queue, written in
+batches by a background task so requests never wait on the sink
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from datetime import datetime, timezone
+
+import httpx
+
+logger = logging.getLogger("uvicorn.error")
+
+# What happens to a new record when the queue is full
+DROP_NEWEST = "drop_newest"  # discard the new record
+DROP_OLDEST = "drop_oldest"  # discard the oldest queued record to make room
+BLOCK = "block"  # make the request wait for room, up to block_timeout, then discard
+POLICIES = (DROP_NEWEST, DROP_OLDEST, BLOCK)
+
+
+class JSONLSink:
+    """Appends records to a file, one JSON object per line"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, records):
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write("".join(json.dumps(record, default=str) + "\n" for record in records))
+
+    def close(self):
+        pass
+
+
+class SQLiteSink:
+    """Inserts records into a chat_transcripts table of a local SQLite file"""
+
+    COLUMNS = (
+        "created_at", "endpoint", "tenant", "user_id", "session_id", "status", "source", "question",
+        "answer", "faq_matches", "latency_ms", "prompt_tokens", "completion_tokens", "error",
+    )
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.executescript("""
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS chat_transcripts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at TEXT NOT NULL,
+                    endpoint TEXT,
+                    tenant TEXT,
+                    user_id TEXT,
+                    session_id TEXT,
+                    status TEXT NOT NULL,
+                    source TEXT,
+                    question TEXT,
+                    answer TEXT,
+                    faq_matches TEXT,
+                    latency_ms REAL,
+                    prompt_tokens INTEGER,
+                    completion_tokens INTEGER,
+                    error TEXT
+                );
+            """)
+        return self._connection
+
+    def write(self, records):
+        rows = [
+            tuple(
+                json.dumps(record[column]) if column == "faq_matches" else record.get(column)
+                for column in self.COLUMNS
+            )
+            for record in records
+        ]
+        connection = self._connect()
+        with connection:
+            connection.executemany(
+                f"INSERT INTO chat_transcripts ({', '.join(self.COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in self.COLUMNS)})",
+                rows,
+            )
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def as_uuid(value):
+    try:
+        return str(uuid.UUID(str(value)))
+    except ValueError:
+        return None
+
+
+class SupabaseSink:
+    """Writes exchanges to the automation_logs table and chat counts to automation_usage
+
+    Both tables require a user_id UUID. Records whose user_id is not one are
+    attributed to anonymous_user_id, or skipped when that is not set. Requests
+    go through the PostgREST API with the service role key: one insert into
+    automation_logs per batch, and one call to the increment_chat_usage
+    function, which adds the batch's counts to the single usage row per user
+    and month.
+    """
+
+    def __init__(self, url, service_key, anonymous_user_id=None, timeout=10.0):
+        self.url = url.rstrip("/")
+        self.anonymous_user_id = as_uuid(anonymous_user_id) if anonymous_user_id else None
+        self.skipped = 0
+        self._client = httpx.Client(
+            timeout=timeout,
+            headers={
+                "apikey": service_key,
+                "Authorization": f"Bearer {service_key}",
+                "Content-Type": "application/json",
+                "Prefer": "return=minimal",
+            },
+        )
+
+    def _post(self, path, body):
+        response = self._client.post(f"{self.url}/rest/v1/{path}", json=body)
+        response.raise_for_status()
+
+    def write(self, records):
+        logs = []
+        usage = {}
+        for record in records:
+            user_id = as_uuid(record.get("user_id")) or self.anonymous_user_id
+            if user_id is None:
+                self.skipped += 1
+                continue
+            logs.append({
+                "user_id": user_id,
+                "status": record["status"],
+                "message": record["question"],
+                "input_data": {
+                    "endpoint": record["endpoint"],
+                    "tenant": record["tenant"],
+                    "session_id": record["session_id"],
+                    "question": record["question"],
+                    "faq_matches": record["faq_matches"],
+                },
+                "output_data": {
+                    "source": record["source"],
+                    "answer": record["answer"],
+                    "prompt_tokens": record["prompt_tokens"],
+                    "completion_tokens": record["completion_tokens"],
+                    "error": record["error"],
+                },
+                "duration_ms": round(record["latency_ms"]),
+                "created_at": record["created_at"],
+            })
+            month = record["created_at"][:7]
+            usage[(user_id, month)] = usage.get((user_id, month), 0) + 1
+        if logs:
+            self._post("automation_logs", logs)
+            self._post("rpc/increment_chat_usage", {"_usage": [
+                {"user_id": user_id, "month": month, "tasks_count": count}
+                for (user_id, month), count in usage.items()
+            ]})
+
+    def close(self):
+        self._client.close()
+
+
+def sink_from_env():
+    """Build the sink named by CHATBOT_ANALYTICS_SINK: jsonl:<path>, sqlite:<path> or supabase (None if unset)"""
+    spec = os.getenv("CHATBOT_ANALYTICS_SINK", "").strip()
+    if not spec:
+        return None
+    kind, _, path = spec.partition(":")
+    if kind == "jsonl" and path:
+        return JSONLSink(path)
+    if kind == "sqlite" and path:
+        return SQLiteSink(path)
+    if kind == "supabase":
+        return SupabaseSink(
+            os.environ["SUPABASE_URL"],
+            os.environ["SUPABASE_SERVICE_ROLE_KEY"],
+            anonymous_user_id=os.getenv("CHATBOT_ANALYTICS_ANONYMOUS_USER_ID") or None,
+        )
+    raise ValueError(f"Unknown CHATBOT_ANALYTICS_SINK: {spec}")
+
+
+class AnalyticsWriter:
+    """Queues chat records and writes them to a sink in batches from a background task
+
+    record() never touches the sink. The writer flushes once batch_size
+    records are waiting or flush_interval seconds after the first record of a
+    batch, whichever comes first, running the sink in a thread. A full queue
+    applies the configured policy; a failed write is logged and its records
+    counted as failed. close() stops accepting records and writes everything
+    still queued before returning.
+    """
+
+    def __init__(self, sink=None, max_queue=10000, batch_size=100, flush_interval=1.0,
+                 policy=DROP_NEWEST, block_timeout=0.05):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown analytics queue policy: {policy}")
+        self.sink = sink
+        self.max_queue = max_queue
+        self.batch_size = min(batch_size, max_queue)
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self._queue = asyncio.Queue(max_queue)
+        self._task = None
+        self._wake = asyncio.Event()  # set by the first record of a batch, a full batch and close()
+        self._closed = False
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+
+    @classmethod
+    def from_env(cls):
+        """Build from CHATBOT_ANALYTICS_SINK / CHATBOT_ANALYTICS_QUEUE_SIZE / CHATBOT_ANALYTICS_BATCH_SIZE /
+        CHATBOT_ANALYTICS_FLUSH_INTERVAL / CHATBOT_ANALYTICS_POLICY / CHATBOT_ANALYTICS_BLOCK_TIMEOUT"""
+        return cls(
+            sink_from_env(),
+            max_queue=int(os.getenv("CHATBOT_ANALYTICS_QUEUE_SIZE", "10000")),
+            batch_size=int(os.getenv("CHATBOT_ANALYTICS_BATCH_SIZE", "100")),
+            flush_interval=float(os.getenv("CHATBOT_ANALYTICS_FLUSH_INTERVAL", "1")),
+            policy=os.getenv("CHATBOT_ANALYTICS_POLICY", DROP_NEWEST),
+            block_timeout=float(os.getenv("CHATBOT_ANALYTICS_BLOCK_TIMEOUT", "0.05")),
+        )
+
+    @property
+    def enabled(self):
+        return self.sink is not None
+
+    def start(self):
+        """Start the background writer (in the worker's event loop)"""
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def record(self, record):
+        """Queue a record; returns at once unless the policy is block and the queue is full"""
+        if not self.enabled or self._closed:
+            return
+        self.recorded += 1
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            if self.policy == DROP_OLDEST:
+                self._queue.get_nowait()
+                self._queue.put_nowait(record)
+                self.dropped += 1
+            elif self.policy == BLOCK:
+                try:
+                    await asyncio.wait_for(self._queue.put(record), self.block_timeout)
+                except asyncio.TimeoutError:
+                    self.dropped += 1
+                    return
+            else:
+                self.dropped += 1
+                return
+        if self._queue.qsize() == 1 or self._queue.qsize() >= self.batch_size:
+            self._wake.set()
+
+    def _write(self, batch):
+        try:
+            self.sink.write(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error("Writing %d analytics records failed: %s", len(batch), e)
+            return
+        self.written += len(batch)
+        self.batches += 1
+
+    async def _run(self):
+        while True:
+            if self._queue.empty():
+                if self._closed:
+                    return
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            # A batch has started: give it until it is full, the interval has passed or the writer closes
+            if self._queue.qsize() < self.batch_size and not self._closed:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            batch = [self._queue.get_nowait() for _ in range(min(self.batch_size, self._queue.qsize()))]
+            await asyncio.to_thread(self._write, batch)
+
+    async def close(self, timeout=10.0):
+        """Stop accepting records, write everything still queued and close the sink"""
+        if not self.enabled or self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        # The task is never cancelled, so a batch is not abandoned halfway through a write
+        done, _ = await asyncio.wait({self._task}, timeout=timeout)
+        if not done:
+            logger.error("Analytics flush on shutdown timed out; %d records not written", self._queue.qsize())
+            return
+        await asyncio.to_thread(self.sink.close)
+
+    def stats(self):
+        """Return queue and write counters"""
+        return {
+            "enabled": self.enabled,
+            "sink": type(self.sink).__name__ if self.sink else None,
+            "policy": self.policy,
+            "queued": self._queue.qsize(),
+            "max_queue": self.max_queue,
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+
+def chat_record(endpoint, tenant, request, started, status="success", source=None, answer=None,
+                faq_matches=None, prompt_tokens=0, completion_tokens=0, error=None):
+    """Build the analytics record of one chat exchange; the question is the request's last message"""
+    question = request.messages[-1].content if request.messages else ""
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "endpoint": endpoint,
+        "tenant": tenant,
+        "user_id": request.user_id,
+        "session_id": request.session_id,
+        "status": status,
+        "source": source,
+        "question": question,
+        "answer": answer,
+        "faq_matches": [
+            {key: match[key] for key in ("category", "question", "score", "confidence", "similarity") if key in match}
+            for match in faq_matches or []
+        ],
+        "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "error": error,
+    }
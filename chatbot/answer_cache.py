@@ -0,0 +1,209 @@
+"""
+Answer Cache for ReadyReserve AI Chatbot
+In-process LRU + TTL cache of chat answers keyed by normalized conversation and knowledge version
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+TRAILING_PUNCTUATION = " ?!.,;:"
+
+# Minimum seconds between sweeps of expired answers out of the shared backend
+SWEEP_INTERVAL = 60.0
+
+
+def normalize_text(text):
+    """Normalize a message so trivially different phrasings share a cache key"""
+    return WHITESPACE_PATTERN.sub(" ", text.lower()).strip(TRAILING_PUNCTUATION)
+
+
+def conversation_key(messages, version):
+    """Return the cache key for a conversation under a knowledge version"""
+    normalized = [(message["role"], normalize_text(message["content"])) for message in messages]
+    payload = json.dumps([version, normalized], separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SQLiteCacheBackend:
+    """Shares cached answers between worker processes through a local SQLite file
+
+    Values are stored as JSON with their expiry time. Keys already include the
+    knowledge version, so entries written under an old version are never read
+    again; expired rows are deleted at most once per SWEEP_INTERVAL. Like the
+    session backend, the database is opened on first use so each forked worker
+    gets its own connection.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = None
+        self._lock = asyncio.Lock()
+        self._last_sweep = 0.0
+
+    def _connect(self):
+        if self._connection is not None:
+            return self._connection
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS answer_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+        """)
+        return self._connection
+
+    def _get(self, key):
+        row = self._connect().execute(
+            "SELECT value FROM answer_cache WHERE key = ? AND expires_at >= ?", (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _set(self, key, value, ttl):
+        now = time.time()
+        self._connect()
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO answer_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), now + ttl)
+            )
+            if now - self._last_sweep > SWEEP_INTERVAL:
+                self._last_sweep = now
+                self._connection.execute("DELETE FROM answer_cache WHERE expires_at < ?", (now,))
+
+    async def _run(self, function, *args):
+        # SQLite calls run in a thread, one at a time, off the event loop
+        async with self._lock:
+            return await asyncio.to_thread(function, *args)
+
+    async def get(self, key):
+        return await self._run(self._get, key)
+
+    async def set(self, key, value, ttl):
+        await self._run(self._set, key, value, ttl)
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class AnswerCache:
+    """Bounded LRU cache with per-entry TTL and hit/miss counters
+
+    Entries belong to one knowledge version; switching to a new version with
+    set_version drops everything cached for the old one. Keys carry the
+    version too, so answers finishing under the old version are never served.
+    """
+
+    def __init__(self, max_entries=1024, ttl=3600.0, backend=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend
+        self.version = None
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @classmethod
+    def from_env(cls):
+        """Build a cache from CHATBOT_CACHE_SIZE / CHATBOT_CACHE_TTL; CHATBOT_CACHE_DB shares answers through SQLite"""
+        db_path = os.getenv("CHATBOT_CACHE_DB")
+        return cls(
+            max_entries=int(os.getenv("CHATBOT_CACHE_SIZE", "1024")),
+            ttl=float(os.getenv("CHATBOT_CACHE_TTL", "3600")),
+            backend=SQLiteCacheBackend(db_path) if db_path else None,
+        )
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.ttl > 0
+
+    def set_version(self, version):
+        """Switch to a new knowledge version, dropping the answers cached under the old one"""
+        if version != self.version:
+            self.clear()
+            self.version = version
+
+    def key(self, messages, version):
+        """Return the key for a conversation under a knowledge version"""
+        return conversation_key(messages, version)
+
+    def clear(self):
+        """Drop every local entry"""
+        self._entries.clear()
+
+    def get_local(self, key):
+        """Look up a key in the in-process LRU only"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set_local(self, key, value):
+        """Store a value in the in-process LRU, evicting the least recently used entries"""
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, key):
+        """Return the cached answer for a key, falling back to the shared backend"""
+        if not self.enabled:
+            return None
+        value = self.get_local(key)
+        if value is None and self.backend is not None:
+            value = await self.backend.get(key)
+            if value is not None:
+                self.set_local(key, value)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key, value):
+        """Cache an answer locally and in the shared backend"""
+        if not self.enabled:
+            return
+        self.set_local(key, value)
+        if self.backend is not None:
+            await self.backend.set(key, value, self.ttl)
+
+    def close(self):
+        if self.backend is not None:
+            self.backend.close()
+
+    def stats(self):
+        """Return cache counters"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "shared": self.backend is not None,
+            "version": self.version,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
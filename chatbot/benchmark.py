@@ -0,0 +1,390 @@
+"""
+Load-testing Benchmark for ReadyReserve AI Chatbot
+Drives the chatbot endpoints at fixed concurrency levels and reports throughput
+and latency percentiles (and time to first token for streams) as JSON
+
+By default it starts the stub LLM server (stub_llm.py) and the chatbot against
+it, so a run costs nothing and is repeatable:
+
+    python benchmark.py --endpoints chat,chat-stream --concurrency 1,8,32 --requests 200
+
+Pass --url to benchmark a service that is already running instead, and
+--compare with an earlier results file to see what changed.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+from website_knowledge import get_website_knowledge
+
+CHATBOT_DIR = Path(__file__).resolve().parent
+
+ENDPOINTS = ("chat", "chat-stream", "search-faq", "suggest", "services")
+
+# Seconds to wait for a started server to answer
+STARTUP_TIMEOUT = 30
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return None
+    rank = max(1, int(len(ordered) * fraction + 0.999999))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(seconds):
+    """Latency summary in milliseconds"""
+    ordered = sorted(seconds)
+    if not ordered:
+        return None
+    return {
+        "p50": round(percentile(ordered, 0.50) * 1000, 2),
+        "p95": round(percentile(ordered, 0.95) * 1000, 2),
+        "p99": round(percentile(ordered, 0.99) * 1000, 2),
+        "mean": round(sum(ordered) / len(ordered) * 1000, 2),
+        "max": round(ordered[-1] * 1000, 2),
+    }
+
+
+def faq_questions(knowledge):
+    return [entry["question"] for category in knowledge["faq"] for entry in category["questions"]]
+
+
+def questions(knowledge):
+    """Question templates built from the knowledge base, so retrieval has real work to do"""
+    services = [
+        service["name"]
+        for category in knowledge["service_categories"].values()
+        for service in category["services"]
+    ]
+    templates = [f"How could {name} help a small business like mine?" for name in services]
+    templates += [question.rstrip("?") + ", in more detail?" for question in faq_questions(knowledge)]
+    return templates
+
+
+class Workload:
+    """Builds each request of a scenario
+
+    With distinct set, only that many different questions are asked, so the
+    rest are answer cache hits; otherwise every question is different.
+    """
+
+    def __init__(self, knowledge, distinct=0):
+        self.templates = questions(knowledge)
+        self.distinct = distinct
+        self.faq_questions = faq_questions(knowledge)
+
+    def question(self, number):
+        template = self.templates[number % len(self.templates)]
+        return f"{template} (request {number})"
+
+    def request(self, endpoint, number):
+        """Return (method, path, json body, params) for the numbered request"""
+        if endpoint in ("chat", "chat-stream"):
+            body = {
+                "messages": [{"role": "user", "content": self.question(number)}],
+                "user_id": f"bench-{number}",
+            }
+            return "POST", "/chat" if endpoint == "chat" else "/chat/stream", body, None
+        if endpoint == "search-faq":
+            return "POST", "/search-faq", {"question": self.question(number), "top_k": 5}, None
+        if endpoint == "suggest":
+            question = self.faq_questions[number % len(self.faq_questions)]
+            return "GET", "/faq/suggest", None, {"q": question[:1 + number % 12]}
+        if endpoint == "services":
+            return "GET", "/services", None, None
+        raise ValueError(f"Unknown endpoint: {endpoint}")
+
+
+async def timed_request(client, workload, endpoint, number):
+    """Send one request; return (status or error name, total seconds, seconds to first token)"""
+    method, path, body, params = workload.request(endpoint, number)
+    start = time.perf_counter()
+    first_token = None
+    try:
+        if endpoint != "chat-stream":
+            response = await client.request(method, path, json=body, params=params)
+            await response.aread()
+            return str(response.status_code), time.perf_counter() - start, None
+
+        async with client.stream(method, path, json=body, params=params) as response:
+            if response.status_code != 200:
+                await response.aread()
+                return str(response.status_code), time.perf_counter() - start, None
+            outcome = "200"
+            async for line in response.aiter_lines():
+                if line == "event: token" and first_token is None:
+                    first_token = time.perf_counter() - start
+                elif line == "event: error":
+                    outcome = "stream_error"
+            return outcome, time.perf_counter() - start, first_token
+    except httpx.HTTPError as e:
+        return type(e).__name__, time.perf_counter() - start, None
+
+
+async def run_scenario(client, workload, endpoint, concurrency, requests, duration=None, offset=0):
+    """Keep concurrency requests in flight until requests are sent (or duration seconds pass)"""
+    outcomes = {}
+    latencies = []
+    ttfts = []
+    next_number = 0
+    deadline = time.perf_counter() + duration if duration else None
+
+    def claim():
+        nonlocal next_number
+        if deadline is not None:
+            if time.perf_counter() >= deadline:
+                return None
+        elif next_number >= requests:
+            return None
+        next_number += 1
+        index = next_number - 1
+        return offset + (index % workload.distinct if workload.distinct else index)
+
+    async def user():
+        while (number := claim()) is not None:
+            outcome, seconds, ttft = await timed_request(client, workload, endpoint, number)
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            if outcome == "200":
+                latencies.append(seconds)
+                if ttft is not None:
+                    ttfts.append(ttft)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    sent = sum(outcomes.values())
+    errors = sent - outcomes.get("200", 0)
+    result = {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": sent,
+        "errors": errors,
+        "error_rate": round(errors / sent, 4) if sent else 0.0,
+        "outcomes": outcomes,
+        "duration": round(elapsed, 3),
+        "throughput": round(outcomes.get("200", 0) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": summarize(latencies),
+    }
+    if endpoint == "chat-stream":
+        result["ttft_ms"] = summarize(ttfts)
+    return result
+
+
+def wait_until_up(url, process):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with status {process.returncode} while starting")
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not start within {STARTUP_TIMEOUT}s")
+
+
+class Stack:
+    """The stub LLM server and the chatbot service, started as subprocesses"""
+
+    def __init__(self, args):
+        self.args = args
+        self.processes = []
+        self.workdir = tempfile.TemporaryDirectory(prefix="chatbot-bench-")
+
+    def _start(self, command, env, health_url):
+        log = open(Path(self.workdir.name) / f"{len(self.processes)}.log", "w")
+        process = subprocess.Popen(command, cwd=CHATBOT_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+        self.processes.append(process)
+        try:
+            wait_until_up(health_url, process)
+        except RuntimeError:
+            self.__exit__(None, None, None)
+            raise
+
+    def __enter__(self):
+        args = self.args
+        env = dict(os.environ)
+        stub_env = dict(
+            env,
+            STUB_LLM_PORT=str(args.stub_port),
+            STUB_LLM_LATENCY=str(args.stub_latency),
+            STUB_LLM_JITTER=str(args.stub_jitter),
+            STUB_LLM_TOKEN_RATE=str(args.stub_token_rate),
+            STUB_LLM_TOKENS=str(args.stub_tokens),
+            STUB_LLM_ERROR_RATE=str(args.stub_error_rate),
+            STUB_LLM_SEED=str(args.seed),
+        )
+        self._start([sys.executable, "stub_llm.py"], stub_env, f"http://127.0.0.1:{args.stub_port}/stats")
+
+        # Admission limits stay as configured; per-client rate limiting would only measure the benchmark itself
+        chatbot_env = dict(
+            env,
+            OPENAI_API_KEY="stub",
+            OPENAI_BASE_URL=f"http://127.0.0.1:{args.stub_port}/v1",
+            CHATBOT_HOST="127.0.0.1",
+            CHATBOT_PORT=str(args.port),
+            CHATBOT_WORKERS=str(args.workers),
+            CHATBOT_LOG_LEVEL="warning",
+            CHATBOT_SESSION_DB=str(Path(self.workdir.name) / "sessions.db"),
+            CHATBOT_RATE_LIMIT=env.get("CHATBOT_RATE_LIMIT", "0"),
+        )
+        self._start([sys.executable, "run.py", "--production"], chatbot_env, f"http://127.0.0.1:{args.port}/health")
+        return f"http://127.0.0.1:{args.port}"
+
+    def stub_stats(self):
+        return httpx.get(f"http://127.0.0.1:{self.args.stub_port}/stats").json()
+
+    def __exit__(self, *exc_info):
+        for process in reversed(self.processes):
+            process.terminate()
+            try:
+                process.wait(timeout=STARTUP_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.workdir.cleanup()
+
+
+def git_revision():
+    """The commit under test, marked dirty when the tree has local changes"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=CHATBOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=CHATBOT_DIR, capture_output=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+
+async def benchmark(url, args):
+    workload = Workload(get_website_knowledge(), args.distinct)
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    timeout = httpx.Timeout(args.timeout)
+    results = []
+    offset = 0
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=timeout) as client:
+        for endpoint in args.endpoints:
+            if args.warmup:
+                await run_scenario(client, workload, endpoint, min(args.concurrency), args.warmup, offset=offset)
+                offset += args.warmup
+            for concurrency in args.concurrency:
+                result = await run_scenario(
+                    client, workload, endpoint, concurrency, args.requests, args.duration, offset
+                )
+                # Later scenarios ask new questions so they are not served from the cache
+                offset += result["requests"]
+                results.append(result)
+                print(format_result(result), flush=True)
+    return results
+
+
+def format_result(result):
+    latency = result["latency_ms"] or {}
+    line = (
+        f"{result['endpoint']:<12} c={result['concurrency']:<4} n={result['requests']:<6} "
+        f"{result['throughput']:>9.1f} req/s  errors {result['error_rate']:>6.1%}  "
+        f"p50 {latency.get('p50', 0):>8.1f}  p95 {latency.get('p95', 0):>8.1f}  p99 {latency.get('p99', 0):>8.1f} ms"
+    )
+    if result.get("ttft_ms"):
+        line += f"  ttft p50 {result['ttft_ms']['p50']:.1f} p95 {result['ttft_ms']['p95']:.1f} ms"
+    return line
+
+
+def compare(previous, current):
+    """Print the change in throughput and latency for scenarios both runs measured"""
+    baseline = {(result["endpoint"], result["concurrency"]): result for result in previous["results"]}
+    print(f"\nCompared with {previous.get('commit') or 'baseline'} ({previous.get('timestamp')}):")
+    for result in current["results"]:
+        before = baseline.get((result["endpoint"], result["concurrency"]))
+        if before is None:
+            continue
+        changes = [f"throughput {change(before['throughput'], result['throughput'])}"]
+        for name in ("latency_ms", "ttft_ms"):
+            if before.get(name) and result.get(name):
+                for point in ("p50", "p99"):
+                    changes.append(f"{name[:-3]} {point} {change(before[name][point], result[name][point])}")
+        print(f"  {result['endpoint']:<12} c={result['concurrency']:<4} " + ", ".join(changes))
+
+
+def change(before, after):
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before:+.1%}"
+
+
+def comma_list(convert):
+    return lambda text: [convert(item) for item in text.split(",") if item]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the ReadyReserve AI chatbot service")
+    parser.add_argument("--url", help="Benchmark a running service instead of starting one against the stub")
+    parser.add_argument("--endpoints", type=comma_list(str), default=["chat", "chat-stream"],
+                        help=f"Comma-separated, from: {', '.join(ENDPOINTS)}")
+    parser.add_argument("--concurrency", type=comma_list(int), default=[1, 8, 32],
+                        help="Comma-separated concurrency levels, each run as its own scenario")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--duration", type=float, help="Seconds per scenario (instead of --requests)")
+    parser.add_argument("--warmup", type=int, default=10, help="Untimed requests before each endpoint")
+    parser.add_argument("--distinct", type=int, default=0,
+                        help="Distinct questions per scenario, the rest being repeats (0 = no repeats)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument("--port", type=int, default=9200, help="Port for the started chatbot service")
+    parser.add_argument("--workers", type=int, default=1, help="Workers for the started chatbot service")
+    parser.add_argument("--stub-port", type=int, default=9100)
+    parser.add_argument("--stub-latency", type=float, default=0.3, help="Stub time to first token, seconds")
+    parser.add_argument("--stub-jitter", type=float, default=0.2, help="Stub latency variation, as a fraction")
+    parser.add_argument("--stub-token-rate", type=float, default=50.0, help="Stub tokens per second")
+    parser.add_argument("--stub-tokens", type=int, default=60, help="Stub completion length in tokens")
+    parser.add_argument("--stub-error-rate", type=float, default=0.0, help="Fraction of stub requests that fail")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    unknown = set(args.endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_revision(),
+        "config": {
+            key: value for key, value in vars(args).items() if key not in ("output", "compare")
+        },
+    }
+
+    if args.url:
+        report["results"] = asyncio.run(benchmark(args.url.rstrip("/"), args))
+    else:
+        stack = Stack(args)
+        with stack as url:
+            report["results"] = asyncio.run(benchmark(url, args))
+            report["stub"] = stack.stub_stats()
+
+    Path(args.output).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    print(f"\nResults written to {args.output}")
+    if args.compare:
+        compare(json.loads(Path(args.compare).read_text(encoding="utf-8")), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Conversation Memory for ReadyReserve AI Chatbot
+Keeps each request's history within a token budget by folding older turns into a
+cached running summary
+"""
+
+import hashlib
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from token_counter import count_message_tokens
+
+# After compacting, recent turns are trimmed to this fraction of the budget so
+# the next few turns fit without summarizing again
+RETAIN_FRACTION = 0.5
+
+SUMMARY_INSTRUCTIONS = """You maintain a running summary of a customer's conversation with the {name} assistant.
+Merge the new turns into the existing summary. Keep what the customer told us about their business, their needs and questions, and the key answers and recommendations given.
+Reply with the updated summary only, in under 150 words."""
+
+# Messages that identify a conversation without a session: the opening exchange
+# and the follow-up, since many conversations open with the same greeting and
+# get the same (cached) reply
+IDENTIFYING_MESSAGES = 3
+
+
+def conversation_id(history, user_id=None):
+    """Identify a conversation by its user and first IDENTIFYING_MESSAGES messages"""
+    opening = prefix_hash(history, IDENTIFYING_MESSAGES)
+    return hashlib.sha256(f"{user_id or ''}\x00{opening}".encode("utf-8")).hexdigest()
+
+
+def prefix_hash(history, count):
+    """Hash the first count messages, to check a cached summary still describes them"""
+    digest = hashlib.sha256()
+    for message in history[:count]:
+        digest.update(message["role"].encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(message["content"].encode("utf-8"))
+        digest.update(b"\x01")
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True)
+class SummaryState:
+    """Running summary covering the first `covered` messages of a conversation
+
+    Positions count from the conversation's first message, including any a
+    session has since trimmed off its head. offset is how many had been
+    trimmed when the summary was stored, prefix hashes the covered messages
+    still present then and boundary hashes the last covered message.
+    """
+    covered: int
+    offset: int
+    prefix: str
+    boundary: str
+    summary: str
+
+
+class ConversationMemory:
+    """Token-budgeted history with incremental rolling summaries
+
+    Recent turns are sent verbatim while they fit in the budget. Once they do
+    not, the oldest unsummarized turns are merged into the conversation's cached
+    summary, so each summarization call only sees newly evicted turns and each
+    request costs roughly the same number of prompt tokens however long the
+    conversation runs.
+    """
+
+    def __init__(self, llm_client, token_budget=1500, max_conversations=10000, summary_max_tokens=250):
+        self.llm_client = llm_client
+        self.token_budget = token_budget
+        self.max_conversations = max_conversations
+        self.summary_max_tokens = summary_max_tokens
+        self._summaries = OrderedDict()
+        self.summarizations = 0
+        self.summarization_failures = 0
+
+    @classmethod
+    def from_env(cls, llm_client):
+        """Build conversation memory from CHATBOT_HISTORY_TOKEN_BUDGET (0 disables compaction)"""
+        return cls(
+            llm_client,
+            token_budget=int(os.getenv("CHATBOT_HISTORY_TOKEN_BUDGET", "1500")),
+            max_conversations=int(os.getenv("CHATBOT_SUMMARY_CACHE_SIZE", "10000")),
+        )
+
+    def _cached_state(self, key, history, offset):
+        state = self._summaries.get(key)
+        if state is None:
+            return None
+        position = state.covered - offset
+        if offset == state.offset:
+            valid = position < len(history) and prefix_hash(history, position) == state.prefix
+        elif position > 0:
+            # The head has been trimmed since; the summarized messages can only be checked where they end
+            valid = position < len(history) and prefix_hash(history[position - 1:], 1) == state.boundary
+        else:
+            # Everything the summary covers has been trimmed off since
+            valid = True
+        if not valid:
+            # The client's history no longer starts with what we summarized
+            del self._summaries[key]
+            return None
+        self._summaries.move_to_end(key)
+        return state
+
+    def _store_state(self, key, state):
+        self._summaries[key] = state
+        self._summaries.move_to_end(key)
+        while len(self._summaries) > self.max_conversations:
+            self._summaries.popitem(last=False)
+
+    def _cut_point(self, token_counts, start, limit):
+        """Return the earliest index >= start whose suffix fits in limit, keeping the last message"""
+        cut = len(token_counts) - 1
+        total = token_counts[cut]
+        while cut > start and total + token_counts[cut - 1] <= limit:
+            cut -= 1
+            total += token_counts[cut]
+        return cut
+
+    async def _summarize(self, summary, turns, company):
+        transcript = "\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+        response = await self.llm_client.complete(
+            [
+                {"role": "system", "content": SUMMARY_INSTRUCTIONS.format(name=company)},
+                {"role": "user", "content": f"EXISTING SUMMARY:\n{summary or '(none)'}\n\nNEW TURNS:\n{transcript}"},
+            ],
+            max_tokens=self.summary_max_tokens,
+            temperature=0.2,
+        )
+        self.summarizations += 1
+        return response.choices[0].message.content.strip()
+
+    async def compact(self, history, key, company, offset=0):
+        """Return the messages to send for a conversation: an optional summary message plus recent turns
+
+        company is the name of the business the assistant speaks for. offset
+        is the number of older messages trimmed off before history[0] (a
+        session's offset), so trimming a session does not discard its summary.
+        """
+        if self.token_budget <= 0 or not history:
+            return history
+
+        state = self._cached_state(key, history, offset)
+        start = max(0, state.covered - offset) if state else 0
+        summary = state.summary if state else ""
+        token_counts = [count_message_tokens([message]) for message in history]
+
+        if sum(token_counts[start:]) > self.token_budget:
+            cut = self._cut_point(token_counts, start, int(self.token_budget * RETAIN_FRACTION))
+            if cut > start:
+                try:
+                    summary = await self._summarize(summary, history[start:cut], company)
+                    start = cut
+                    self._store_state(key, SummaryState(
+                        offset + start, offset, prefix_hash(history, start), prefix_hash(history[start - 1:], 1), summary
+                    ))
+                except Exception:
+                    # Fall back to plain truncation; the next request retries the summary
+                    self.summarization_failures += 1
+                    start = self._cut_point(token_counts, start, self.token_budget)
+
+        recent = history[start:]
+        if not summary:
+            return recent
+        return [{"role": "system", "content": f"CONVERSATION SUMMARY (earlier turns):\n{summary}"}] + recent
+
+    def stats(self):
+        """Return summary cache counters"""
+        return {
+            "token_budget": self.token_budget,
+            "conversations": len(self._summaries),
+            "summarizations": self.summarizations,
+            "summarization_failures": self.summarization_failures,
+        }
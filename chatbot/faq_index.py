@@ -0,0 +1,115 @@
+"""
+FAQ Search Index for ReadyReserve AI Chatbot
+Tokenized inverted index with BM25 scoring over the FAQ entries, optionally
+fused with semantic matches
+"""
+
+from search_index import BM25Index, tokenize
+from semantic_index import reciprocal_rank_fusion
+
+# Question text is counted this many times so matches there outrank the answer
+QUESTION_WEIGHT = 2
+
+
+class FAQIndex:
+    """BM25 index over FAQ entries with per-category posting lists"""
+
+    def __init__(self, faq_data):
+        self.entries = []
+        self.categories = []
+        self._question_terms = []
+
+        documents = []
+        seen_categories = set()
+        for faq_category in faq_data:
+            category = faq_category["category"]
+            category_key = category.lower()
+            if category_key not in seen_categories:
+                seen_categories.add(category_key)
+                self.categories.append(category)
+            for faq_item in faq_category["questions"]:
+                self.entries.append({
+                    "category": category,
+                    "question": faq_item["question"],
+                    "answer": faq_item["answer"]
+                })
+                question_tokens = tokenize(faq_item["question"])
+                self._question_terms.append(frozenset(question_tokens))
+                documents.append((
+                    category_key,
+                    question_tokens * QUESTION_WEIGHT + tokenize(faq_item["answer"])
+                ))
+
+        self.index = BM25Index(documents)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def confidence(self, query_terms, doc_id):
+        """IDF-weighted overlap between the query terms and an entry's question terms
+
+        1.0 means the query and the FAQ question use the same content words; extra
+        or missing words lower it in proportion to how informative they are.
+        """
+        question_terms = self._question_terms[doc_id]
+        union = query_terms | question_terms
+        if not union:
+            return 0.0
+        idf = self.index.idf
+        shared = sum(idf(term) for term in query_terms & question_terms)
+        return shared / sum(idf(term) for term in union)
+
+    def search(self, question, category=None, top_k=5, semantic=None):
+        """Return up to top_k FAQ entries ranked by BM25 score, with their match confidence
+
+        semantic, when given, is (ranked entry ids, similarity to every entry)
+        from the semantic index; the two rankings are then merged by
+        reciprocal rank fusion, so paraphrases with no words in common with an
+        entry still find it.
+        """
+        return self._search_terms(
+            frozenset(tokenize(question)), category.lower() if category else None, top_k, semantic
+        )
+
+    def search_batch(self, queries, semantic=None):
+        """Run several (question, category, top_k) searches, scoring each distinct query once
+
+        Queries are compared after tokenization, so rephrasings that reduce to
+        the same terms share one index lookup. semantic holds one
+        (ranking, similarity) pair per query, as for search(); the similarity
+        depends on the question's exact text, so with it only identical
+        questions share a lookup.
+        """
+        results = {}
+        batch = []
+        for position, (question, category, top_k) in enumerate(queries):
+            terms = frozenset(tokenize(question))
+            group = category.lower() if category else None
+            key = (terms, group, top_k, question if semantic else None)
+            if key not in results:
+                results[key] = self._search_terms(terms, group, top_k, semantic[position] if semantic else None)
+            batch.append(results[key])
+        return batch
+
+    def _search_terms(self, query_terms, group, top_k, semantic=None):
+        ranked = self.index.search(query_terms, group, top_k)
+        if semantic is None:
+            return [self._result(doc_id, score, query_terms) for doc_id, score in ranked]
+
+        semantic_ranking, similarity = semantic
+        scores = dict(ranked)
+        fused = reciprocal_rank_fusion([[doc_id for doc_id, _ in ranked], semantic_ranking], top_k)
+        return [
+            dict(
+                self._result(doc_id, scores.get(doc_id, 0.0), query_terms),
+                similarity=round(float(similarity[doc_id]), 4)
+            )
+            for doc_id in fused
+        ]
+
+    def _result(self, doc_id, score, query_terms):
+        return dict(
+            self.entries[doc_id],
+            score=round(score, 4),
+            confidence=round(self.confidence(query_terms, doc_id), 4)
+        )
@@ -0,0 +1,60 @@
+"""
+FAQ Fast Path for ReadyReserve AI Chatbot
+Answers single-turn questions straight from the FAQ when the match is confident enough
+"""
+
+import os
+
+# Confidence histogram resolution, for tuning the threshold offline
+BUCKETS = 10
+
+
+class FAQFastPath:
+    """Decides when an FAQ answer can be returned without calling the LLM
+
+    Only single-turn conversations qualify: with prior turns the canonical
+    answer may ignore context the user has already given. Every eligible
+    request records its top match confidence in a histogram, so the stats show
+    how many requests would have fired at any other threshold.
+    """
+
+    def __init__(self, threshold=0.7):
+        self.threshold = threshold
+        self.eligible = 0
+        self.fired = 0
+        self.histogram = [0] * BUCKETS
+
+    @classmethod
+    def from_env(cls):
+        """Build the fast path from CHATBOT_FAQ_FAST_PATH_THRESHOLD (0 disables it)"""
+        return cls(threshold=float(os.getenv("CHATBOT_FAQ_FAST_PATH_THRESHOLD", "0.7")))
+
+    @property
+    def enabled(self):
+        return self.threshold > 0
+
+    def match(self, history, faq_matches):
+        """Return the FAQ entry that answers the conversation outright, or None"""
+        if not self.enabled or len(history) != 1 or history[0]["role"] != "user":
+            return None
+        self.eligible += 1
+        confidence = faq_matches[0]["confidence"] if faq_matches else 0.0
+        self.histogram[min(int(confidence * BUCKETS), BUCKETS - 1)] += 1
+        if confidence < self.threshold:
+            return None
+        self.fired += 1
+        return faq_matches[0]
+
+    def stats(self):
+        """Return fast path counters and the confidence histogram"""
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "eligible": self.eligible,
+            "fired": self.fired,
+            "fire_ratio": round(self.fired / self.eligible, 4) if self.eligible else 0.0,
+            "confidence_histogram": {
+                f"{bucket / BUCKETS:.1f}-{(bucket + 1) / BUCKETS:.1f}": count
+                for bucket, count in enumerate(self.histogram)
+            },
+        }
@@ -0,0 +1,337 @@
+"""
+Knowledge Base for ReadyReserve AI Chatbot
+Versioned snapshots of the knowledge with their indexes, prompt and static
+responses, optionally loaded from JSON/YAML files and hot-reloaded on change
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+from faq_index import FAQIndex
+from semantic_index import SemanticIndex, reciprocal_rank_fusion
+from service_index import ServiceIndex
+from static_responses import StaticResponses
+from suggest_index import SuggestIndex
+from system_prompt import compile_system_prompt, update_system_prompt
+from website_knowledge import get_knowledge_version
+
+try:
+    import yaml
+except ImportError:  # PyYAML is optional; without it only JSON files can be loaded
+    yaml = None
+
+logger = logging.getLogger("uvicorn.error")
+
+SECTIONS = (
+    "website_info",
+    "service_categories",
+    "how_it_works",
+    "integrations",
+    "pricing",
+    "faq",
+    "contact_info",
+    "social_media",
+)
+
+# What a section holds when neither a file nor the defaults provide it
+EMPTY_KNOWLEDGE = {section: [] if section == "faq" else {} for section in SECTIONS}
+
+FILE_SUFFIXES = (".json", ".yaml", ".yml")
+
+# A service found only by semantic similarity is the match for a lookup from
+# this similarity; weaker ones are listed as candidates only
+MIN_SERVICE_SIMILARITY = 0.2
+
+
+def canonical_json(content):
+    """Serialize content the same way whatever its key order"""
+    return json.dumps(content, sort_keys=True, separators=(",", ":"))
+
+
+def read_knowledge_file(path):
+    """Parse a JSON or YAML knowledge file"""
+    path = Path(path)
+    text = path.read_text(encoding="utf-8")
+    if path.suffix == ".json":
+        return json.loads(text)
+    if yaml is None:
+        raise RuntimeError(f"Install PyYAML to load {path.name}")
+    return yaml.safe_load(text)
+
+
+class KnowledgeSnapshot:
+    """One immutable version of the knowledge base and everything derived from it
+
+    Requests read a single snapshot from start to finish, so a reload never
+    mixes two versions within one answer.
+    """
+
+    def __init__(self, knowledge, version, section_hashes, content_bytes, faq_index, service_index,
+                 semantic_index, suggest_index, system_prompt, static_responses, rebuilt):
+        self.knowledge = knowledge
+        self.version = version
+        self.section_hashes = section_hashes
+        self.content_bytes = content_bytes
+        self.faq_index = faq_index
+        self.service_index = service_index
+        self.semantic_index = semantic_index
+        self.suggest_index = suggest_index
+        self.system_prompt = system_prompt
+        self.static_responses = static_responses
+        self.rebuilt = rebuilt
+
+    @property
+    def company_name(self):
+        """The name the assistant introduces itself on behalf of"""
+        return self.knowledge["website_info"]["name"]
+
+    @classmethod
+    def build(cls, knowledge, previous=None, source="built-in"):
+        """Build a snapshot, reusing whatever the previous one derived from unchanged sections
+
+        source names where the knowledge came from, so its semantic matrix files
+        replace each other and not another source's.
+        """
+        version = get_knowledge_version(knowledge)
+        canonical = {section: canonical_json(knowledge[section]) for section in SECTIONS}
+        hashes = {section: hashlib.sha256(text.encode("utf-8")).hexdigest() for section, text in canonical.items()}
+        if previous is None:
+            changed = set(SECTIONS)
+        else:
+            changed = {section for section in SECTIONS if hashes[section] != previous.section_hashes[section]}
+
+        rebuilt = []
+
+        def derive(name, sections, build):
+            if previous is not None and not changed & sections:
+                return getattr(previous, name)
+            rebuilt.append(name)
+            return build()
+
+        faq_index = derive("faq_index", {"faq"}, lambda: FAQIndex(knowledge["faq"]))
+        service_index = derive(
+            "service_index", {"service_categories"}, lambda: ServiceIndex(knowledge["service_categories"])
+        )
+        semantic_index = derive(
+            "semantic_index",
+            {"faq", "service_categories"},
+            lambda: SemanticIndex.from_env(faq_index.entries, service_index.entries, source)
+        )
+        suggest_index = derive(
+            "suggest_index",
+            {"faq", "service_categories"},
+            lambda: SuggestIndex(knowledge["faq"], knowledge["service_categories"])
+        )
+        if previous is None:
+            system_prompt = compile_system_prompt(knowledge, version)
+        else:
+            system_prompt = update_system_prompt(previous.system_prompt, knowledge, version, changed)
+        if previous is None or system_prompt.content_hash != previous.system_prompt.content_hash:
+            rebuilt.append("system_prompt")
+        if previous is None or system_prompt.chunk_index is not previous.system_prompt.chunk_index:
+            rebuilt.append("prompt_chunks")
+        static_responses = StaticResponses.from_env(
+            knowledge,
+            version,
+            previous=previous.static_responses if previous else None,
+            changed=changed,
+        )
+        rebuilt.extend(f"static:{name}" for name in static_responses.rebuilt)
+
+        content_bytes = sum(len(text) for text in canonical.values())
+        return cls(knowledge, version, hashes, content_bytes, faq_index, service_index, semantic_index,
+                   suggest_index, system_prompt, static_responses, rebuilt)
+
+    def search_faq(self, question, category=None, top_k=5):
+        """Search FAQ for relevant answers, ranked by BM25 score fused with semantic similarity"""
+        if self.semantic_index is None:
+            return self.faq_index.search(question, category, top_k)
+        similarity = self.semantic_index.faq_similarity([question])[0]
+        ranking = self.semantic_index.rank(similarity, top_k, category.lower() if category else None)
+        return self.faq_index.search(question, category, top_k, (ranking, similarity))
+
+    def search_faq_batch(self, queries):
+        """Search FAQ for several (question, category, top_k) queries in one pass, in order"""
+        if self.semantic_index is None or not queries:
+            return self.faq_index.search_batch(queries)
+        # One matrix product scores every query against every entry
+        similarities = self.semantic_index.faq_similarity([question for question, _, _ in queries])
+        semantic = [
+            (self.semantic_index.rank(similarity, top_k, category.lower() if category else None), similarity)
+            for similarity, (_, category, top_k) in zip(similarities, queries)
+        ]
+        return self.faq_index.search_batch(queries, semantic)
+
+    def search_services(self, service_name, limit=5):
+        """Return ranked candidate services for a name, slug, alias, misspelling or description
+
+        Name matches come first; a description ("score incoming
+        prospects") finds services through semantic similarity instead. score is
+        the name similarity, or the semantic similarity for services found
+        only that way (semantic is then True).
+        """
+        ranked = self.service_index.rank(service_name, limit)
+        if self.semantic_index is not None and not (ranked and ranked[0][1] == 1.0):
+            similarity = self.semantic_index.service_similarity([service_name])[0]
+            scores = dict(ranked)
+            fused = reciprocal_rank_fusion(
+                [[entry_id for entry_id, _ in ranked], self.semantic_index.rank(similarity, limit)], limit
+            )
+            ranked = [
+                (entry_id, scores[entry_id] if entry_id in scores else round(float(similarity[entry_id]), 4))
+                for entry_id in fused
+            ]
+        else:
+            scores = dict(ranked)
+        return [
+            {
+                "category": self.service_index.entries[entry_id]["category"],
+                "service": self.service_index.entries[entry_id]["service"],
+                "score": score,
+                "semantic": entry_id not in scores,
+            }
+            for entry_id, score in ranked
+        ]
+
+    def get_service_info(self, service_name):
+        """Get detailed information about a specific service, with the other close candidates"""
+        candidates = self.search_services(service_name)
+        best = next(
+            (
+                match for match in candidates
+                if not match["semantic"] or match["score"] >= MIN_SERVICE_SIMILARITY
+            ),
+            None,
+        )
+        if best is None:
+            return None
+        return {
+            "category": best["category"],
+            "service": best["service"],
+            "score": best["score"],
+            "candidates": [
+                {"name": match["service"]["name"], "category": match["category"], "score": match["score"]}
+                for match in candidates
+            ]
+        }
+
+    def suggest(self, prefix, limit=8, category=None):
+        """Return typeahead completions for a partial question or service name"""
+        return self.suggest_index.suggest(prefix, limit, category)
+
+
+class KnowledgeBase:
+    """The live knowledge snapshot, optionally loaded from files and hot-reloaded
+
+    path may be one JSON/YAML file holding any of the knowledge sections, or a
+    directory with one file per section (faq.yaml, pricing.json, ...). Sections
+    not provided fall back to defaults (the built-in content for the main
+    knowledge base, EMPTY_KNOWLEDGE for tenants); website_info must name the
+    company either way. watch() polls the files and,
+    when they change, builds the next snapshot in a thread, rebuilding only what
+    the changed sections feed, then swaps it in with a single assignment. A
+    failed reload is logged and the current snapshot stays in service.
+    """
+
+    def __init__(self, defaults, path=None, poll_interval=2.0):
+        self.defaults = defaults
+        self.path = Path(path) if path else None
+        self.source = str(self.path) if self.path else "built-in"
+        self.poll_interval = poll_interval
+        self.reloads = 0
+        self.reload_failures = 0
+        self.last_error = None
+        self._listeners = []
+        self._fingerprint = self._scan()
+        self.current = KnowledgeSnapshot.build(self._load(), source=self.source)
+
+    @classmethod
+    def from_env(cls, defaults):
+        """Build from CHATBOT_KNOWLEDGE_PATH / CHATBOT_KNOWLEDGE_POLL_INTERVAL"""
+        return cls(
+            defaults,
+            path=os.getenv("CHATBOT_KNOWLEDGE_PATH") or None,
+            poll_interval=float(os.getenv("CHATBOT_KNOWLEDGE_POLL_INTERVAL", "2")),
+        )
+
+    def on_swap(self, callback):
+        """Call callback(snapshot) whenever a new version goes live"""
+        self._listeners.append(callback)
+
+    def _files(self):
+        if self.path is None:
+            return []
+        if self.path.is_dir():
+            return sorted(
+                child for child in self.path.iterdir()
+                if child.suffix in FILE_SUFFIXES and child.stem in SECTIONS
+            )
+        return [self.path]
+
+    def _scan(self):
+        fingerprint = []
+        for path in self._files():
+            stat = path.stat()
+            fingerprint.append((str(path), stat.st_mtime_ns, stat.st_size))
+        return tuple(fingerprint)
+
+    def _load(self):
+        knowledge = dict(self.defaults)
+        if self.path is not None and self.path.is_dir():
+            for path in self._files():
+                knowledge[path.stem] = read_knowledge_file(path)
+        elif self.path is not None:
+            content = read_knowledge_file(self.path)
+            unknown = set(content) - set(SECTIONS)
+            if unknown:
+                raise ValueError(f"Unknown knowledge sections: {', '.join(sorted(unknown))}")
+            knowledge.update(content)
+        if not knowledge["website_info"].get("name"):
+            raise ValueError("website_info must give the company's name")
+        return knowledge
+
+    async def reload(self):
+        """Load the files and swap in the new snapshot if the content changed"""
+        snapshot = await asyncio.to_thread(lambda: KnowledgeSnapshot.build(self._load(), self.current, self.source))
+        if snapshot.version == self.current.version:
+            return False
+        self.current = snapshot
+        self.reloads += 1
+        self.last_error = None
+        logger.info("Knowledge version %s live (rebuilt: %s)", snapshot.version, ", ".join(snapshot.rebuilt) or "nothing")
+        for callback in self._listeners:
+            callback(snapshot)
+        return True
+
+    async def watch(self):
+        """Reload whenever the knowledge files change; runs until cancelled"""
+        if self.path is None:
+            return
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                fingerprint = self._scan()
+                if fingerprint == self._fingerprint:
+                    continue
+                self._fingerprint = fingerprint
+                await self.reload()
+            except Exception as e:
+                self.reload_failures += 1
+                self.last_error = str(e)
+                logger.error("Knowledge reload failed, keeping version %s: %s", self.current.version, e)
+
+    def stats(self):
+        """Return reload counters and the live version"""
+        return {
+            "version": self.current.version,
+            "source": self.source,
+            "reloads": self.reloads,
+            "reload_failures": self.reload_failures,
+            "last_error": self.last_error,
+            "last_rebuilt": self.current.rebuilt,
+            "semantic_index": self.current.semantic_index.stats() if self.current.semantic_index else None,
+        }
@@ -0,0 +1,203 @@
+"""
+Async LLM Client for ReadyReserve AI Chatbot
+Non-blocking chat completions over a shared, pooled HTTP connection
+"""
+
+import asyncio
+import os
+import random
+import time
+
+import httpx
+import openai
+
+from metrics import COMPLETION_TOKENS, PROMPT_TOKENS, STAGE_SECONDS, UPSTREAM_ERRORS, UPSTREAM_REQUESTS, UPSTREAM_RETRIES
+from token_counter import count_message_tokens, count_tokens
+
+# Upstream failures worth another attempt
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class LLMClient:
+    """Async chat completion client with a concurrency cap and jittered retries
+
+    One httpx connection pool is shared by every request in the process. At most
+    max_concurrency completions are in flight at once; the rest wait on a
+    semaphore instead of piling onto the provider. A request made with
+    fast=True uses fast_model, when set, in place of model.
+    """
+
+    def __init__(
+        self,
+        api_key=None,
+        base_url=None,
+        model="gpt-3.5-turbo",
+        fast_model=None,
+        temperature=0.7,
+        max_tokens=1000,
+        max_concurrency=32,
+        connect_timeout=5.0,
+        read_timeout=60.0,
+        max_retries=2,
+        backoff_base=0.25,
+        backoff_max=4.0,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = model
+        self.fast_model = fast_model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.max_concurrency = max_concurrency
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._http_client = None
+        self._client = None
+
+    @classmethod
+    def from_env(cls, provider=None):
+        """Build a client from the CHATBOT_* / OPENAI_* environment variables
+
+        With provider set, CHATBOT_PROVIDER_<NAME>_API_KEY / _BASE_URL / _MODEL /
+        _FAST_MODEL take the place of OPENAI_API_KEY / OPENAI_BASE_URL /
+        CHATBOT_MODEL / CHATBOT_FAST_MODEL. A provider's fast model never falls
+        back to CHATBOT_FAST_MODEL, since model names differ between providers.
+        """
+        def setting(name, variable, default=None):
+            if provider is not None:
+                return os.getenv(f"CHATBOT_PROVIDER_{provider.upper()}_{name}") or default
+            return os.getenv(variable) or default
+
+        return cls(
+            api_key=setting("API_KEY", "OPENAI_API_KEY"),
+            base_url=setting("BASE_URL", "OPENAI_BASE_URL"),
+            model=setting("MODEL", "CHATBOT_MODEL", os.getenv("CHATBOT_MODEL", "gpt-3.5-turbo")),
+            fast_model=setting("FAST_MODEL", "CHATBOT_FAST_MODEL"),
+            temperature=float(os.getenv("CHATBOT_TEMPERATURE", "0.7")),
+            max_tokens=int(os.getenv("CHATBOT_MAX_TOKENS", "1000")),
+            max_concurrency=int(os.getenv("CHATBOT_MAX_CONCURRENCY", "32")),
+            connect_timeout=float(os.getenv("CHATBOT_CONNECT_TIMEOUT", "5")),
+            read_timeout=float(os.getenv("CHATBOT_READ_TIMEOUT", "60")),
+            max_retries=int(os.getenv("CHATBOT_MAX_RETRIES", "2")),
+        )
+
+    @property
+    def client(self):
+        """Return the AsyncOpenAI client, creating the shared connection pool on first use"""
+        if self._client is None:
+            self._http_client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+            )
+            self._client = openai.AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                timeout=self.timeout,
+                max_retries=0,  # retries are handled here, with jitter
+                http_client=self._http_client,
+            )
+        return self._client
+
+    def backoff_delay(self, attempt):
+        """Full-jitter exponential backoff for the given retry attempt"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _request(self, messages, params):
+        params = dict(params)
+        fast = params.pop("fast", False)
+        request = {
+            "model": self.fast_model if fast and self.fast_model else self.model,
+            "messages": messages,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+        }
+        request.update(params)
+        return request
+
+    async def _open(self, request):
+        """Send a completion request, retrying transient failures
+
+        Returns while still holding a concurrency slot; the caller releases it
+        once the response (or stream) is finished with.
+        """
+        UPSTREAM_REQUESTS.inc("stream" if request.get("stream") else "complete")
+        attempt = 0
+        while True:
+            await self._semaphore.acquire()
+            try:
+                return await self.client.chat.completions.create(**request)
+            except RETRYABLE_ERRORS as e:
+                self._semaphore.release()
+                UPSTREAM_ERRORS.inc(type(e).__name__)
+                if attempt >= self.max_retries:
+                    raise
+            except openai.APIError as e:
+                self._semaphore.release()
+                UPSTREAM_ERRORS.inc(type(e).__name__)
+                raise
+            except BaseException:
+                self._semaphore.release()
+                raise
+            # Back off without holding a concurrency slot
+            UPSTREAM_RETRIES.inc()
+            await asyncio.sleep(self.backoff_delay(attempt))
+            attempt += 1
+
+    async def complete(self, messages, **params):
+        """Create a chat completion, retrying transient upstream failures"""
+        start = time.perf_counter()
+        response = await self._open(self._request(messages, params))
+        self._semaphore.release()
+        STAGE_SECONDS.observe_shared(time.perf_counter() - start, "upstream_total")
+        if response.usage is not None:
+            PROMPT_TOKENS.inc("reported", amount=response.usage.prompt_tokens)
+            COMPLETION_TOKENS.inc("reported", amount=response.usage.completion_tokens)
+        return response
+
+    async def stream(self, messages, **params):
+        """Yield completion text deltas as they arrive
+
+        Only opening the stream is retried. Closing the generator early (for
+        example when the HTTP client disconnects) closes the upstream response,
+        so the provider stops generating tokens nobody will read. Streams carry
+        no usage, so their token counts are estimated.
+        """
+        start = time.perf_counter()
+        stream = await self._open(self._request(messages, dict(params, stream=True)))
+        PROMPT_TOKENS.inc("estimated", amount=count_message_tokens(messages))
+        parts = []
+        try:
+            async for chunk in stream:
+                if chunk.choices:
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        if not parts:
+                            STAGE_SECONDS.observe_shared(time.perf_counter() - start, "upstream_ttft")
+                        parts.append(delta)
+                        yield delta
+            STAGE_SECONDS.observe_shared(time.perf_counter() - start, "upstream_total")
+        except Exception as e:
+            UPSTREAM_ERRORS.inc(type(e).__name__)
+            raise
+        finally:
+            self._semaphore.release()
+            await stream.response.aclose()
+            COMPLETION_TOKENS.inc("estimated", amount=count_tokens("".join(parts)))
+
+    async def aclose(self):
+        """Close the shared connection pool"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+            self._client = None
@@ -3,25 +3,152 @@ ReadyReserve AI Chatbot Service
 A Python FastAPI service that knows everything about the website and can answer user questions
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
-import openai
+from contextlib import asynccontextmanager
 import os
 from dotenv import load_dotenv
 import json
-
-from website_knowledge import get_website_knowledge, search_faq, get_service_info
+import asyncio
+import hmac
+import time
+import anyio
+
+from website_knowledge import get_website_knowledge
+from knowledge_base import KnowledgeBase
+from system_prompt import CONTEXT_TOKEN_BUDGET
+from providers import OPEN, ProviderPool
+from model_router import ModelRouter
+from profiling import ProfilingMiddleware, SlowRequestLog, StackSampler, collapse
+from answer_cache import AnswerCache
+from fast_path import FAQFastPath
+from conversation_memory import ConversationMemory, conversation_id
+from session_store import SessionStore
+from single_flight import SingleFlight
+from admission import AdmissionController, AdmissionRejected
+from tenants import DEFAULT_TENANT, Tenant, TenantPathMiddleware, TenantRegistry
+from analytics import AnalyticsWriter, chat_record
+from token_counter import count_message_tokens, count_tokens
+from metrics import CACHE_LOOKUPS, CHAT_ANSWERS, CONTENT_TYPE, REGISTRY, REQUEST_SECONDS, STAGE_SECONDS, add_request_stage
 
 # Load environment variables
 load_dotenv()
 
+if __name__ == "__main__":
+    # Production launch (pre-forked workers); use run.py for auto-reload in development.
+    # Handed to run.py before any state is built here: it sets up session sharing
+    # for the worker count, then imports this module as main and builds it once
+    import run
+    run.run_production()
+    raise SystemExit
+
+# Async LLM clients for each configured provider, with hedging, failover and circuit breakers
+llm_client = ProviderPool.from_env()
+
+# Short factual questions go to a faster model with a tight token limit
+model_router = ModelRouter.from_env()
+
+# Cache of answers to repeat questions, scoped to the knowledge version
+answer_cache = AnswerCache.from_env()
+
+# Direct FAQ answers for confident single-turn matches
+faq_fast_path = FAQFastPath.from_env()
+
+# Token-budgeted history with rolling summaries of older turns
+conversation_memory = ConversationMemory.from_env(llm_client)
+
+# Server-side conversation history for clients that send only new messages
+session_store = SessionStore.from_env()
+
+# Identical concurrent questions share one upstream call
+single_flight = SingleFlight.from_env()
+
+# Per-client rate limits and a bounded queue in front of upstream work
+admission = AdmissionController.from_env()
+
+# Every chat exchange, queued and written in batches to CHATBOT_ANALYTICS_SINK
+analytics = AnalyticsWriter.from_env()
+
+# Behind a proxy (e.g. the Supabase edge function) the client address comes from X-Forwarded-For
+TRUST_FORWARDED_FOR = os.getenv("CHATBOT_TRUST_FORWARDED_FOR", "0") == "1"
+
+# Live knowledge snapshot: built-in content, or files under CHATBOT_KNOWLEDGE_PATH
+knowledge_base = KnowledgeBase.from_env(get_website_knowledge())
+default_tenant = Tenant(DEFAULT_TENANT, knowledge_base, answer_cache)
+
+# Further tenants' knowledge bases under CHATBOT_TENANTS_PATH, loaded on first use
+tenants = TenantRegistry.from_env(default_tenant)
+TENANT_HEADER = os.getenv("CHATBOT_TENANT_HEADER", "X-Tenant-ID")
+
+# Counters the components already keep, read at scrape time
+REGISTRY.gauge("chatbot_active_chats", "Chat requests holding a work slot", function=lambda: admission.active)
+REGISTRY.gauge("chatbot_queued_chats", "Chat requests waiting for a work slot", function=lambda: admission.waiting)
+REGISTRY.counter(
+    "chatbot_rejected_chats_total",
+    "Chat requests turned away by admission control",
+    ("reason",),
+    function=lambda: {
+        ("rate_limited",): admission.rate_limiter.limited,
+        ("shed",): admission.shed,
+        ("queue_timeout",): admission.timed_out,
+    },
+)
+REGISTRY.counter(
+    "chatbot_coalesced_requests_total",
+    "Chat requests that joined an identical request already in flight",
+    function=lambda: single_flight.coalesced,
+)
+REGISTRY.counter(
+    "chatbot_summarizations_total",
+    "Conversation summaries generated upstream",
+    function=lambda: conversation_memory.summarizations,
+)
+REGISTRY.gauge(
+    "chatbot_backend_circuit_open",
+    "1 while a backend's circuit breaker is refusing requests",
+    ("backend",),
+    function=lambda: {(backend.name,): int(backend.breaker.state == OPEN) for backend in llm_client.backends},
+)
+REGISTRY.gauge("chatbot_loaded_tenants", "Tenants with their knowledge loaded", function=lambda: len(tenants._tenants) + 1)
+
+# Sampling profiler for the event loop, and the slowest recent requests with their profiles
+sampler = StackSampler.from_env()
+slow_requests = SlowRequestLog.from_env()
+
+# Bearer token for the /admin endpoints; unset, they are not served
+ADMIN_TOKEN = os.getenv("CHATBOT_ADMIN_TOKEN") or None
+
+# How often each worker publishes its metrics to CHATBOT_METRICS_DIR
+METRICS_FLUSH_INTERVAL = float(os.getenv("CHATBOT_METRICS_FLUSH_INTERVAL", "5"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Each worker watches the knowledge files itself
+    default_tenant.start_watching()
+    metrics_flusher = asyncio.create_task(REGISTRY.flush(METRICS_FLUSH_INTERVAL))
+    analytics.start()
+    if slow_requests.enabled and slow_requests.profile:
+        sampler.start(keep_history=True)
+    yield
+    sampler.stop()
+    metrics_flusher.cancel()
+    # Write every queued exchange before the worker exits
+    await analytics.close()
+    tenants.close()
+    await llm_client.aclose()
+    session_store.close()
+    answer_cache.close()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="ReadyReserve AI Chatbot",
     description="Ready Assistant that knows everything about ReadyReserve AI website",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -33,8 +160,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize OpenAI
-openai.api_key = os.getenv("OPENAI_API_KEY")
+# /t/{tenant}/... selects a tenant like the tenant header does
+app.add_middleware(TenantPathMiddleware, header=TENANT_HEADER)
+
+# Outermost, so a request's time includes every other middleware
+app.add_middleware(ProfilingMiddleware, sampler=sampler, slow_requests=slow_requests)
 
 # Pydantic models
 class ChatMessage(BaseModel):
@@ -44,97 +174,78 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     messages: List[ChatMessage]
     user_id: Optional[str] = None
+    session_id: Optional[str] = None  # when set, messages holds only the new turn(s)
 
 class ChatResponse(BaseModel):
     content: str
     sources: Optional[List[str]] = None
     faq_matches: Optional[List[dict]] = None
+    llm_bypassed: bool = False
+    session_id: Optional[str] = None
+
+class SessionRequest(BaseModel):
+    messages: List[ChatMessage] = []
+    user_id: Optional[str] = None
 
 class FAQSearchRequest(BaseModel):
     question: str
     category: Optional[str] = None
+    top_k: int = Field(default=5, ge=1, le=50)
 
 class FAQSearchResponse(BaseModel):
     results: List[dict]
 
-# Get website knowledge
-WEBSITE_KNOWLEDGE = get_website_knowledge()
-
-def create_system_prompt():
-    """Create a comprehensive system prompt with all website knowledge"""
-    knowledge = WEBSITE_KNOWLEDGE
-    
-    system_prompt = f"""You are a Ready Assistant for ReadyReserve AI, a company that provides AI-driven digital transformation services for medium-sized businesses.
+# Batch endpoints: items per request, and model calls in flight per batch
+BATCH_MAX_ITEMS = int(os.getenv("CHATBOT_BATCH_MAX_ITEMS", "100"))
+BATCH_CONCURRENCY = int(os.getenv("CHATBOT_BATCH_CONCURRENCY", "8"))
 
-COMPANY INFORMATION:
-- Name: {knowledge['website_info']['name']}
-- Tagline: {knowledge['website_info']['tagline']}
-- Description: {knowledge['website_info']['description']}
-- Mission: {knowledge['website_info']['mission']}
+class ChatBatchRequest(BaseModel):
+    requests: List[ChatRequest] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
+    concurrency: Optional[int] = Field(default=None, ge=1)  # capped at CHATBOT_BATCH_CONCURRENCY
+    stream: bool = False  # NDJSON, one line per item as it completes
 
-SERVICE CATEGORIES:
-"""
-    
-    for category_key, category_data in knowledge['service_categories'].items():
-        system_prompt += f"\n{category_data['name']}: {category_data['description']}\n"
-        for service in category_data['services']:
-            system_prompt += f"  - {service['name']}: {service['description']}\n"
-            system_prompt += f"    Features: {', '.join(service['features'])}\n"
-            system_prompt += f"    Use Cases: {', '.join(service['use_cases'])}\n"
-    
-    system_prompt += f"""
+class FAQSearchBatchRequest(BaseModel):
+    requests: List[FAQSearchRequest] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
 
-HOW IT WORKS:
-1. {knowledge['how_it_works']['step_1']['title']}: {knowledge['how_it_works']['step_1']['description']}
-2. {knowledge['how_it_works']['step_2']['title']}: {knowledge['how_it_works']['step_2']['description']}
-3. {knowledge['how_it_works']['step_3']['title']}: {knowledge['how_it_works']['step_3']['description']}
+class ProfileRequest(BaseModel):
+    seconds: float = Field(default=10, gt=0, le=300)
+    percent: Optional[float] = Field(default=None, gt=0, le=100)  # profile only this share of requests
 
-INTEGRATIONS:
-- AI Platforms: {', '.join(knowledge['integrations']['ai_platforms'])}
-- Workflow Tools: {', '.join(knowledge['integrations']['workflow_tools'])}
-- Business Tools: {', '.join(knowledge['integrations']['business_tools'])}
+# Token budget for knowledge chunks and FAQ context retrieved per request
+CONTEXT_BUDGET = int(os.getenv("CHATBOT_CONTEXT_TOKEN_BUDGET", str(CONTEXT_TOKEN_BUDGET)))
 
-PRICING PLANS:
-"""
-    
-    for plan_key, plan_data in knowledge['pricing'].items():
-        system_prompt += f"- {plan_data['name']} ({plan_data['price']}): {plan_data['description']}\n"
-        system_prompt += f"  Features: {', '.join(plan_data['features'])}\n"
-    
-    system_prompt += f"""
-
-CONTACT INFORMATION:
-- Email: {knowledge['contact_info']['email']}
-- Phone: {knowledge['contact_info']['phone']}
-- Support: {knowledge['contact_info']['support_email']}
-- Sales: {knowledge['contact_info']['sales_email']}
-- Hours: {knowledge['contact_info']['hours']}
-
-SOCIAL MEDIA:
-- Twitter: {knowledge['social_media']['twitter']}
-- LinkedIn: {knowledge['social_media']['linkedin']}
-
-INSTRUCTIONS:
-1. Be helpful, friendly, and professional
-2. Provide accurate information based on the knowledge above
-3. If asked about specific services, provide detailed information including features and use cases
-4. If asked about pricing, explain the different plans and their benefits
-5. If asked about how it works, explain the 3-step process
-6. Always encourage users to book a consultation for personalized solutions
-7. If you don't know something specific, offer to connect them with our team
-8. Use the FAQ data to provide comprehensive answers to common questions
-9. Be conversational but informative
-10. Focus on the value and benefits for the user's business
-
-Remember: You are representing ReadyReserve AI and should always maintain a professional, helpful tone while being enthusiastic about how AI can transform their business."""
-    
-    return system_prompt
+async def current_tenant(request: Request) -> Tenant:
+    """Resolve the request's tenant from the tenant header (the default tenant without one)"""
+    try:
+        tenant = await tenants.get(request.headers.get(TENANT_HEADER))
+    except Exception:
+        raise HTTPException(status_code=503, detail="Tenant knowledge could not be loaded")
+    if tenant is None:
+        raise HTTPException(status_code=404, detail="Tenant not found")
+    tenant.requests += 1
+    return tenant
+
+def static_response(tenant: Tenant, name: str, request: Request):
+    """Serve one of the tenant's precomputed responses"""
+    response = tenant.knowledge.static_responses.respond(name, request)
+    if tenants.enabled:
+        # The same URL serves each tenant its own content
+        response.headers["Vary"] = f"Accept-Encoding, {TENANT_HEADER}"
+    return response
+
+def create_system_prompt(tenant: Tenant = default_tenant):
+    """Return the compiled core system prompt text"""
+    return tenant.knowledge.system_prompt.text
 
 @app.get("/")
-async def root():
+async def root(tenant: Tenant = Depends(current_tenant)):
+    knowledge = tenant.knowledge
     return {
-        "message": "ReadyReserve AI Ready Assistant Service",
+        "message": f"{knowledge.company_name} Ready Assistant Service",
         "version": "1.0.0",
+        "tenant": tenant.id,
+        "knowledge_version": knowledge.version,
+        "prompt_hash": knowledge.system_prompt.content_hash,
         "status": "active"
     }
 
@@ -142,78 +253,552 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "ReadyReserve AI Ready Assistant"}
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
-    """Main chat endpoint that knows everything about the website"""
+def conversation_history(request: ChatRequest):
+    """Return the request's messages as plain message dicts"""
+    return [{"role": msg.role, "content": msg.content} for msg in request.messages]
+
+def client_keys(request: ChatRequest, http_request: Request):
+    """Rate-limit keys for a request: the client address, and its user_id when it has one
+
+    The user_id comes from the client, so it only narrows the limit: a caller
+    sending a new user_id each time still drains its address's bucket. Behind
+    a trusted proxy the address is the last X-Forwarded-For entry, the one the
+    proxy added; earlier entries come from the client and can be forged.
+    """
+    address = http_request.client.host if http_request.client else ""
+    if TRUST_FORWARDED_FOR:
+        forwarded = http_request.headers.get("x-forwarded-for", "")
+        address = forwarded.split(",")[-1].strip() or address
+    keys = [f"address:{address}"]
+    if request.user_id:
+        keys.append(f"user:{request.user_id}")
+    return keys
+
+async def admit(cache_key):
+    """Wait for a work slot, unless an identical request is already in flight"""
+    if single_flight.in_flight(cache_key):
+        return None
+    return await admission.acquire()
+
+async def admit_leader(ticket, cache_key):
+    """Take the work slot a request skipped if the flight it meant to join has finished since
+
+    Await this immediately before joining the flight: when the flight is
+    still running it returns without suspending, so nothing can end the
+    flight between the check and the join.
+    """
+    if ticket is None and not single_flight.in_flight(cache_key):
+        ticket = await admission.acquire()
+    return ticket
+
+def release(ticket):
+    if ticket is not None:
+        ticket.release()
+
+def rejected(error: AdmissionRejected):
+    """Turn an admission rejection into a 429/503 with Retry-After"""
+    return HTTPException(status_code=error.status_code, detail=error.detail, headers=error.headers())
+
+async def load_conversation(request: ChatRequest):
+    """Return the session (if any), the new messages and the full history for a request"""
+    new_messages = conversation_history(request)
+    if request.session_id is None:
+        return None, new_messages, new_messages
+    session = await session_store.get(request.session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return session, new_messages, session.messages + new_messages
+
+async def record_turn(session, new_messages, content):
+    """Append the new messages and the answer to the session, if the request has one"""
+    if session is not None:
+        await session_store.append(session, new_messages + [{"role": "assistant", "content": content}])
+
+# FAQ entries retrieved for each chat turn
+CHAT_FAQ_MATCHES = 3
+
+def retrieve_faq(knowledge, history, faq_matches=None):
+    """Return the FAQ matches and sources for a conversation's last message
+
+    faq_matches may be passed in when retrieval already ran for a whole batch.
+    """
+    # Search FAQ for the most relevant entries
+    if faq_matches is None:
+        user_message = history[-1]["content"] if history else ""
+        with STAGE_SECONDS.time("retrieval"):
+            faq_matches = knowledge.search_faq(user_message, top_k=CHAT_FAQ_MATCHES)
+    
+    # Prepare sources
+    sources = [f"FAQ: {match['question']}" for match in faq_matches]
+    
+    return faq_matches or None, sources
+
+async def prepare_chat(knowledge, history, conversation_key, faq_matches, offset=0):
+    """Build the upstream messages for a conversation
+
+    offset is the number of messages a session has trimmed off before history.
+    """
+    # Static core prompt first, then the knowledge chunks and FAQ context that
+    # best match the recent user turns, within the token budget
+    with STAGE_SECONDS.time("prompt_build"):
+        query = " ".join(msg["content"] for msg in history[-3:] if msg["role"] == "user")
+        messages = knowledge.system_prompt.messages(query, faq_matches, CONTEXT_BUDGET)
+    
+    # Add conversation history, with older turns folded into a summary
+    with STAGE_SECONDS.time("history"):
+        messages.extend(await conversation_memory.compact(history, conversation_key, knowledge.company_name, offset))
+    
+    return messages
+
+async def upstream_answer(tokens, cache, cache_key, sources, faq_matches):
+    """Relay an upstream answer's deltas, caching the full answer once it completes"""
+    parts = []
     try:
-        # Search FAQ for relevant information
-        user_message = request.messages[-1].content if request.messages else ""
-        faq_matches = search_faq(user_message)
-        
-        # Create system prompt with website knowledge
-        system_prompt = create_system_prompt()
-        
-        # Add FAQ context if matches found
-        if faq_matches:
-            system_prompt += "\n\nRELEVANT FAQ INFORMATION:\n"
-            for match in faq_matches[:3]:  # Limit to top 3 matches
-                system_prompt += f"Q: {match['question']}\nA: {match['answer']}\n\n"
+        async for delta in tokens:
+            parts.append(delta)
+            yield delta
+    finally:
+        await tokens.aclose()
+    await cache.set(cache_key, {
+        "content": "".join(parts),
+        "sources": sources,
+        "faq_matches": faq_matches,
+        "llm_bypassed": False
+    })
+
+async def completion_deltas(messages, params):
+    """Yield a non-streamed completion as a single delta"""
+    response = await llm_client.complete(messages, **params)
+    yield response.choices[0].message.content
+
+def model_deltas(history, faq_matches, messages, stream=False):
+    """Route the conversation to a model and return the answer's deltas, timed under the route"""
+    route = model_router.route(history, faq_matches)
+    if stream:
+        deltas = llm_client.stream(messages, **route.params)
+    else:
+        deltas = completion_deltas(messages, route.params)
+    return model_router.timed(route, deltas)
+
+def sse_event(event: str, data: dict) -> str:
+    """Format a Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def record_exchange(endpoint, tenant, request, started, **fields):
+    """Queue the analytics record of a chat exchange"""
+    if analytics.enabled:
+        await analytics.record(chat_record(endpoint, tenant.id, request, started, **fields))
+
+async def answer_chat(request: ChatRequest, tenant: Tenant, knowledge=None, faq_matches=None, endpoint="chat"):
+    """Answer one chat request from the tenant's cache, the FAQ fast path or the model"""
+    started = time.perf_counter()
+    knowledge = knowledge or tenant.knowledge
+    answer_cache = tenant.answer_cache
+    ticket = None
+    try:
+        session, new_messages, history = await load_conversation(request)
+        cache_key = answer_cache.key(history, knowledge.version)
+        cached = await answer_cache.get(cache_key)
+        CACHE_LOOKUPS.inc("miss" if cached is None else "hit")
+        if cached is not None:
+            CHAT_ANSWERS.inc("cache")
+            await record_turn(session, new_messages, cached["content"])
+            await record_exchange(
+                endpoint, tenant, request, started,
+                source="cache", answer=cached["content"], faq_matches=cached["faq_matches"]
+            )
+            return ChatResponse(**dict(cached, session_id=request.session_id))
         
-        # Prepare messages for OpenAI
-        messages = [
-            {"role": "system", "content": system_prompt}
-        ]
+        faq_matches, sources = retrieve_faq(knowledge, history, faq_matches)
         
-        # Add conversation history
-        for msg in request.messages:
-            messages.append({"role": msg.role, "content": msg.content})
+        # Answer confident single-turn FAQ matches without calling the model
+        faq_answer = faq_fast_path.match(history, faq_matches)
+        if faq_answer is not None:
+            CHAT_ANSWERS.inc("fast_path")
+            await record_turn(session, new_messages, faq_answer["answer"])
+            await record_exchange(
+                endpoint, tenant, request, started,
+                source="fast_path", answer=faq_answer["answer"], faq_matches=faq_matches
+            )
+            return ChatResponse(
+                content=faq_answer["answer"],
+                sources=sources,
+                faq_matches=faq_matches,
+                llm_bypassed=True,
+                session_id=request.session_id
+            )
         
-        # Call OpenAI API
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=messages,
-            max_tokens=1000,
-            temperature=0.7
+        # Only requests that go to the model need a work slot
+        ticket = await admit(cache_key)
+        conversation_key = request.session_id or conversation_id(history, request.user_id)
+        messages = await prepare_chat(
+            knowledge, history, conversation_key, faq_matches, session.offset if session else 0
         )
         
-        content = response.choices[0].message.content
-        
-        # Prepare sources
-        sources = []
-        if faq_matches:
-            sources.extend([f"FAQ: {match['question']}" for match in faq_matches[:3]])
+        # Call OpenAI API without blocking the event loop, sharing the call
+        # with any identical request already in flight
+        ticket = await admit_leader(ticket, cache_key)
+        upstream_start = time.perf_counter()
+        content = await single_flight.run(
+            cache_key,
+            lambda: upstream_answer(
+                model_deltas(history, faq_matches, messages), answer_cache, cache_key, sources, faq_matches
+            )
+        )
+        add_request_stage("upstream_total", time.perf_counter() - upstream_start)
         
+        CHAT_ANSWERS.inc("model")
+        await record_turn(session, new_messages, content)
+        await record_exchange(
+            endpoint, tenant, request, started,
+            source="model", answer=content, faq_matches=faq_matches,
+            prompt_tokens=count_message_tokens(messages), completion_tokens=count_tokens(content)
+        )
         return ChatResponse(
             content=content,
             sources=sources,
-            faq_matches=faq_matches[:3] if faq_matches else None
+            faq_matches=faq_matches,
+            session_id=request.session_id
         )
         
+    except AdmissionRejected as e:
+        error = rejected(e)
+    except HTTPException as e:
+        error = e
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
+        error = HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
+    finally:
+        release(ticket)
+    await record_exchange(endpoint, tenant, request, started, status="error", error=str(error.detail))
+    raise error
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest, http_request: Request, tenant: Tenant = Depends(current_tenant)):
+    """Main chat endpoint that knows everything about the website"""
+    start = time.perf_counter()
+    try:
+        admission.check_rate(client_keys(request, http_request))
+    except AdmissionRejected as e:
+        raise rejected(e)
+    response = await answer_chat(request, tenant)
+    with STAGE_SECONDS.time("serialization"):
+        body = response.model_dump_json()
+    REQUEST_SECONDS.observe(time.perf_counter() - start, "chat")
+    return Response(body, media_type="application/json")
+
+async def chat_batch_results(requests: List[ChatRequest], concurrency: int, tenant: Tenant):
+    """Yield each batch item's result as it completes, with at most concurrency items in progress"""
+    # Retrieval for every item in one pass; items that continue a session
+    # without a new message search inside answer_chat instead
+    searchable = [index for index, item in enumerate(requests) if item.messages]
+    knowledge = tenant.knowledge
+    matches = [None] * len(requests)
+    with STAGE_SECONDS.time("retrieval"):
+        batch_matches = knowledge.search_faq_batch(
+            [(requests[index].messages[-1].content, None, CHAT_FAQ_MATCHES) for index in searchable]
+        )
+    for index, faq_matches in zip(searchable, batch_matches):
+        matches[index] = faq_matches
+    
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def run(index):
+        async with semaphore:
+            try:
+                response = await answer_chat(requests[index], tenant, knowledge, matches[index], "chat_batch")
+                return {"index": index, "status": 200, "response": response.model_dump()}
+            except HTTPException as e:
+                result = {"index": index, "status": e.status_code, "error": e.detail}
+                if e.headers and "Retry-After" in e.headers:
+                    result["retry_after"] = int(e.headers["Retry-After"])
+                return result
+    
+    tasks = [asyncio.create_task(run(index)) for index in range(len(requests))]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # The client may have gone; stop whatever has not finished
+        for task in tasks:
+            task.cancel()
+
+@app.post("/chat/batch")
+async def chat_batch(request: ChatBatchRequest, http_request: Request, tenant: Tenant = Depends(current_tenant)):
+    """Answer several chat requests with bounded concurrency
+
+    Results carry their item's index and a per-item status, so one failed item
+    does not fail the batch. With stream set, results are sent as NDJSON lines
+    in completion order; otherwise they are returned together, in input order.
+    Every item counts as one request against the rate limit of the client
+    address and of its user_id, and each item that needs the model takes its
+    own work slot.
+    """
+    start = time.perf_counter()
+    try:
+        admission.check_rate_batch(client_keys(item, http_request) for item in request.requests)
+    except AdmissionRejected as e:
+        raise rejected(e)
+    concurrency = min(request.concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY)
+    results = chat_batch_results(request.requests, concurrency, tenant)
+    
+    if request.stream:
+        async def ndjson_stream():
+            try:
+                async for result in results:
+                    yield json.dumps(result) + "\n"
+                REQUEST_SECONDS.observe(time.perf_counter() - start, "chat_batch")
+            finally:
+                with anyio.CancelScope(shield=True):
+                    await results.aclose()
+        
+        return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+    
+    collected = [result async for result in results]
+    REQUEST_SECONDS.observe(time.perf_counter() - start, "chat_batch")
+    return {"results": sorted(collected, key=lambda result: result["index"])}
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request, tenant: Tenant = Depends(current_tenant)):
+    """Stream the chat answer as Server-Sent Events
+
+    Emits a "token" event per content delta, then a "done" event carrying
+    sources and faq_matches (or an "error" event). Identical concurrent
+    requests fan out from one upstream stream; once every client sharing it
+    has disconnected the upstream completion is closed so no further tokens
+    are generated.
+    """
+    start = time.perf_counter()
+    knowledge = tenant.knowledge
+    answer_cache = tenant.answer_cache
+    ticket = None
+    try:
+        admission.check_rate(client_keys(request, http_request))
+    except AdmissionRejected as e:
+        raise rejected(e)
+    try:
+        session, new_messages, history = await load_conversation(request)
+        cache_key = answer_cache.key(history, knowledge.version)
+        ready = await answer_cache.get(cache_key)
+        CACHE_LOOKUPS.inc("miss" if ready is None else "hit")
+        source = "cache"
+        if ready is not None:
+            CHAT_ANSWERS.inc("cache")
+        else:
+            faq_matches, sources = retrieve_faq(knowledge, history)
+            faq_answer = faq_fast_path.match(history, faq_matches)
+            CHAT_ANSWERS.inc("model" if faq_answer is None else "fast_path")
+            if faq_answer is not None:
+                source = "fast_path"
+                ready = {
+                    "content": faq_answer["answer"],
+                    "sources": sources,
+                    "faq_matches": faq_matches,
+                    "llm_bypassed": True
+                }
+            else:
+                # Only requests that go to the model need a work slot
+                ticket = await admit(cache_key)
+                conversation_key = request.session_id or conversation_id(history, request.user_id)
+                messages = await prepare_chat(
+                    knowledge, history, conversation_key, faq_matches, session.offset if session else 0
+                )
+    except AdmissionRejected as e:
+        error = rejected(e)
+    except HTTPException as e:
+        error = e
+    except Exception as e:
+        error = HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
+    else:
+        error = None
+    if error is not None:
+        release(ticket)
+        await record_exchange("chat_stream", tenant, request, start, status="error", error=str(error.detail))
+        raise error
+    
+    async def ready_stream():
+        await record_turn(session, new_messages, ready["content"])
+        await record_exchange(
+            "chat_stream", tenant, request, start,
+            source=source, answer=ready["content"], faq_matches=ready["faq_matches"]
+        )
+        yield sse_event("token", {"content": ready["content"]})
+        yield sse_event("done", {
+            "sources": ready["sources"],
+            "faq_matches": ready["faq_matches"],
+            "llm_bypassed": ready.get("llm_bypassed", False),
+            "session_id": request.session_id
+        })
+        REQUEST_SECONDS.observe(time.perf_counter() - start, "chat_stream")
+    
+    async def event_stream():
+        nonlocal ticket
+        tokens = single_flight.subscribe(
+            cache_key,
+            lambda: upstream_answer(
+                model_deltas(history, faq_matches, messages, stream=True), answer_cache, cache_key, sources, faq_matches
+            )
+        )
+        parts = []
+        try:
+            ticket = await admit_leader(ticket, cache_key)
+            upstream_start = time.perf_counter()
+            async for delta in tokens:
+                if not parts:
+                    add_request_stage("upstream_ttft", time.perf_counter() - upstream_start)
+                parts.append(delta)
+                yield sse_event("token", {"content": delta})
+            add_request_stage("upstream_total", time.perf_counter() - upstream_start)
+            content = "".join(parts)
+            await record_turn(session, new_messages, content)
+            await record_exchange(
+                "chat_stream", tenant, request, start,
+                source="model", answer=content, faq_matches=faq_matches,
+                prompt_tokens=count_message_tokens(messages), completion_tokens=count_tokens(content)
+            )
+            yield sse_event("done", {
+                "sources": sources,
+                "faq_matches": faq_matches,
+                "llm_bypassed": False,
+                "session_id": request.session_id
+            })
+            REQUEST_SECONDS.observe(time.perf_counter() - start, "chat_stream")
+        except Exception as e:
+            await record_exchange("chat_stream", tenant, request, start, status="error", error=str(e))
+            yield sse_event("error", {"detail": f"Chat error: {str(e)}"})
+        finally:
+            # Runs when the client disconnects too; shield it from the
+            # cancellation so the upstream response really gets closed
+            with anyio.CancelScope(shield=True):
+                await tokens.aclose()
+            release(ticket)
+    
+    # The slot is held until the stream ends; the background task also frees
+    # it if the client disconnects before the stream starts
+    return StreamingResponse(
+        ready_stream() if ready is not None else event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release, ticket)
+    )
+
+@app.post("/sessions")
+async def create_session(request: SessionRequest):
+    """Start a server-side conversation, optionally seeded with existing history"""
+    session = await session_store.create(
+        request.user_id,
+        [{"role": msg.role, "content": msg.content} for msg in request.messages]
+    )
+    return {"session_id": session.id, "messages": len(session.messages)}
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    """Get a session's stored history"""
+    session = await session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return {"session_id": session.id, "user_id": session.user_id, "messages": session.messages}
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    """End a session and forget its history"""
+    await session_store.delete(session_id)
+    return {"session_id": session_id, "deleted": True}
+
+@app.get("/stats")
+async def get_stats():
+    """Get answer cache, FAQ fast path, conversation memory, session, coalescing, admission, provider, model routing, knowledge, analytics and slow request counters"""
+    return {
+        "answer_cache": default_tenant.answer_cache.stats(),
+        "faq_fast_path": faq_fast_path.stats(),
+        "conversation_memory": conversation_memory.stats(),
+        "sessions": session_store.stats(),
+        "single_flight": single_flight.stats(),
+        "admission": admission.stats(),
+        "knowledge": default_tenant.knowledge_base.stats(),
+        "providers": llm_client.stats(),
+        "model_routing": model_router.stats(),
+        "tenants": tenants.stats(),
+        "analytics": analytics.stats(),
+        "slow_requests": slow_requests.stats()
+    }
+
+@app.get("/metrics")
+async def get_metrics():
+    """Stage timings, token counts, cache and upstream counters in the Prometheus text format"""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+def require_admin(request: Request):
+    """Allow the request only with the CHATBOT_ADMIN_TOKEN bearer token"""
+    if ADMIN_TOKEN is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode("utf-8"), ADMIN_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=401, detail="Unauthorized", headers={"WWW-Authenticate": "Bearer"})
+
+@app.post("/admin/profile", dependencies=[Depends(require_admin)])
+async def profile(request: ProfileRequest):
+    """Sample the event loop for a time window and return the profile as collapsed stacks
+
+    With percent set, only samples taken while one of that share of requests
+    is in progress are kept. The profile covers the worker that answered.
+    """
+    session = await sampler.profile(request.seconds, request.percent)
+    headers = {"X-Profile-Samples": str(sum(session.samples.values())), "X-Profile-Worker": str(os.getpid())}
+    if request.percent is not None:
+        headers["X-Profile-Requests"] = str(session.picked)
+    return PlainTextResponse(collapse(session.samples), headers=headers)
+
+@app.get("/admin/slow-requests", dependencies=[Depends(require_admin)])
+async def get_slow_requests():
+    """List this worker's recent slow requests with their stage timings, newest first"""
+    return dict(slow_requests.stats(), worker=os.getpid(), requests=slow_requests.summaries())
+
+@app.get("/admin/slow-requests/{entry_id}/profile", dependencies=[Depends(require_admin)])
+async def get_slow_request_profile(entry_id: int):
+    """Return the profile captured during a slow request as collapsed stacks"""
+    entry = slow_requests.get(entry_id)
+    if entry is None or entry["profile"] is None:
+        raise HTTPException(status_code=404, detail="Slow request not found")
+    return PlainTextResponse(collapse(entry["profile"]))
 
 @app.post("/search-faq", response_model=FAQSearchResponse)
-async def search_faq_endpoint(request: FAQSearchRequest):
+async def search_faq_endpoint(request: FAQSearchRequest, tenant: Tenant = Depends(current_tenant)):
     """Search FAQ for specific questions"""
     try:
-        results = search_faq(request.question, request.category)
+        results = tenant.knowledge.search_faq(request.question, request.category, request.top_k)
         return FAQSearchResponse(results=results)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"FAQ search error: {str(e)}")
 
+@app.post("/search-faq/batch")
+async def search_faq_batch_endpoint(request: FAQSearchBatchRequest, tenant: Tenant = Depends(current_tenant)):
+    """Search FAQ for several questions at once; results are in input order"""
+    try:
+        batch = tenant.knowledge.search_faq_batch([(item.question, item.category, item.top_k) for item in request.requests])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"FAQ search error: {str(e)}")
+    return {
+        "results": [
+            {"index": index, "status": 200, "response": {"results": results}}
+            for index, results in enumerate(batch)
+        ]
+    }
+
 @app.get("/faq-categories")
-async def get_faq_categories():
+async def get_faq_categories(request: Request, tenant: Tenant = Depends(current_tenant)):
     """Get all FAQ categories"""
-    categories = list(set([faq["category"] for faq in WEBSITE_KNOWLEDGE["faq"]]))
-    return {"categories": categories}
+    return static_response(tenant, "faq-categories", request)
+
+@app.get("/faq/suggest")
+async def suggest_faq(q: str, limit: int = Query(8, ge=1, le=20), category: Optional[str] = None,
+                      tenant: Tenant = Depends(current_tenant)):
+    """Typeahead completions for FAQ questions and service names"""
+    return {"query": q, "suggestions": tenant.knowledge.suggest(q, limit, category)}
 
 @app.get("/faq/{category}")
-async def get_faq_by_category(category: str):
+async def get_faq_by_category(category: str, tenant: Tenant = Depends(current_tenant)):
     """Get FAQ by category"""
-    category_faq = []
-    for faq_item in WEBSITE_KNOWLEDGE["faq"]:
-        if faq_item["category"].lower() == category.lower():
-            category_faq.extend(faq_item["questions"])
+    category_faq = tenant.knowledge.static_responses.faq_questions.get(category.lower())
     
     if not category_faq:
         raise HTTPException(status_code=404, detail="Category not found")
@@ -221,33 +806,29 @@ async def get_faq_by_category(category: str):
     return {"category": category, "questions": category_faq}
 
 @app.get("/services")
-async def get_services():
+async def get_services(request: Request, tenant: Tenant = Depends(current_tenant)):
     """Get all available services"""
-    return {"services": WEBSITE_KNOWLEDGE["service_categories"]}
+    return static_response(tenant, "services", request)
 
 @app.get("/services/{service_name}")
-async def get_service_details(service_name: str):
+async def get_service_details(service_name: str, tenant: Tenant = Depends(current_tenant)):
     """Get detailed information about a specific service"""
-    service_info = get_service_info(service_name)
+    service_info = tenant.knowledge.get_service_info(service_name)
     if not service_info:
         raise HTTPException(status_code=404, detail="Service not found")
     return service_info
 
 @app.get("/pricing")
-async def get_pricing():
+async def get_pricing(request: Request, tenant: Tenant = Depends(current_tenant)):
     """Get pricing information"""
-    return {"pricing": WEBSITE_KNOWLEDGE["pricing"]}
+    return static_response(tenant, "pricing", request)
 
 @app.get("/contact")
-async def get_contact_info():
+async def get_contact_info(request: Request, tenant: Tenant = Depends(current_tenant)):
     """Get contact information"""
-    return {"contact": WEBSITE_KNOWLEDGE["contact_info"]}
+    return static_response(tenant, "contact", request)
 
 @app.get("/how-it-works")
-async def get_how_it_works():
+async def get_how_it_works(request: Request, tenant: Tenant = Depends(current_tenant)):
     """Get how it works information"""
-    return {"how_it_works": WEBSITE_KNOWLEDGE["how_it_works"]}
-
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    return static_response(tenant, "how-it-works", request)
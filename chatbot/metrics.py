@@ -0,0 +1,361 @@
+"""
+Metrics for ReadyReserve AI Chatbot
+Stage timings, token counts and upstream error counters, exposed in the
+Prometheus text format
+"""
+
+import asyncio
+import bisect
+import contextvars
+import json
+import os
+import time
+from pathlib import Path
+
+# Histogram bucket upper bounds in seconds, from in-process lookups to slow completions
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# (stage, seconds) pairs of the request being handled, while something (the slow request log) collects them
+REQUEST_STAGES = contextvars.ContextVar("request_stages", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """A named family of samples, one per combination of label values
+
+    function, when given, is called at collection time and returns the current
+    value, or a dict from label-value tuples to values, instead of the metric
+    being updated in place.
+    """
+
+    type = "untyped"
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.function = function
+        self._values = {}
+
+    def samples(self):
+        """Return [label values, value] pairs"""
+        if self.function is None:
+            return [[list(labels), value] for labels, value in self._values.items()]
+        values = self.function()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [[list(labels), value] for labels, value in values.items()]
+
+    def snapshot(self):
+        return {
+            "type": self.type,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "samples": self.samples(),
+        }
+
+
+class Counter(Metric):
+    """A value that only goes up (and resets when the process restarts)"""
+
+    type = "counter"
+
+    def inc(self, *labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    """A value that can go up and down"""
+
+    type = "gauge"
+
+    def set(self, value, *labels):
+        self._values[labels] = value
+
+
+class Histogram(Metric):
+    """Observation counts in fixed buckets, with their sum
+
+    observe() costs one bisect and two additions, so it is cheap enough to
+    call on every request.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def time(self, *labels):
+        """Observe the wall time spent in the with block"""
+        return _Timer(self, labels)
+
+    def samples(self):
+        """Return [label values, per-bucket counts, sum] triples"""
+        return [[list(labels), list(counts), total] for labels, (counts, total) in self._values.items()]
+
+    def snapshot(self):
+        return dict(super().snapshot(), buckets=list(self.buckets))
+
+
+def add_request_stage(stage, seconds):
+    """Add a stage's time to the current request's REQUEST_STAGES, when set"""
+    stages = REQUEST_STAGES.get()
+    if stages is not None:
+        stages.append((stage, seconds))
+
+
+class StageHistogram(Histogram):
+    """A histogram labelled by stage that also adds each observation to REQUEST_STAGES when set
+
+    Upstream calls may serve several requests (coalesced requests share one
+    call, a hedged call runs two attempts), so they are observed with
+    observe_shared() and each request adds the time it waited for the answer
+    with add_request_stage().
+    """
+
+    def observe(self, value, *labels):
+        super().observe(value, *labels)
+        add_request_stage(labels[0], value)
+
+    def observe_shared(self, value, *labels):
+        """Observe work done on behalf of several requests, without crediting the current one"""
+        super().observe(value, *labels)
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _merge(families, snapshot, include_gauges=True):
+    for name, family in snapshot.items():
+        if family["type"] == "gauge" and not include_gauges:
+            continue
+        merged = families.get(name)
+        if merged is None:
+            families[name] = dict(family, samples=[list(sample) for sample in family["samples"]])
+            continue
+        index = {tuple(sample[0]): sample for sample in merged["samples"]}
+        for sample in family["samples"]:
+            existing = index.get(tuple(sample[0]))
+            if existing is None:
+                merged["samples"].append(list(sample))
+            elif family["type"] == "histogram":
+                existing[1] = [a + b for a, b in zip(existing[1], sample[1])]
+                existing[2] += sample[2]
+            else:
+                existing[1] += sample[1]
+
+
+class Registry:
+    """The process's metrics, rendered for a Prometheus scrape
+
+    With directory set, every worker of a pre-forked server periodically
+    writes its snapshot to <directory>/<pid>.json and a scrape of any worker
+    sums them, so the numbers do not depend on which worker answered. Counters
+    and histograms of workers that have exited are kept, so totals do not drop
+    when a worker is replaced; their gauges are not.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory) if directory else None
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=(), function=None):
+        return self.register(Counter(name, documentation, labelnames, function))
+
+    def gauge(self, name, documentation, labelnames=(), function=None):
+        return self.register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self):
+        """Return this process's metrics as a JSON-serializable dict"""
+        return {metric.name: metric.snapshot() for metric in self.metrics}
+
+    def clear_directory(self):
+        """Drop the snapshots of a previous run; call before starting the workers"""
+        if self.directory is None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for path in self.directory.glob("*.json"):
+            path.unlink(missing_ok=True)
+
+    def write(self):
+        """Write this process's snapshot to the shared directory"""
+        if self.directory is None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{os.getpid()}.json"
+        temporary = path.with_suffix(".tmp")
+        temporary.write_text(json.dumps(self.snapshot()), encoding="utf-8")
+        os.replace(temporary, path)
+
+    async def flush(self, interval):
+        """Write the snapshot every interval seconds; runs until cancelled"""
+        if self.directory is None:
+            return
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                self.write()
+        finally:
+            self.write()
+
+    def collect(self):
+        """Return the metric families of this process, or of all workers with a directory"""
+        families = {}
+        _merge(families, self.snapshot())
+        if self.directory is None:
+            return families
+        self.write()
+        for path in self.directory.glob("*.json"):
+            pid = int(path.stem)
+            if pid == os.getpid():
+                continue
+            try:
+                snapshot = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue  # replaced or removed while reading
+            _merge(families, snapshot, include_gauges=_pid_alive(pid))
+        return families
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format"""
+        lines = []
+        for name, family in self.collect().items():
+            lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['type']}")
+            names = family["labelnames"]
+            if family["type"] != "histogram":
+                for labels, value in family["samples"]:
+                    lines.append(f"{name}{_labels(names, labels)} {_number(value)}")
+                continue
+            bounds = [_number(float(bound)) for bound in family["buckets"]] + ["+Inf"]
+            for labels, counts, total in family["samples"]:
+                cumulative = 0
+                for bound, count in zip(bounds, counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(names, labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_sum{_labels(names, labels)} {_number(total)}")
+                lines.append(f"{name}_count{_labels(names, labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry(os.getenv("CHATBOT_METRICS_DIR") or None)
+
+STAGE_SECONDS = REGISTRY.register(StageHistogram(
+    "chatbot_stage_seconds",
+    "Time spent in each stage of answering a chat request",
+    ("stage",),
+))
+REQUEST_SECONDS = REGISTRY.histogram(
+    "chatbot_request_seconds",
+    "Chat request latency by endpoint, until the answer is complete",
+    ("endpoint",),
+)
+CHAT_ANSWERS = REGISTRY.counter(
+    "chatbot_chat_answers_total",
+    "Chat answers by where they came from (cache, fast_path or model)",
+    ("source",),
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    "chatbot_cache_lookups_total",
+    "Answer cache lookups by result",
+    ("result",),
+)
+PROMPT_TOKENS = REGISTRY.counter(
+    "chatbot_prompt_tokens_total",
+    "Prompt tokens sent upstream, as reported by the provider or estimated for streams",
+    ("source",),
+)
+COMPLETION_TOKENS = REGISTRY.counter(
+    "chatbot_completion_tokens_total",
+    "Completion tokens received, as reported by the provider or estimated for streams",
+    ("source",),
+)
+UPSTREAM_REQUESTS = REGISTRY.counter(
+    "chatbot_upstream_requests_total",
+    "Upstream completion requests by mode (complete or stream), not counting retries",
+    ("mode",),
+)
+UPSTREAM_ERRORS = REGISTRY.counter(
+    "chatbot_upstream_errors_total",
+    "Failed upstream attempts by error type",
+    ("error",),
+)
+UPSTREAM_RETRIES = REGISTRY.counter(
+    "chatbot_upstream_retries_total",
+    "Upstream attempts retried after a transient error",
+)
+BACKEND_ATTEMPTS = REGISTRY.counter(
+    "chatbot_backend_attempts_total",
+    "Upstream attempts per backend by outcome: won, failed, or cancelled after another backend won",
+    ("backend", "outcome"),
+)
+HEDGED_REQUESTS = REGISTRY.counter(
+    "chatbot_hedged_requests_total",
+    "Upstream requests sent to a second backend because the first was slower than its hedge delay",
+)
+FAILOVERS = REGISTRY.counter(
+    "chatbot_failovers_total",
+    "Upstream requests moved to the next backend after a failure",
+)
+ROUTED_REQUESTS = REGISTRY.counter(
+    "chatbot_routed_requests_total",
+    "Model calls by route (fast or full) and the rule that chose it",
+    ("route", "reason"),
+)
+ROUTE_SECONDS = REGISTRY.histogram(
+    "chatbot_route_upstream_seconds",
+    "Upstream answer time by model route, until the answer is complete",
+    ("route",),
+)
@@ -0,0 +1,157 @@
+"""
+Model Router for ReadyReserve AI Chatbot
+Sends short factual questions to a faster model with a tight token limit and
+open-ended ones to the full model
+"""
+
+import os
+import time
+
+from search_index import TOKEN_PATTERN, normalize_token
+from metrics import ROUTE_SECONDS, ROUTED_REQUESTS
+
+# Facts the website knowledge answers in a sentence or two
+FACTUAL_TOPICS = {
+    "contact": "contact phone number call email mail address office located location reach",
+    "hours": "hour open opening close closed weekend weekday available availability",
+    "pricing": "price pricing cost much fee charge month monthly annual year yearly plan starter "
+               "professional enterprise tier discount trial",
+    "social": "twitter linkedin facebook instagram social",
+}
+
+TOPIC_OF = {normalize_token(word): topic for topic, words in FACTUAL_TOPICS.items() for word in words.split()}
+
+# Words that ask for advice, design or comparison rather than a fact
+CONSULTATIVE_WORDS = frozenset(normalize_token(word) for word in """
+recommend recommendation suggest advise advice strategy roadmap design build architect implement
+automate automation automating workflow integrate integrating migrate migration compare comparison
+versus vs difference best should tailor custom customize optimize improve scale explain why
+""".split())
+
+# Phrases that describe the user's own situation, typical of consultative questions
+CONSULTATIVE_PHRASES = ("how can we", "how do we", "how should", "help us", "help me", "our business",
+                        "our team", "our company", "we need", "we want", "we have", "i need", "i want")
+
+FAST = "fast"
+FULL = "full"
+
+
+class Route:
+    """A routing decision: the route, why it was chosen, and the completion parameters it sets"""
+
+    __slots__ = ("name", "reason", "params")
+
+    def __init__(self, name, reason, params):
+        self.name = name
+        self.reason = reason
+        self.params = params
+
+
+class ModelRouter:
+    """Picks the completion model and limits for a conversation from its last user message
+
+    The rules, in order: a long conversation, a long question or a
+    consultative cue (advice, design, comparison, the user's own situation)
+    goes to the full model; a question about a factual topic the website
+    knowledge covers (contact details, hours, pricing, social accounts), or
+    one with a confident FAQ match, goes to the fast route; anything else
+    goes to the full model. The fast route asks each provider for its fast
+    model (its usual model when it has none) with fast_max_tokens and
+    fast_temperature.
+
+    Upstream time is recorded per route. The latency saved is estimated as
+    the difference between the mean time of the full and fast routes, times
+    the fast route's count.
+    """
+
+    def __init__(self, enabled=True, fast_max_tokens=250, fast_temperature=0.3,
+                 max_fast_words=20, max_fast_turns=6, faq_confidence=0.5):
+        self.enabled = enabled
+        self.fast_params = {"fast": True, "max_tokens": fast_max_tokens, "temperature": fast_temperature}
+        self.max_fast_words = max_fast_words
+        self.max_fast_turns = max_fast_turns
+        self.faq_confidence = faq_confidence
+        self.decisions = {}
+        self.latency = {FAST: [0, 0.0], FULL: [0, 0.0]}
+
+    @classmethod
+    def from_env(cls):
+        """Build from CHATBOT_ROUTING / CHATBOT_FAST_MAX_TOKENS / CHATBOT_FAST_TEMPERATURE /
+        CHATBOT_FAST_MAX_WORDS / CHATBOT_FAST_MAX_TURNS / CHATBOT_FAST_FAQ_CONFIDENCE
+        (the fast models themselves are provider settings, see LLMClient.from_env)"""
+        return cls(
+            enabled=os.getenv("CHATBOT_ROUTING", "1") != "0",
+            fast_max_tokens=int(os.getenv("CHATBOT_FAST_MAX_TOKENS", "250")),
+            fast_temperature=float(os.getenv("CHATBOT_FAST_TEMPERATURE", "0.3")),
+            max_fast_words=int(os.getenv("CHATBOT_FAST_MAX_WORDS", "20")),
+            max_fast_turns=int(os.getenv("CHATBOT_FAST_MAX_TURNS", "6")),
+            faq_confidence=float(os.getenv("CHATBOT_FAST_FAQ_CONFIDENCE", "0.5")),
+        )
+
+    def classify(self, history, faq_matches):
+        """Return (route name, reason) for a conversation"""
+        if not self.enabled:
+            return FULL, "disabled"
+        user_turns = [message["content"] for message in history if message["role"] == "user"]
+        if not user_turns:
+            return FULL, "default"
+        if len(user_turns) > self.max_fast_turns:
+            return FULL, "long_conversation"
+        raw_words = TOKEN_PATTERN.findall(user_turns[-1].lower())
+        if len(raw_words) > self.max_fast_words:
+            return FULL, "long_question"
+        words = [normalize_token(word) for word in raw_words]
+        question = f" {' '.join(raw_words)} "
+        if any(word in CONSULTATIVE_WORDS for word in words) or any(
+                f" {phrase} " in question for phrase in CONSULTATIVE_PHRASES):
+            return FULL, "consultative"
+        for word in words:
+            topic = TOPIC_OF.get(word)
+            if topic is not None:
+                return FAST, topic
+        if faq_matches and faq_matches[0]["confidence"] >= self.faq_confidence:
+            return FAST, "faq_match"
+        return FULL, "default"
+
+    def route(self, history, faq_matches):
+        """Decide the route for a model call and count the decision"""
+        name, reason = self.classify(history, faq_matches)
+        key = (name, reason)
+        self.decisions[key] = self.decisions.get(key, 0) + 1
+        ROUTED_REQUESTS.inc(name, reason)
+        return Route(name, reason, self.fast_params if name == FAST else {})
+
+    async def timed(self, route, deltas):
+        """Relay an upstream answer's deltas, recording its time under the route once complete"""
+        start = time.perf_counter()
+        try:
+            async for delta in deltas:
+                yield delta
+        finally:
+            await deltas.aclose()
+        elapsed = time.perf_counter() - start
+        ROUTE_SECONDS.observe(elapsed, route.name)
+        entry = self.latency[route.name]
+        entry[0] += 1
+        entry[1] += elapsed
+
+    def _mean_ms(self, name):
+        count, total = self.latency[name]
+        return round(total / count * 1000, 1) if count else None
+
+    def stats(self):
+        """Return decisions by route and reason, mean upstream time per route and the estimated time saved"""
+        fast_mean, full_mean = self._mean_ms(FAST), self._mean_ms(FULL)
+        saved_per_request = round(full_mean - fast_mean, 1) if fast_mean is not None and full_mean is not None else None
+        return {
+            "enabled": self.enabled,
+            "fast_params": self.fast_params,
+            "decisions": {f"{name}:{reason}": count for (name, reason), count in sorted(self.decisions.items())},
+            "routes": {
+                name: {"completed": self.latency[name][0], "mean_upstream_ms": self._mean_ms(name)}
+                for name in (FAST, FULL)
+            },
+            "estimated_saved_ms_per_fast_request": saved_per_request,
+            "estimated_saved_seconds": round(saved_per_request * self.latency[FAST][0] / 1000, 3)
+            if saved_per_request is not None else None,
+        }
@@ -0,0 +1,291 @@
+"""
+Profiling for ReadyReserve AI Chatbot
+A sampling profiler for the event loop thread, with on-demand profiles in the
+collapsed-stack format flamegraph tools read, and a log of slow requests
+"""
+
+import asyncio
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+from metrics import REQUEST_STAGES
+from tenants import TENANT_PATH_PREFIX
+
+# Distinct stack strings kept for sharing before the table is reset
+MAX_DISTINCT_STACKS = 100000
+
+# Paths the slow request log ignores (the admin endpoints themselves wait on purpose),
+# also under a /t/{tenant} prefix
+IGNORED_PREFIXES = ("/admin/",)
+
+
+def route_path(path):
+    """The path without a /t/{tenant} prefix, as the routes see it"""
+    if path.startswith(TENANT_PATH_PREFIX):
+        return "/" + path[len(TENANT_PATH_PREFIX):].partition("/")[2]
+    return path
+
+
+def collapse(profile):
+    """Render {stack: count} as collapsed-stack lines ("root;caller;callee count"), most sampled first"""
+    return "".join(f"{stack} {count}\n" for stack, count in profile.most_common())
+
+
+class ProfileSession:
+    """Samples collected for one admin request
+
+    Without percent, every sample taken during the session counts. With percent,
+    that share of requests is picked as they start, and only samples taken
+    while a picked request is in progress count.
+    """
+
+    def __init__(self, seconds, percent=None):
+        self.seconds = seconds
+        self.percent = percent
+        self.picked = 0
+        self.in_progress = 0
+        self.samples = Counter()
+
+    def wants_sample(self):
+        return self.percent is None or self.in_progress > 0
+
+
+class StackSampler:
+    """Samples the Python stack of the event loop thread from a background thread
+
+    Every interval seconds the sampler reads the loop thread's current frame
+    and records it as one "file:function" string per frame, outermost first.
+    The loop runs every request, so a sample shows what the process was doing
+    for whichever request held the loop; samples taken while the loop waits
+    for I/O end in the loop's own run frame. Samples are taken only while something needs
+    them: the slow request log, which keeps the last history_seconds of
+    samples so it can attach them to a request that turns out slow, or a
+    profile session.
+    """
+
+    def __init__(self, interval=0.01, history_seconds=120.0):
+        self.interval = interval
+        self.history = deque(maxlen=max(1, int(history_seconds / interval)))
+        self.keep_history = False
+        self.sessions = []
+        self.samples = 0
+        self._thread_id = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._labels = {}
+        self._stacks = {}
+
+    @classmethod
+    def from_env(cls):
+        """Build from CHATBOT_PROFILE_INTERVAL_MS / CHATBOT_PROFILE_HISTORY_SECONDS"""
+        return cls(
+            interval=float(os.getenv("CHATBOT_PROFILE_INTERVAL_MS", "10")) / 1000,
+            history_seconds=float(os.getenv("CHATBOT_PROFILE_HISTORY_SECONDS", "120")),
+        )
+
+    def start(self, keep_history=None):
+        """Start sampling the calling thread (the event loop's); safe to call again"""
+        if keep_history is not None:
+            self.keep_history = keep_history
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            # co_qualname is new in Python 3.11; older versions only have the bare name
+            name = getattr(code, "co_qualname", code.co_name)
+            label = self._labels[code] = f"{os.path.basename(code.co_filename)}:{name}"
+        return label
+
+    def _stack(self, frame):
+        labels = []
+        while frame is not None:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        stack = ";".join(reversed(labels))
+        if len(self._stacks) >= MAX_DISTINCT_STACKS:
+            self._stacks.clear()
+        # Share one string per distinct stack between the history and the sessions
+        return self._stacks.setdefault(stack, stack)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            wanted = [session for session in self.sessions if session.wants_sample()]
+            if not self.keep_history and not wanted:
+                continue
+            now = time.monotonic()
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                return  # the loop thread has exited
+            stack = self._stack(frame)
+            del frame
+            self.samples += 1
+            if self.keep_history:
+                self.history.append((now, stack))
+            for session in wanted:
+                session.samples[stack] += 1
+
+    def between(self, start, end):
+        """Return {stack: count} of the history samples taken between two time.monotonic() readings"""
+        profile = Counter()
+        # Copied first: the sampler thread appends while this runs
+        for taken, stack in reversed(list(self.history)):
+            if taken < start:
+                break
+            if taken <= end:
+                profile[stack] += 1
+        return profile
+
+    async def profile(self, seconds, percent=None):
+        """Sample for seconds (or only during percent of requests in that time) and return the session"""
+        session = ProfileSession(seconds, percent)
+        self.start()
+        self.sessions = self.sessions + [session]
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            self.sessions = [other for other in self.sessions if other is not session]
+        # A sample may still be landing; read a copy
+        session.samples = Counter(dict(session.samples))
+        return session
+
+    def request_started(self):
+        """Pick the request for percentage sessions; return the sessions that picked it"""
+        picked = []
+        for session in self.sessions:
+            if session.percent is not None and random.random() * 100 < session.percent:
+                session.picked += 1
+                session.in_progress += 1
+                picked.append(session)
+        return picked
+
+    @staticmethod
+    def request_finished(picked):
+        for session in picked:
+            session.in_progress -= 1
+
+
+class SlowRequestLog:
+    """The most recent requests slower than threshold_ms, with their stage timings and profile
+
+    With profile set, each entry also gets the sampler's history for the
+    time the request was in progress. The sampler sees the whole event loop,
+    so that profile covers every request in progress at the time, not only
+    the slow one. Keeping the history means sampling all the time, so it is
+    off by default.
+    """
+
+    def __init__(self, threshold_ms=5000.0, capacity=50, profile=False):
+        self.threshold_ms = threshold_ms
+        self.capacity = capacity
+        self.profile = profile
+        self.entries = deque(maxlen=capacity)
+        self.captured = 0
+        self._ids = itertools.count(1)
+
+    @classmethod
+    def from_env(cls):
+        """Build from CHATBOT_SLOW_REQUEST_MS (0 disables) / CHATBOT_SLOW_REQUEST_LOG_SIZE /
+        CHATBOT_SLOW_REQUEST_PROFILE"""
+        return cls(
+            threshold_ms=float(os.getenv("CHATBOT_SLOW_REQUEST_MS", "5000")),
+            capacity=int(os.getenv("CHATBOT_SLOW_REQUEST_LOG_SIZE", "50")),
+            profile=os.getenv("CHATBOT_SLOW_REQUEST_PROFILE", "0") == "1",
+        )
+
+    @property
+    def enabled(self):
+        return self.threshold_ms > 0
+
+    def add(self, scope, status, duration, stages, profile):
+        stage_totals = {}
+        for stage, seconds in stages:
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+        self.captured += 1
+        self.entries.append({
+            "id": next(self._ids),
+            "time": time.time() - duration,
+            "method": scope["method"],
+            "path": scope["path"],
+            "status": status,
+            "duration_ms": round(duration * 1000, 1),
+            "stages_ms": {stage: round(seconds * 1000, 2) for stage, seconds in stage_totals.items()},
+            "samples": sum(profile.values()) if profile is not None else None,
+            "profile": profile,
+        })
+
+    def get(self, entry_id):
+        for entry in self.entries:
+            if entry["id"] == entry_id:
+                return entry
+        return None
+
+    def summaries(self):
+        """Return the entries without their profiles, newest first"""
+        return [
+            {key: value for key, value in entry.items() if key != "profile"}
+            for entry in reversed(self.entries)
+        ]
+
+    def stats(self):
+        return {
+            "threshold_ms": self.threshold_ms,
+            "captured": self.captured,
+            "kept": len(self.entries),
+            "capacity": self.capacity,
+        }
+
+
+class ProfilingMiddleware:
+    """Times every HTTP request, collects its stage timings and logs it if it is slow
+
+    Also picks requests for percentage profile sessions. The request's
+    duration runs until its response (including a streamed body) is sent.
+    """
+
+    def __init__(self, app, sampler, slow_requests):
+        self.app = app
+        self.sampler = sampler
+        self.slow_requests = slow_requests
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or route_path(scope["path"]).startswith(IGNORED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+        status = None
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        picked = self.sampler.request_started() if self.sampler.sessions else ()
+        stages = []
+        token = REQUEST_STAGES.set(stages)
+        start = time.monotonic()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            end = time.monotonic()
+            REQUEST_STAGES.reset(token)
+            self.sampler.request_finished(picked)
+            if self.slow_requests.enabled and (end - start) * 1000 >= self.slow_requests.threshold_ms:
+                profile = self.sampler.between(start, end) if self.slow_requests.profile else None
+                self.slow_requests.add(scope, status or 500, end - start, stages, profile)
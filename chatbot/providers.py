@@ -0,0 +1,384 @@
+"""
+LLM Providers for ReadyReserve AI Chatbot
+An ordered list of OpenAI-compatible backends with hedged requests, failover
+and per-backend circuit breakers
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+
+import openai
+
+from admission import AdmissionRejected
+from llm_client import RETRYABLE_ERRORS, LLMClient
+from metrics import BACKEND_ATTEMPTS, FAILOVERS, HEDGED_REQUESTS
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class ProvidersUnavailable(AdmissionRejected):
+    """Every backend's circuit is open; answered like an overload, with a 503 and Retry-After"""
+
+    def __init__(self, retry_after):
+        super().__init__(503, "AI providers are temporarily unavailable", retry_after)
+
+
+def backend_fault(error):
+    """Whether an attempt failed because of the backend, so another may succeed
+
+    Connection errors, timeouts, rate limits and 5xx count against the
+    backend's circuit and fail over. Other errors (4xx) mean the request
+    itself was refused, and every backend would refuse it.
+    """
+    if isinstance(error, RETRYABLE_ERRORS + (asyncio.TimeoutError,)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+class CircuitBreaker:
+    """Stops sending requests to a backend whose recent calls mostly failed
+
+    Closed, it records the outcome of the last window calls and opens once at
+    least min_calls are recorded and failure_rate of them failed. Open, it
+    refuses every call for cooldown seconds. Then it lets one probe call
+    through (half open): a success closes it, a failure opens it again.
+    """
+
+    def __init__(self, failure_rate=0.5, window=20, min_calls=10, cooldown=15.0):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.opened = 0
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self):
+        """Return whether a call may go to the backend now; a half-open breaker admits one probe"""
+        if self.state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+            self._probing = False
+        if self.state == HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+        return self.state == CLOSED
+
+    def record(self, success):
+        if self.state == HALF_OPEN:
+            if success:
+                self.state = CLOSED
+                self._outcomes.clear()
+            else:
+                self._open()
+            return
+        self._outcomes.append(success)
+        if len(self._outcomes) >= self.min_calls:
+            failures = self._outcomes.count(False)
+            if failures >= self.failure_rate * len(self._outcomes):
+                self._open()
+
+    def abandon(self):
+        """The allowed call was cancelled before it finished; let another probe through"""
+        self._probing = False
+
+    def _open(self):
+        self.state = OPEN
+        self.opened += 1
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+    def retry_after(self):
+        """Seconds until the breaker lets a probe through"""
+        if self.state != OPEN:
+            return 0
+        return max(1, math.ceil(self.cooldown - (time.monotonic() - self._opened_at)))
+
+
+class LatencyWindow:
+    """The most recent latencies of one kind of call, for percentile estimates"""
+
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+
+    def add(self, seconds):
+        self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, percent):
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+class Backend:
+    """One OpenAI-compatible provider: its client, circuit breaker and latency history
+
+    Latency is tracked separately for completions (total time) and streams
+    (time to the first token), the points at which a hedge would be sent.
+    """
+
+    def __init__(self, name, client, breaker):
+        self.name = name
+        self.client = client
+        self.breaker = breaker
+        self.latency = {"complete": LatencyWindow(), "stream": LatencyWindow()}
+        self.won = 0
+        self.failed = 0
+        self.cancelled = 0
+
+    def stats(self, percent):
+        return {
+            "model": self.client.model,
+            "fast_model": self.client.fast_model,
+            "base_url": self.client.base_url,
+            "circuit": self.breaker.state,
+            "circuit_opened": self.breaker.opened,
+            "won": self.won,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            **{
+                f"{mode}_p{percent:g}_ms": round(window.percentile(percent) * 1000, 1) if len(window) else None
+                for mode, window in self.latency.items()
+            },
+        }
+
+
+class ProviderPool:
+    """Chat completions over an ordered list of backends, with the LLMClient interface
+
+    A request goes to the first backend whose circuit is closed. If it has not
+    answered (for streams, sent its first token) within a hedge delay, taken
+    from that backend's recent latency at hedge_percentile, the request is
+    also sent to the next backend; the first to answer wins and the other is
+    cancelled. A failed attempt moves the request on to the next backend at
+    once. Each backend keeps its own client, so its connection pool,
+    concurrency cap and retries are its own. When every circuit is open the
+    request fails fast with ProvidersUnavailable.
+    """
+
+    def __init__(self, backends, hedging=True, hedge_percentile=95.0, hedge_min_samples=20,
+                 hedge_initial_delay=2.0, hedge_min_delay=0.05, hedge_max_delay=10.0):
+        self.backends = backends
+        self.hedging = hedging and len(backends) > 1
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_initial_delay = hedge_initial_delay
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_delay = hedge_max_delay
+        self.hedged = 0
+        self.failovers = 0
+
+    @classmethod
+    def from_env(cls):
+        """Build from CHATBOT_PROVIDERS (comma-separated names, in order of preference; unset means
+        one backend from the OPENAI_* settings) / CHATBOT_HEDGING / CHATBOT_HEDGE_PERCENTILE /
+        CHATBOT_HEDGE_INITIAL_DELAY / CHATBOT_HEDGE_MIN_DELAY / CHATBOT_HEDGE_MAX_DELAY /
+        CHATBOT_BREAKER_FAILURE_RATE / CHATBOT_BREAKER_WINDOW / CHATBOT_BREAKER_MIN_CALLS /
+        CHATBOT_BREAKER_COOLDOWN"""
+        def breaker():
+            return CircuitBreaker(
+                failure_rate=float(os.getenv("CHATBOT_BREAKER_FAILURE_RATE", "0.5")),
+                window=int(os.getenv("CHATBOT_BREAKER_WINDOW", "20")),
+                min_calls=int(os.getenv("CHATBOT_BREAKER_MIN_CALLS", "10")),
+                cooldown=float(os.getenv("CHATBOT_BREAKER_COOLDOWN", "15")),
+            )
+
+        names = [name.strip() for name in os.getenv("CHATBOT_PROVIDERS", "").split(",") if name.strip()]
+        if names:
+            backends = [Backend(name, LLMClient.from_env(name), breaker()) for name in names]
+        else:
+            backends = [Backend("openai", LLMClient.from_env(), breaker())]
+        return cls(
+            backends,
+            hedging=os.getenv("CHATBOT_HEDGING", "1") != "0",
+            hedge_percentile=float(os.getenv("CHATBOT_HEDGE_PERCENTILE", "95")),
+            hedge_initial_delay=float(os.getenv("CHATBOT_HEDGE_INITIAL_DELAY", "2")),
+            hedge_min_delay=float(os.getenv("CHATBOT_HEDGE_MIN_DELAY", "0.05")),
+            hedge_max_delay=float(os.getenv("CHATBOT_HEDGE_MAX_DELAY", "10")),
+        )
+
+    @property
+    def model(self):
+        return self.backends[0].client.model
+
+    def hedge_delay(self, backend, mode):
+        """Seconds to wait for backend before hedging: its latency percentile, once it has enough samples"""
+        window = backend.latency[mode]
+        if len(window) < self.hedge_min_samples:
+            return self.hedge_initial_delay
+        delay = window.percentile(self.hedge_percentile)
+        return min(self.hedge_max_delay, max(self.hedge_min_delay, delay))
+
+    def _candidates(self):
+        """Backends in order of preference, skipping open circuits; checked lazily, as each is needed"""
+        for backend in self.backends:
+            if backend.breaker.allow():
+                yield backend
+
+    def _retry_after(self):
+        return min(backend.breaker.retry_after() for backend in self.backends) or 1
+
+    async def _attempt(self, backend, mode, call):
+        start = time.perf_counter()
+        result = await call(backend)
+        backend.latency[mode].add(time.perf_counter() - start)
+        return result
+
+    async def _race(self, mode, call, discard=None):
+        """Run call(backend) with hedging and failover; return the winning backend and its result
+
+        discard(result) releases the result of an attempt that finished
+        successfully after another had already won.
+        """
+        candidates = self._candidates()
+        backend = next(candidates, None)
+        if backend is None:
+            raise ProvidersUnavailable(self._retry_after())
+        running = {asyncio.create_task(self._attempt(backend, mode, call)): backend}
+        can_hedge = self.hedging
+        last_error = None
+        try:
+            while running:
+                timeout = None
+                if can_hedge and len(running) == 1:
+                    timeout = self.hedge_delay(next(iter(running.values())), mode)
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Slower than usual: send the request to the next backend too, once
+                    can_hedge = False
+                    backend = next(candidates, None)
+                    if backend is not None:
+                        self.hedged += 1
+                        HEDGED_REQUESTS.inc()
+                        running[asyncio.create_task(self._attempt(backend, mode, call))] = backend
+                    continue
+                winner = None
+                refused = None
+                failed = 0
+                for task in done:
+                    backend = running.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        if backend_fault(e):
+                            last_error = e
+                            failed += 1
+                            self._finished(backend, "failed")
+                        else:
+                            refused = e
+                            backend.breaker.abandon()
+                            self._finished(backend, "failed", record=False)
+                        continue
+                    if winner is None:
+                        winner = (backend, result)
+                        self._finished(backend, "won")
+                    else:
+                        # Both finished in the same tick; the loser still succeeded
+                        backend.breaker.record(True)
+                        self._finished(backend, "cancelled", record=False)
+                        if discard is not None:
+                            await discard(result)
+                if winner is not None:
+                    return winner
+                if refused is not None:
+                    raise refused
+                # Replace each failed attempt with the next backend, so a failed hedge
+                # does not leave the request waiting on the slow attempt alone
+                for _ in range(failed):
+                    backend = next(candidates, None)
+                    if backend is None:
+                        break
+                    self.failovers += 1
+                    FAILOVERS.inc()
+                    running[asyncio.create_task(self._attempt(backend, mode, call))] = backend
+            if last_error is None:
+                raise ProvidersUnavailable(self._retry_after())
+            raise last_error
+        finally:
+            for task, backend in running.items():
+                task.cancel()
+                backend.breaker.abandon()
+                self._finished(backend, "cancelled", record=False)
+            if running:
+                results = await asyncio.gather(*running, return_exceptions=True)
+                # An attempt may have finished between the winner being picked and its cancellation
+                if discard is not None:
+                    for result in results:
+                        if not isinstance(result, BaseException):
+                            await discard(result)
+
+    def _finished(self, backend, outcome, record=True):
+        setattr(backend, outcome, getattr(backend, outcome) + 1)
+        BACKEND_ATTEMPTS.inc(backend.name, outcome)
+        if record:
+            backend.breaker.record(outcome == "won")
+
+    async def complete(self, messages, **params):
+        """Create a chat completion on the fastest healthy backend"""
+        backend, response = await self._race("complete", lambda backend: backend.client.complete(messages, **params))
+        return response
+
+    async def stream(self, messages, **params):
+        """Yield completion text deltas from the backend that sends the first token soonest
+
+        Once a token has been sent the stream is committed to that backend, so a
+        failure after it is not retried elsewhere; it counts against the
+        backend's circuit and is raised.
+        """
+        async def first_delta(backend):
+            deltas = backend.client.stream(messages, **params)
+            try:
+                return deltas, await deltas.__anext__()
+            except StopAsyncIteration:
+                return deltas, None
+            except BaseException:
+                await deltas.aclose()
+                raise
+
+        async def discard(result):
+            await result[0].aclose()
+
+        backend, (deltas, first) = await self._race("stream", first_delta, discard)
+        try:
+            if first is None:
+                return
+            yield first
+            async for delta in deltas:
+                yield delta
+        except Exception as e:
+            if backend_fault(e):
+                backend.breaker.record(False)
+            raise
+        finally:
+            await deltas.aclose()
+
+    async def aclose(self):
+        """Close every backend's connection pool"""
+        for backend in self.backends:
+            await backend.client.aclose()
+
+    def stats(self):
+        """Return per-backend circuit, outcome and latency figures"""
+        return {
+            "hedging": self.hedging,
+            "hedged": self.hedged,
+            "failovers": self.failovers,
+            "backends": {
+                backend.name: dict(
+                    backend.stats(self.hedge_percentile),
+                    hedge_delay_ms=round(self.hedge_delay(backend, "complete") * 1000, 1),
+                )
+                for backend in self.backends
+            },
+        }
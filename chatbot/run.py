@@ -1,7 +1,11 @@
 #!/usr/bin/env python3
 """
 Startup script for ReadyReserve AI Chatbot Service
+
+    python run.py                 development: one process, auto-reload
+    python run.py --production    pre-forked workers (also CHATBOT_ENV=production)
 """
+import argparse
 import uvicorn
 import os
 from dotenv import load_dotenv
@@ -9,16 +13,40 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+
+def run_production(workers=None):
+    """Run pre-forked workers: share sessions for the worker count, import the app once, supervise"""
+    from server import Supervisor, default_workers, share_sessions
+    
+    workers = workers or int(os.getenv("CHATBOT_WORKERS", "0")) or default_workers()
+    share_sessions(workers)
+    
+    # Importing main loads the knowledge base, indexes and prompt once, before the workers fork
+    from main import app
+    
+    supervisor = Supervisor.from_env(app)
+    supervisor.workers = workers
+    supervisor.run()
+
+
 if __name__ == "__main__":
-    print("🤖 Starting ReadyReserve AI Ready Assistant Service...")
-    print("📚 Loaded comprehensive website knowledge base")
-    print("🔗 API Documentation: http://localhost:8001/docs")
-    print("💬 Chat endpoint: http://localhost:8001/chat")
+    parser = argparse.ArgumentParser(description="Run the ReadyReserve AI chatbot service")
+    parser.add_argument("--production", action="store_true", help="run pre-forked workers without reload")
+    parser.add_argument("--workers", type=int, help="worker processes in production (default: CHATBOT_WORKERS or one per core)")
+    args = parser.parse_args()
     
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=8001,
-        reload=True,
-        log_level="info"
-    )
+    if args.production or os.getenv("CHATBOT_ENV") == "production":
+        run_production(args.workers)
+    else:
+        print("🤖 Starting ReadyReserve AI Ready Assistant Service...")
+        print("📚 Loaded comprehensive website knowledge base")
+        print("🔗 API Documentation: http://localhost:8001/docs")
+        print("💬 Chat endpoint: http://localhost:8001/chat")
+        
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=8001,
+            reload=True,
+            log_level="info"
+        )
@@ -0,0 +1,124 @@
+"""
+Search Index for ReadyReserve AI Chatbot
+Tokenizer and BM25 inverted index shared by FAQ search and knowledge retrieval
+"""
+
+import heapq
+import math
+import re
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from has have how i if in is it its me my
+of on or our so that the their there this to was we what when where which who why
+will with you your
+""".split())
+
+
+def normalize_token(token):
+    """Fold simple plurals so "plans" and "plan" share a posting list"""
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Split text into normalized, stopword-free search terms"""
+    return [
+        normalize_token(token)
+        for token in TOKEN_PATTERN.findall(text.lower())
+        if token not in STOPWORDS
+    ]
+
+
+class BM25Index:
+    """BM25 inverted index with posting lists per document group
+
+    Documents are (group, tokens) pairs and are identified by their position.
+    Term impacts are precomputed at build time. Queries walk the rarest terms'
+    postings first and, once the remaining terms can no longer lift an unseen
+    document into the top k, only top up the scores of candidates already found
+    (MaxScore pruning), so common terms do not force a full posting-list scan.
+    """
+
+    def __init__(self, documents):
+        self._postings = {None: {}}
+        self._max_impact = {None: {}}
+
+        term_counts = []
+        for group, tokens in documents:
+            if group not in self._postings:
+                self._postings[group] = {}
+                self._max_impact[group] = {}
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            term_counts.append((group, counts, len(tokens)))
+
+        doc_count = len(term_counts)
+        avg_length = sum(length for _, _, length in term_counts) / doc_count if doc_count else 0.0
+
+        doc_freq = {}
+        for _, counts, _ in term_counts:
+            for term in counts:
+                doc_freq[term] = doc_freq.get(term, 0) + 1
+        self._idf = {
+            term: math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            for term, df in doc_freq.items()
+        }
+        # Terms never seen in the corpus count as maximally rare
+        self._unseen_idf = math.log(1 + (doc_count + 0.5) / 0.5)
+        self.doc_count = doc_count
+
+        for doc_id, (group, counts, length) in enumerate(term_counts):
+            norm = K1 * (1 - B + B * length / avg_length) if avg_length else K1
+            for term, tf in counts.items():
+                impact = self._idf[term] * tf * (K1 + 1) / (tf + norm)
+                for key in (None, group):
+                    self._postings[key].setdefault(term, {})[doc_id] = impact
+                    max_impact = self._max_impact[key]
+                    if impact > max_impact.get(term, 0.0):
+                        max_impact[term] = impact
+
+    def __len__(self):
+        return self.doc_count
+
+    def idf(self, term):
+        """Return a term's inverse document frequency"""
+        return self._idf.get(term, self._unseen_idf)
+
+    def search(self, query_terms, group=None, top_k=5):
+        """Return up to top_k (doc_id, score) pairs ranked by BM25 score"""
+        postings = self._postings.get(group)
+        if not postings:
+            return []
+
+        max_impact = self._max_impact[group]
+        terms = sorted(
+            (term for term in query_terms if term in postings),
+            key=max_impact.get,
+            reverse=True
+        )
+        remaining = sum(max_impact[term] for term in terms)
+
+        scores = {}
+        for position, term in enumerate(terms):
+            remaining -= max_impact[term]
+            for doc_id, impact in postings[term].items():
+                scores[doc_id] = scores.get(doc_id, 0.0) + impact
+            if len(scores) >= top_k and heapq.nlargest(top_k, scores.values())[-1] > remaining:
+                # No unseen document can reach the top k; finish scoring the candidates
+                for rest in terms[position + 1:]:
+                    rest_postings = postings[rest]
+                    for doc_id in scores:
+                        impact = rest_postings.get(doc_id)
+                        if impact is not None:
+                            scores[doc_id] += impact
+                break
+
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: (item[1], -item[0]))
@@ -0,0 +1,291 @@
+"""
+Semantic Search Index for ReadyReserve AI Chatbot
+TF-IDF vectors of words, character n-grams and paraphrase concepts over the FAQ
+and service catalogue, held as one memory-mapped float32 matrix
+"""
+
+import hashlib
+import json
+import math
+import os
+import tempfile
+import zlib
+from functools import lru_cache
+from pathlib import Path
+
+from search_index import tokenize
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; without it search is lexical only
+    np = None
+
+# Bump when the features change, so stale matrix files are not reused
+FEATURE_VERSION = 2
+
+# Hashed feature space; a power of two so a bit mask picks the column. Each
+# entry costs DIMENSIONS * 4 bytes (16KB), so 5,000 entries map about 80MB
+DIMENSIONS = 1 << 12
+
+NGRAM_SIZES = (3, 4, 5)
+
+# Relative weight of each kind of feature
+WORD_WEIGHT = 1.0
+NGRAM_WEIGHT = 0.3
+CONCEPT_WEIGHT = 1.5
+
+# Semantic matches below this cosine similarity are ignored
+MIN_SIMILARITY = 0.1
+
+# Reciprocal rank fusion constant: larger values flatten the rank differences
+RRF_K = 60
+
+# Words that mean the same thing to a customer, mapped to one shared feature so
+# "how much does it cost" meets "What are your pricing plans?"
+CONCEPTS = {
+    "price": "price pricing cost charge fee pay payment paid expensive cheap afford affordable budget billing "
+             "subscription much plan",
+    "integrate": "integrate integration integrating connect connection hook sync plug plugin api zapier",
+    "security": "secure security safe safety privacy private protect protected encrypt encryption gdpr compliance "
+                "compliant",
+    "start": "start started starting begin onboard onboarding setup implement implementation launch",
+    "support": "support help assist assistance contact reach talk call email phone",
+    "duration": "long time timeline fast quick quickly soon week day duration",
+    "cancel": "cancel cancellation refund terminate contract commitment",
+    "automation": "automate automation automated workflow process bot",
+    "customer": "customer client lead prospect",
+    "data": "data information record export import",
+}
+
+CONCEPT_OF = {word: concept for concept, words in CONCEPTS.items() for word in words.split()}
+
+
+def column(feature):
+    """Hashed column of a feature; crc32 keeps columns stable across processes"""
+    return zlib.crc32(feature.encode("utf-8")) & (DIMENSIONS - 1)
+
+
+@lru_cache(maxsize=65536)
+def token_columns(token):
+    """Weighted columns of one term: the term, its concept and its character n-grams"""
+    columns = {}
+    features = [("w:" + token, WORD_WEIGHT)]
+    concept = CONCEPT_OF.get(token)
+    if concept is not None:
+        features.append(("c:" + concept, CONCEPT_WEIGHT))
+    padded = f" {token} "
+    for size in NGRAM_SIZES:
+        for start in range(len(padded) - size + 1):
+            features.append(("g:" + padded[start:start + size], NGRAM_WEIGHT))
+    for feature, weight in features:
+        key = column(feature)
+        columns[key] = columns.get(key, 0.0) + weight
+    return tuple(columns.items())
+
+
+def hashed(text):
+    """Sublinear feature frequencies of a text by column"""
+    columns = {}
+    for token in tokenize(text):
+        for key, weight in token_columns(token):
+            columns[key] = columns.get(key, 0.0) + weight
+    return {key: 1.0 + math.log(weight) if weight > 1 else weight for key, weight in columns.items()}
+
+
+def faq_text(entry):
+    return f"{entry['question']} {entry['question']} {entry['answer']}"
+
+
+def service_text(entry):
+    service = entry["service"]
+    parts = [entry["category"], service["name"], service["name"]]
+    for value in service.values():
+        if isinstance(value, str):
+            parts.append(value)
+        elif isinstance(value, list):
+            parts.extend(item for item in value if isinstance(item, str))
+    return " ".join(parts)
+
+
+def reciprocal_rank_fusion(rankings, limit):
+    """Merge ranked id lists, scoring each id by the sum of 1 / (RRF_K + rank) over the lists
+
+    Ties go to the id that appears first in the earlier lists.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (RRF_K + rank)
+    return sorted(fused, key=lambda doc_id: -fused[doc_id])[:limit]
+
+
+class SemanticIndex:
+    """Cosine similarity search over FAQ entries and services
+
+    Every FAQ entry and service is an L2-normalized column of one float32
+    matrix with a row per feature (FAQ columns first), and the IDF weights as
+    a final column. The matrix is written once per content version to
+    <directory>/<source>-<content hash>.npy and memory-mapped read-only, so
+    every worker, and every process that starts later, shares the same pages.
+    Writing a new version deletes the older files of the same source (a hash
+    of name); processes still mapping them keep their pages until they swap.
+    A query is one vector-matrix product, and a batch of queries one
+    matrix-matrix product, over the feature rows the queries use. Those rows
+    are contiguous, so a query reads only its own features' pages, not the
+    whole matrix.
+    """
+
+    def __init__(self, faq_entries, service_entries, directory=None, name="built-in"):
+        self.faq_entries = faq_entries
+        self.service_entries = service_entries
+        self.directory = Path(directory) if directory else None
+        self.source = hashlib.sha256(name.encode("utf-8")).hexdigest()[:16]
+        self.faq_rows = len(faq_entries)
+        self.path = None
+        category_rows = {}
+        for row, entry in enumerate(faq_entries):
+            category_rows.setdefault(entry["category"].lower(), []).append(row)
+        self._category_rows = {category: np.array(rows) for category, rows in category_rows.items()}
+
+        texts = [faq_text(entry) for entry in faq_entries] + [service_text(entry) for entry in service_entries]
+        digest = hashlib.sha256(json.dumps([FEATURE_VERSION, DIMENSIONS, texts]).encode("utf-8")).hexdigest()
+        matrix = self._load(digest)
+        if matrix is None:
+            matrix = self._build(texts)
+            matrix = self._save(digest, matrix)
+        self.matrix = matrix
+        self.entries = matrix.shape[1] - 1
+        self.idf = matrix[:, -1]
+
+    @staticmethod
+    def available():
+        return np is not None
+
+    @classmethod
+    def from_env(cls, faq_entries, service_entries, name="built-in"):
+        """Build with the matrix file under CHATBOT_SEMANTIC_INDEX_DIR, or None when disabled
+        (CHATBOT_SEMANTIC_SEARCH=0) or NumPy is not installed; name is the knowledge source"""
+        if not cls.available() or os.getenv("CHATBOT_SEMANTIC_SEARCH", "1") == "0":
+            return None
+        directory = os.getenv("CHATBOT_SEMANTIC_INDEX_DIR") or Path(tempfile.gettempdir()) / "chatbot-semantic-index"
+        return cls(faq_entries, service_entries, directory, name)
+
+    def _load(self, digest):
+        if self.directory is None:
+            return None
+        path = self.directory / f"{self.source}-{digest}.npy"
+        try:
+            matrix = np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        self.path = path
+        return matrix
+
+    def _save(self, digest, matrix):
+        """Write the matrix and map it back; keep it in memory if the directory is not writable"""
+        if self.directory is None:
+            return matrix
+        path = self.directory / f"{self.source}-{digest}.npy"
+        temporary = self.directory / f"{self.source}-{digest}.{os.getpid()}.tmp"
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(temporary, "wb") as file:
+                np.save(file, matrix)
+            os.replace(temporary, path)
+            mapped = np.load(path, mmap_mode="r")
+        except OSError:
+            temporary.unlink(missing_ok=True)
+            return matrix
+        self.path = path
+        self._remove_superseded()
+        return mapped
+
+    def _remove_superseded(self):
+        """Delete this source's matrix files other than the current one; unlinking a mapped file is safe"""
+        for path in self.directory.glob(f"{self.source}-*.npy"):
+            if path != self.path:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def _build(self, texts):
+        rows = [hashed(text) for text in texts]
+        document_frequency = np.zeros(DIMENSIONS, dtype=np.float32)
+        for row in rows:
+            document_frequency[list(row)] += 1
+        idf = (np.log((1 + len(rows)) / (1 + document_frequency)) + 1).astype(np.float32)
+
+        counts = np.fromiter((len(row) for row in rows), dtype=np.int64, count=len(rows))
+        total = int(counts.sum())
+        features = np.fromiter((key for row in rows for key in row), dtype=np.int64, count=total)
+        values = np.fromiter((value for row in rows for value in row.values()), dtype=np.float32, count=total)
+        entries = np.repeat(np.arange(len(rows)), counts)
+        values *= idf[features]
+        norms = np.sqrt(np.bincount(entries, weights=values * values, minlength=len(rows))).astype(np.float32)
+        values /= np.where(norms > 0, norms, 1)[entries]
+
+        matrix = np.zeros((DIMENSIONS, len(rows) + 1), dtype=np.float32)
+        matrix[features, entries] = values
+        matrix[:, -1] = idf
+        return matrix
+
+    def vectorize(self, texts):
+        """Return the columns any of texts uses and the L2-normalized query vectors restricted to them
+
+        Columns no query uses contribute nothing to a dot product, so scoring
+        multiplies only those feature rows of the matrix.
+        """
+        rows = [hashed(text) for text in texts]
+        columns = np.array(sorted(set().union(*rows)), dtype=np.int64)
+        position = {column: index for index, column in enumerate(columns.tolist())}
+        vectors = np.zeros((len(texts), len(columns)), dtype=np.float32)
+        for index, row in enumerate(rows):
+            for column, weight in row.items():
+                vectors[index, position[column]] = weight
+        vectors *= self.idf[columns]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return columns, vectors
+
+    def faq_similarity(self, questions):
+        """Cosine similarity of each question to every FAQ entry, shape (len(questions), FAQ entries)"""
+        columns, vectors = self.vectorize(questions)
+        return vectors @ self.matrix[columns, :self.faq_rows]
+
+    def service_similarity(self, queries):
+        """Cosine similarity of each query to every service, shape (len(queries), services)"""
+        columns, vectors = self.vectorize(queries)
+        return vectors @ self.matrix[columns, self.faq_rows:self.entries]
+
+    def rank(self, similarity, limit, category=None):
+        """Ids of the best rows of one similarity vector above MIN_SIMILARITY, optionally FAQ rows of one category"""
+        if category is None:
+            rows = np.arange(len(similarity))
+        else:
+            rows = self._category_rows.get(category, np.zeros(0, dtype=np.int64))
+        rows = rows[similarity[rows] >= MIN_SIMILARITY]
+        order = np.lexsort((rows, -similarity[rows]))[:limit]
+        return rows[order].tolist()
+
+    @property
+    def nbytes(self):
+        return self.matrix.nbytes
+
+    def stats(self):
+        return {
+            "rows": self.entries,
+            "dimensions": DIMENSIONS,
+            "bytes": self.nbytes,
+            "path": str(self.path) if self.path else None,
+            "memory_mapped": self.path is not None,
+        }
+
+
+if __name__ == "__main__":
+    # Prebuild the matrix file for the configured knowledge (CHATBOT_KNOWLEDGE_PATH or the built-in content)
+    from knowledge_base import KnowledgeBase
+    from website_knowledge import get_website_knowledge
+
+    semantic_index = KnowledgeBase.from_env(get_website_knowledge()).current.semantic_index
+    print(json.dumps(semantic_index.stats() if semantic_index else {"enabled": False}))
@@ -0,0 +1,199 @@
+"""
+Production Server for ReadyReserve AI Chatbot
+Pre-forking uvicorn supervisor: the app, knowledge base and indexes are loaded
+once and shared copy-on-write by every worker
+"""
+
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+
+import uvicorn
+
+from metrics import REGISTRY
+
+logger = logging.getLogger("uvicorn.error")
+
+# How often the supervisor checks on its workers, in seconds
+POLL_INTERVAL = 0.2
+
+# A worker that dies sooner than this after starting is restarted only after a pause
+MIN_WORKER_LIFETIME = 1.0
+
+# Session database for several workers when CHATBOT_SESSION_DB is not set
+DEFAULT_SESSION_DB = "chat_sessions.db"
+
+
+def default_workers():
+    """One worker per core"""
+    return os.cpu_count() or 1
+
+
+def share_sessions(workers):
+    """Keep sessions in SQLite when several workers serve them, unless CHATBOT_SESSION_DB is set
+
+    In-memory sessions live in one worker, so a request for a session that
+    lands on any other worker would get 404. Call this before importing the
+    app, whose session store reads CHATBOT_SESSION_DB as it is built.
+    """
+    if workers > 1 and not os.getenv("CHATBOT_SESSION_DB"):
+        os.environ["CHATBOT_SESSION_DB"] = DEFAULT_SESSION_DB
+        logger.info("Sharing sessions between workers through %s", DEFAULT_SESSION_DB)
+
+
+def bind_socket(host, port, backlog):
+    """Open the listening socket every worker accepts from"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Supervisor:
+    """Forks uvicorn workers from a fully loaded parent and keeps them running
+
+    The application is loaded before forking, and the garbage collector is
+    frozen so collections in the workers do not touch (and so copy) the shared
+    pages. Workers that die are replaced. On SIGTERM or SIGINT each worker stops
+    accepting connections and finishes its in-flight requests; any still running
+    after graceful_timeout seconds are killed.
+    """
+
+    def __init__(
+        self,
+        app,
+        host="0.0.0.0",
+        port=8001,
+        workers=None,
+        backlog=2048,
+        keepalive_timeout=5,
+        graceful_timeout=30,
+        log_level="info",
+    ):
+        self.host = host
+        self.port = port
+        self.workers = workers or default_workers()
+        self.backlog = backlog
+        self.graceful_timeout = graceful_timeout
+        self.config = uvicorn.Config(
+            app,
+            host=host,
+            port=port,
+            # uvloop and httptools when installed (not on Windows), asyncio and h11 otherwise
+            loop="auto",
+            http="auto",
+            timeout_keep_alive=keepalive_timeout,
+            timeout_graceful_shutdown=graceful_timeout,
+            backlog=backlog,
+            log_level=log_level,
+        )
+        self._children = {}
+        self._stopping = False
+
+    @classmethod
+    def from_env(cls, app):
+        """Build from CHATBOT_HOST / CHATBOT_PORT / CHATBOT_WORKERS / CHATBOT_BACKLOG /
+        CHATBOT_KEEPALIVE_TIMEOUT / CHATBOT_GRACEFUL_TIMEOUT / CHATBOT_LOG_LEVEL"""
+        return cls(
+            app,
+            host=os.getenv("CHATBOT_HOST", "0.0.0.0"),
+            port=int(os.getenv("CHATBOT_PORT", "8001")),
+            workers=int(os.getenv("CHATBOT_WORKERS", "0")) or None,
+            backlog=int(os.getenv("CHATBOT_BACKLOG", "2048")),
+            keepalive_timeout=int(os.getenv("CHATBOT_KEEPALIVE_TIMEOUT", "5")),
+            graceful_timeout=int(os.getenv("CHATBOT_GRACEFUL_TIMEOUT", "30")),
+            log_level=os.getenv("CHATBOT_LOG_LEVEL", "info"),
+        )
+
+    def _spawn(self, sock):
+        pid = os.fork()
+        if pid == 0:
+            # Worker: uvicorn installs its own SIGTERM/SIGINT handlers for a graceful stop
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            status = 0
+            try:
+                uvicorn.Server(self.config).run(sockets=[sock])
+            except BaseException:
+                logger.exception("Worker %d crashed", os.getpid())
+                status = 1
+            finally:
+                os._exit(status)
+        self._children[pid] = time.monotonic()
+        logger.info("Started worker %d", pid)
+
+    def _stop(self, signum, frame):
+        if self._stopping:
+            return
+        self._stopping = True
+        logger.info("Shutting down %d workers (graceful timeout %ss)", len(self._children), self.graceful_timeout)
+        for pid in self._children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _reap(self):
+        """Collect exited workers; return how many died unexpectedly soon after starting"""
+        crashed_early = 0
+        while self._children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                break
+            started = self._children.pop(pid, None)
+            if started is None:
+                continue
+            if not self._stopping:
+                logger.warning("Worker %d exited with status %d", pid, os.waitstatus_to_exitcode(status))
+                if time.monotonic() - started < MIN_WORKER_LIFETIME:
+                    crashed_early += 1
+        return crashed_early
+
+    def run(self):
+        """Load the app, fork the workers and supervise them until told to stop"""
+        if not hasattr(os, "fork"):
+            logger.warning("This platform cannot fork; running a single worker")
+            uvicorn.Server(self.config).run()
+            return
+
+        self.config.load()
+        REGISTRY.clear_directory()
+        sock = bind_socket(self.host, self.port, self.backlog)
+        logger.info("Listening on http://%s:%d with %d workers", self.host, self.port, self.workers)
+
+        # Everything loaded so far is shared with the workers; keep the GC off it
+        gc.collect()
+        gc.freeze()
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for _ in range(self.workers):
+            self._spawn(sock)
+
+        while not self._stopping:
+            if self._reap():
+                # Avoid a tight crash loop when workers cannot start
+                time.sleep(MIN_WORKER_LIFETIME)
+            while not self._stopping and len(self._children) < self.workers:
+                self._spawn(sock)
+            time.sleep(POLL_INTERVAL)
+
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        while self._children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(POLL_INTERVAL)
+        for pid in self._children:
+            logger.warning("Killing worker %d after graceful timeout", pid)
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        sock.close()
+        logger.info("Stopped")
@@ -0,0 +1,111 @@
+"""
+Service Lookup Index for ReadyReserve AI Chatbot
+Exact slug/alias lookups with a character-trigram fallback for typos and partial names
+"""
+
+import re
+
+from search_index import normalize_token
+
+NON_ALNUM_PATTERN = re.compile(r"[^a-z0-9]+")
+
+# Candidates below this similarity are not considered a match
+MIN_SCORE = 0.45
+
+# A match on one word of a name counts for less than a match on the whole name
+WORD_MATCH_WEIGHT = 0.9
+
+
+def slugify(text):
+    """Lowercase and join words with hyphens: "WhatsApp/SMS Automation" -> "whatsapp-sms-automation" """
+    return NON_ALNUM_PATTERN.sub("-", text.lower()).strip("-")
+
+
+def name_words(text):
+    """Normalized words of a name, with simple plurals folded"""
+    return [normalize_token(word) for word in slugify(text).split("-") if word]
+
+
+def lookup_keys(text):
+    """Spelling-insensitive keys for exact lookups: the slug and its run-together, singular form"""
+    return {slugify(text), "".join(name_words(text))}
+
+
+def trigrams(text):
+    """Character trigrams of a word, padded so short words and word starts still count"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ServiceIndex:
+    """Precomputed lookup over every service in the catalogue
+
+    Exact slugs and aliases resolve through one dict lookup. Anything else is
+    scored by trigram overlap (Dice coefficient) against each service name, its
+    words and its aliases, using an inverted trigram index so only services
+    sharing a trigram with the query are touched.
+    """
+
+    def __init__(self, service_categories):
+        self.entries = []
+        self._exact = {}
+        self._keys = []
+        self._trigram_postings = {}
+
+        for category_data in service_categories.values():
+            for service in category_data["services"]:
+                entry_id = len(self.entries)
+                self.entries.append({"category": category_data["name"], "service": service})
+
+                names = [service["name"]] + list(service.get("aliases", []))
+                for name in names:
+                    for key in lookup_keys(name):
+                        self._exact.setdefault(key, entry_id)
+
+                    # Fuzzy keys: the whole name run together plus each word on its own
+                    words = name_words(name)
+                    fuzzy_keys = {word: WORD_MATCH_WEIGHT for word in words if len(word) > 2}
+                    fuzzy_keys["".join(words)] = 1.0
+                    for key, weight in fuzzy_keys.items():
+                        key_id = len(self._keys)
+                        grams = trigrams(key)
+                        self._keys.append((entry_id, len(grams), weight))
+                        for gram in grams:
+                            self._trigram_postings.setdefault(gram, []).append(key_id)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def search(self, name, limit=5):
+        """Return up to limit candidate services as (entry, score), best first"""
+        return [(self.entries[entry_id], score) for entry_id, score in self.rank(name, limit)]
+
+    def rank(self, name, limit=5):
+        """Return up to limit candidate services as (entry id, score), best first; an exact match scores 1.0"""
+        for key in lookup_keys(name):
+            entry_id = self._exact.get(key)
+            if entry_id is not None:
+                return [(entry_id, 1.0)]
+
+        words = name_words(name)
+        best = {}
+        for key in {"".join(words), *words}:
+            if not key:
+                continue
+            grams = trigrams(key)
+            shared = {}
+            for gram in grams:
+                for key_id in self._trigram_postings.get(gram, ()):
+                    shared[key_id] = shared.get(key_id, 0) + 1
+            for key_id, count in shared.items():
+                entry_id, size, weight = self._keys[key_id]
+                score = weight * 2 * count / (size + len(grams))
+                if score > best.get(entry_id, 0.0):
+                    best[entry_id] = score
+
+        ranked = sorted(best.items(), key=lambda item: (-item[1], item[0]))
+        return [
+            (entry_id, round(score, 4))
+            for entry_id, score in ranked[:limit]
+            if score >= MIN_SCORE
+        ]
@@ -0,0 +1,276 @@
+"""
+Session Store for ReadyReserve AI Chatbot
+Server-side conversation history, so clients only send the newest messages
+"""
+
+import asyncio
+import os
+import secrets
+import sqlite3
+import time
+from collections import OrderedDict
+
+# Minimum seconds between sweeps of idle sessions out of the persistent backend
+SWEEP_INTERVAL = 60.0
+
+
+class Session:
+    """One conversation's stored history
+
+    offset counts the oldest messages trimmed off past max_messages, so
+    messages[i] is the conversation's message number offset + i.
+    """
+
+    def __init__(self, session_id, user_id=None, messages=None, updated_at=None, offset=0):
+        self.id = session_id
+        self.user_id = user_id
+        self.messages = list(messages or [])
+        self.updated_at = updated_at or time.time()
+        self.offset = offset
+
+
+class SQLiteSessionBackend:
+    """Persists sessions to a local SQLite file so they survive a worker restart
+
+    Messages are stored one row each under their position in the conversation,
+    so appending a turn writes only the new rows, and trimming the oldest
+    messages deletes only theirs, rather than rewriting the whole history. The database is opened on
+    first use, so a server that forks workers after loading the app gives each
+    worker its own connection.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = None
+        self._lock = asyncio.Lock()
+
+    def _connect(self):
+        if self._connection is not None:
+            return self._connection
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS chat_sessions (
+                id TEXT PRIMARY KEY,
+                user_id TEXT,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS chat_session_messages (
+                session_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                PRIMARY KEY (session_id, seq)
+            );
+        """)
+        return self._connection
+
+    def _load(self, session_id):
+        row = self._connect().execute(
+            "SELECT user_id, updated_at FROM chat_sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        rows = self._connection.execute(
+            "SELECT seq, role, content FROM chat_session_messages WHERE session_id = ? ORDER BY seq",
+            (session_id,)
+        ).fetchall()
+        messages = [{"role": role, "content": content} for _, role, content in rows]
+        return Session(session_id, row[0], messages, row[1], offset=rows[0][0] if rows else 0)
+
+    def _updated_at(self, session_id):
+        row = self._connect().execute(
+            "SELECT updated_at FROM chat_sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _append(self, session, start, trimmed):
+        self._connect()
+        with self._connection:
+            if trimmed:
+                self._connection.execute(
+                    "DELETE FROM chat_session_messages WHERE session_id = ? AND seq < ?", (session.id, session.offset)
+                )
+            self._connection.execute(
+                "INSERT INTO chat_sessions (id, user_id, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET updated_at = excluded.updated_at",
+                (session.id, session.user_id, session.updated_at)
+            )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO chat_session_messages (session_id, seq, role, content) VALUES (?, ?, ?, ?)",
+                [
+                    (session.id, seq, message["role"], message["content"])
+                    for seq, message in enumerate(session.messages[start:], start=session.offset + start)
+                ]
+            )
+
+    def _delete(self, session_ids):
+        self._connect()
+        with self._connection:
+            self._connection.executemany("DELETE FROM chat_sessions WHERE id = ?", [(i,) for i in session_ids])
+            self._connection.executemany(
+                "DELETE FROM chat_session_messages WHERE session_id = ?", [(i,) for i in session_ids]
+            )
+
+    def _delete_idle(self, cutoff):
+        self._connect()
+        with self._connection:
+            self._connection.execute(
+                "DELETE FROM chat_session_messages WHERE session_id IN "
+                "(SELECT id FROM chat_sessions WHERE updated_at < ?)", (cutoff,)
+            )
+            self._connection.execute("DELETE FROM chat_sessions WHERE updated_at < ?", (cutoff,))
+
+    async def _run(self, function, *args):
+        # SQLite calls run in a thread, one at a time, off the event loop
+        async with self._lock:
+            return await asyncio.to_thread(function, *args)
+
+    async def load(self, session_id):
+        return await self._run(self._load, session_id)
+
+    async def updated_at(self, session_id):
+        return await self._run(self._updated_at, session_id)
+
+    async def append(self, session, start, trimmed=False):
+        await self._run(self._append, session, start, trimmed)
+
+    async def delete(self, session_ids):
+        await self._run(self._delete, session_ids)
+
+    async def delete_idle(self, cutoff):
+        await self._run(self._delete_idle, cutoff)
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class SessionStore:
+    """In-memory session store with LRU eviction, idle timeout and optional persistence
+
+    Sessions are kept in last-used order, so idle sessions collect at the front
+    and are swept cheaply whenever a session is created. Sessions evicted from
+    memory for space stay in the persistent backend, if there is one, and are
+    reloaded on their next use. With a backend, a cached session is checked
+    against the stored copy on each use, so several worker processes can share
+    one database without serving each other stale history.
+    """
+
+    def __init__(self, max_sessions=10000, idle_timeout=3600.0, max_messages=500, backend=None):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_messages = max_messages
+        self.backend = backend
+        self._sessions = OrderedDict()
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+        self.restored = 0
+        self._last_backend_sweep = 0.0
+
+    @classmethod
+    def from_env(cls):
+        """Build a store from CHATBOT_SESSION_* variables; CHATBOT_SESSION_DB enables SQLite persistence"""
+        db_path = os.getenv("CHATBOT_SESSION_DB")
+        return cls(
+            max_sessions=int(os.getenv("CHATBOT_SESSION_MAX", "10000")),
+            idle_timeout=float(os.getenv("CHATBOT_SESSION_IDLE_TIMEOUT", "3600")),
+            max_messages=int(os.getenv("CHATBOT_SESSION_MAX_MESSAGES", "500")),
+            backend=SQLiteSessionBackend(db_path) if db_path else None,
+        )
+
+    def _is_idle(self, session, now):
+        return now - session.updated_at > self.idle_timeout
+
+    async def _sweep(self, now):
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if not self._is_idle(session, now):
+                break
+            self._sessions.popitem(last=False)
+            self.expired += 1
+        if self.backend is not None and now - self._last_backend_sweep > SWEEP_INTERVAL:
+            self._last_backend_sweep = now
+            await self.backend.delete_idle(now - self.idle_timeout)
+
+    def _remember(self, session):
+        self._sessions[session.id] = session
+        self._sessions.move_to_end(session.id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+
+    async def create(self, user_id=None, messages=None):
+        """Start a session, optionally seeded with existing history"""
+        now = time.time()
+        await self._sweep(now)
+        session = Session(secrets.token_urlsafe(16), user_id, updated_at=now)
+        self.created += 1
+        self._remember(session)
+        await self.append(session, messages or [])
+        return session
+
+    async def get(self, session_id):
+        """Return a live session, or None if it does not exist or has been idle too long"""
+        now = time.time()
+        session = self._sessions.get(session_id)
+        if session is not None and self.backend is not None:
+            stored_at = await self.backend.updated_at(session_id)
+            if stored_at is None:
+                # Deleted or swept by another worker
+                self._sessions.pop(session_id, None)
+                return None
+            if stored_at > session.updated_at:
+                # Another worker has appended to it since we cached it
+                session = None
+        if session is None and self.backend is not None:
+            session = await self.backend.load(session_id)
+            if session is not None:
+                self.restored += 1
+        if session is None:
+            return None
+        if self._is_idle(session, now):
+            await self.delete(session_id)
+            self.expired += 1
+            return None
+        self._remember(session)
+        return session
+
+    async def append(self, session, messages):
+        """Append messages to a session's history"""
+        start = len(session.messages)
+        session.messages.extend(messages)
+        overflow = len(session.messages) - self.max_messages
+        if overflow > 0:
+            # Drop the oldest messages; the stored rows keep their positions
+            del session.messages[:overflow]
+            session.offset += overflow
+            start = max(0, start - overflow)
+        session.updated_at = time.time()
+        if self.backend is not None:
+            await self.backend.append(session, start, trimmed=overflow > 0)
+
+    async def delete(self, session_id):
+        """Forget a session"""
+        self._sessions.pop(session_id, None)
+        if self.backend is not None:
+            await self.backend.delete([session_id])
+
+    def close(self):
+        if self.backend is not None:
+            self.backend.close()
+
+    def stats(self):
+        """Return session counters"""
+        return {
+            "active": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "idle_timeout": self.idle_timeout,
+            "persistent": self.backend is not None,
+            "created": self.created,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "restored": self.restored,
+        }
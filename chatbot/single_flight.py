@@ -0,0 +1,152 @@
+"""
+Single-Flight Coalescing for ReadyReserve AI Chatbot
+Identical concurrent chat requests share one upstream call, and its stream
+"""
+
+import asyncio
+import os
+
+
+class FlightCancelled(Exception):
+    """Raised to subscribers of a flight whose upstream call was abandoned"""
+
+
+class Flight:
+    """One in-flight upstream answer, buffered so late subscribers replay it from the start"""
+
+    def __init__(self):
+        self.parts = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.task = None
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        # Wake everyone waiting on the current event, then start a fresh one
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def publish(self, delta):
+        self.parts.append(delta)
+        self._notify()
+
+    def finish(self, error=None):
+        self.done = True
+        self.error = error
+        self._notify()
+
+    async def deltas(self):
+        """Yield every delta from the first, waiting for new ones until the flight finishes"""
+        index = 0
+        while True:
+            while index < len(self.parts):
+                yield self.parts[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
+class SingleFlight:
+    """Coalesces concurrent requests for the same key onto one upstream call
+
+    The first request for a key starts the upstream call in its own task; any
+    request for the same key that arrives before it finishes subscribes to the
+    same flight and receives every delta, including those already produced. The
+    call is cancelled only once every subscriber has gone, and the key is freed
+    when it completes, so later requests go through the answer cache instead.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._flights = {}
+        self.flights = 0
+        self.coalesced = 0
+        self.cancelled = 0
+
+    @classmethod
+    def from_env(cls):
+        """Build from CHATBOT_SINGLE_FLIGHT (0 disables coalescing)"""
+        return cls(enabled=os.getenv("CHATBOT_SINGLE_FLIGHT", "1") != "0")
+
+    def in_flight(self, key):
+        """Whether a request for key can join a running flight"""
+        return self.enabled and key in self._flights
+
+    async def _drive(self, key, flight, produce):
+        tokens = produce()
+        try:
+            async for delta in tokens:
+                flight.publish(delta)
+            flight.finish()
+        except asyncio.CancelledError:
+            flight.finish(FlightCancelled("Upstream request cancelled"))
+            raise
+        except Exception as e:
+            flight.finish(e)
+        finally:
+            await tokens.aclose()
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def _join(self, key, produce):
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(self._drive(key, flight, produce))
+            self.flights += 1
+        else:
+            self.coalesced += 1
+        flight.subscribers += 1
+        return flight
+
+    async def subscribe(self, key, produce):
+        """Yield the deltas of the flight for key, starting one with produce() if none is running
+
+        produce must return an async generator of content deltas; anything it
+        does after its last delta (such as caching the answer) completes before
+        the key is released.
+        """
+        if not self.enabled:
+            tokens = produce()
+            try:
+                async for delta in tokens:
+                    yield delta
+            finally:
+                await tokens.aclose()
+            return
+
+        flight = self._join(key, produce)
+        try:
+            async for delta in flight.deltas():
+                yield delta
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # Nobody is listening any more; stop the upstream call
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+                self.cancelled += 1
+
+    async def run(self, key, produce):
+        """Return the full content of the flight for key"""
+        tokens = self.subscribe(key, produce)
+        try:
+            return "".join([delta async for delta in tokens])
+        finally:
+            await tokens.aclose()
+
+    def stats(self):
+        """Return coalescing counters"""
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._flights),
+            "flights": self.flights,
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled,
+        }
@@ -0,0 +1,145 @@
+"""
+Static Responses for ReadyReserve AI Chatbot
+Pre-serialized, pre-compressed bodies with strong ETags for the knowledge endpoints
+"""
+
+import gzip
+import hashlib
+import json
+import os
+
+from fastapi import Response
+
+try:
+    import brotli
+except ImportError:  # in requirements.txt; without it only gzip variants are served
+    brotli = None
+
+# Knowledge section each pre-rendered endpoint is built from
+ENDPOINT_SECTIONS = {
+    "services": "service_categories",
+    "pricing": "pricing",
+    "contact": "contact_info",
+    "how-it-works": "how_it_works",
+    "faq-categories": "faq",
+}
+
+# Browsers and the CDN may reuse a response this long before revalidating
+CACHE_CONTROL = "public, max-age={max_age}, stale-while-revalidate={stale}"
+
+
+def encode_json(content):
+    """Serialize content exactly as FastAPI's JSONResponse does"""
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class StaticResponse:
+    """One endpoint's body in every supported encoding, with per-encoding strong ETags"""
+
+    def __init__(self, content):
+        self.body = encode_json(content)
+        tag = hashlib.sha256(self.body).hexdigest()[:32]
+        self.variants = {"identity": (self.body, f'"{tag}"')}
+        self.variants["gzip"] = (gzip.compress(self.body, compresslevel=9, mtime=0), f'"{tag}-gz"')
+        if brotli is not None:
+            self.variants["br"] = (brotli.compress(self.body), f'"{tag}-br"')
+        self.etags = frozenset(etag for _, etag in self.variants.values())
+
+    def select_encoding(self, accept_encoding):
+        """Pick the best variant the client accepts: br, then gzip, then identity"""
+        accepted = set()
+        for item in accept_encoding.lower().split(","):
+            coding, _, params = item.partition(";")
+            params = params.replace(" ", "")
+            if params.startswith("q=") and params[2:].strip("0.") == "":
+                continue  # q=0 means "not acceptable"
+            accepted.add(coding.strip())
+        for encoding in ("br", "gzip"):
+            if encoding in self.variants and (encoding in accepted or "*" in accepted):
+                return encoding
+        return "identity"
+
+    def not_modified(self, if_none_match):
+        """Weak comparison of If-None-Match against every variant's ETag (RFC 9110)"""
+        if if_none_match.strip() == "*":
+            return True
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            if tag in self.etags:
+                return True
+        return False
+
+
+class StaticResponses:
+    """Pre-rendered responses for the read-only knowledge endpoints of one knowledge version
+
+    Given the previous version's responses and the set of changed sections,
+    endpoints whose section is unchanged reuse their bytes and ETags, so
+    clients and CDNs keep their copies across a knowledge reload.
+    """
+
+    def __init__(self, knowledge, version, max_age=300, stale_while_revalidate=86400, previous=None, changed=None):
+        self.version = version
+        self.cache_control = CACHE_CONTROL.format(max_age=max_age, stale=stale_while_revalidate)
+
+        categories = []
+        category_questions = {}
+        for faq_item in knowledge["faq"]:
+            key = faq_item["category"].lower()
+            if key not in category_questions:
+                categories.append(faq_item["category"])
+                category_questions[key] = []
+            category_questions[key].extend(faq_item["questions"])
+
+        contents = {
+            "services": lambda: {"services": knowledge["service_categories"]},
+            "pricing": lambda: {"pricing": knowledge["pricing"]},
+            "contact": lambda: {"contact": knowledge["contact_info"]},
+            "how-it-works": lambda: {"how_it_works": knowledge["how_it_works"]},
+            "faq-categories": lambda: {"categories": categories},
+        }
+        self.responses = {}
+        self.rebuilt = []
+        for name, content in contents.items():
+            if previous is not None and changed is not None and ENDPOINT_SECTIONS[name] not in changed:
+                self.responses[name] = previous.responses[name]
+            else:
+                self.responses[name] = StaticResponse(content())
+                self.rebuilt.append(name)
+        # /faq/{category} echoes the requested spelling, so only the questions are shared
+        self.faq_questions = category_questions
+
+    @classmethod
+    def from_env(cls, knowledge, version, previous=None, changed=None):
+        """Build responses with CHATBOT_STATIC_MAX_AGE / CHATBOT_STATIC_STALE_WHILE_REVALIDATE"""
+        return cls(
+            knowledge,
+            version,
+            max_age=int(os.getenv("CHATBOT_STATIC_MAX_AGE", "300")),
+            stale_while_revalidate=int(os.getenv("CHATBOT_STATIC_STALE_WHILE_REVALIDATE", "86400")),
+            previous=previous,
+            changed=changed,
+        )
+
+    def respond(self, name, request):
+        """Return the named response, as a 304 if the client already has it"""
+        static = self.responses[name]
+        encoding = static.select_encoding(request.headers.get("accept-encoding", ""))
+        body, etag = static.variants[encoding]
+        headers = {"Cache-Control": self.cache_control, "ETag": etag, "Vary": "Accept-Encoding"}
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and static.not_modified(if_none_match):
+            return Response(status_code=304, headers=headers)
+
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type="application/json", headers=headers)
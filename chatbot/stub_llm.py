@@ -0,0 +1,167 @@
+"""
+Stub LLM Server for ReadyReserve AI Chatbot
+A local OpenAI-compatible chat completions endpoint with configurable latency,
+token rate and error rate, for load tests that cost nothing
+"""
+
+import asyncio
+import json
+import os
+import random
+import time
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from token_counter import count_message_tokens
+
+# Upstream failures the stub returns, in proportion: rate limits, overloads and server errors
+ERROR_RESPONSES = (
+    (429, "rate_limit_exceeded", "Rate limit reached (stub)"),
+    (503, "server_overloaded", "The server is overloaded (stub)"),
+    (500, "server_error", "The server had an error (stub)"),
+)
+
+
+class StubSettings:
+    """How the stub behaves
+
+    latency is the time to the first token in seconds, varied uniformly by
+    +/- jitter (a fraction of it). Tokens then arrive at token_rate per second.
+    error_rate is the fraction of requests answered with a 429/500/503 instead.
+    """
+
+    def __init__(self, latency=0.3, jitter=0.2, token_rate=50.0, tokens=60, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.token_rate = token_rate
+        self.tokens = tokens
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+
+    @classmethod
+    def from_env(cls):
+        """Build from STUB_LLM_LATENCY / STUB_LLM_JITTER / STUB_LLM_TOKEN_RATE / STUB_LLM_TOKENS /
+        STUB_LLM_ERROR_RATE / STUB_LLM_SEED"""
+        seed = os.getenv("STUB_LLM_SEED")
+        return cls(
+            latency=float(os.getenv("STUB_LLM_LATENCY", "0.3")),
+            jitter=float(os.getenv("STUB_LLM_JITTER", "0.2")),
+            token_rate=float(os.getenv("STUB_LLM_TOKEN_RATE", "50")),
+            tokens=int(os.getenv("STUB_LLM_TOKENS", "60")),
+            error_rate=float(os.getenv("STUB_LLM_ERROR_RATE", "0")),
+            seed=int(seed) if seed else None,
+        )
+
+    def first_token_delay(self):
+        return max(0.0, self.latency * (1 + self.random.uniform(-self.jitter, self.jitter)))
+
+    def token_interval(self):
+        return 1 / self.token_rate if self.token_rate > 0 else 0.0
+
+    def error(self):
+        """Return the (status, code, message) to fail this request with, or None"""
+        if self.error_rate > 0 and self.random.random() < self.error_rate:
+            return self.random.choice(ERROR_RESPONSES)
+        return None
+
+
+settings = StubSettings.from_env()
+counters = {"requests": 0, "streams": 0, "errors": 0, "disconnects": 0, "tokens": 0}
+
+
+def completion_tokens(count):
+    """The stub's answer, one word per token"""
+    return [f"word{index} " for index in range(count)]
+
+
+def chunk(completion_id, model, created, delta, finish_reason=None):
+    return "data: " + json.dumps({
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }) + "\n\n"
+
+
+async def chat_completions(request):
+    body = await request.json()
+    counters["requests"] += 1
+    model = body.get("model", "stub")
+    max_tokens = body.get("max_tokens") or settings.tokens
+    tokens = completion_tokens(min(settings.tokens, max_tokens))
+    completion_id = f"chatcmpl-stub{counters['requests']}"
+    created = int(time.time())
+
+    error = settings.error()
+    if error is not None:
+        counters["errors"] += 1
+        await asyncio.sleep(settings.first_token_delay())
+        status, code, message = error
+        headers = {"Retry-After": "1"} if status == 429 else None
+        return JSONResponse(
+            {"error": {"message": message, "type": code, "code": code, "param": None}},
+            status_code=status,
+            headers=headers,
+        )
+
+    if body.get("stream"):
+        counters["streams"] += 1
+
+        async def stream():
+            sent = 0
+            try:
+                await asyncio.sleep(settings.first_token_delay())
+                yield chunk(completion_id, model, created, {"role": "assistant", "content": ""})
+                interval = settings.token_interval()
+                for token in tokens:
+                    yield chunk(completion_id, model, created, {"content": token})
+                    sent += 1
+                    await asyncio.sleep(interval)
+                yield chunk(completion_id, model, created, {}, "stop")
+                yield "data: [DONE]\n\n"
+            except asyncio.CancelledError:
+                counters["disconnects"] += 1
+                raise
+            finally:
+                counters["tokens"] += sent
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    await asyncio.sleep(settings.first_token_delay() + len(tokens) * settings.token_interval())
+    counters["tokens"] += len(tokens)
+    prompt_tokens = count_message_tokens(body.get("messages", []))
+    return JSONResponse({
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": "".join(tokens)},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(tokens),
+            "total_tokens": prompt_tokens + len(tokens),
+        },
+    })
+
+
+async def stats(request):
+    return JSONResponse(counters)
+
+
+app = Starlette(routes=[
+    Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+    Route("/stats", stats),
+])
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="127.0.0.1", port=int(os.getenv("STUB_LLM_PORT", "9100")), log_level="warning")
@@ -0,0 +1,84 @@
+"""
+Suggestion Index for ReadyReserve AI Chatbot
+Typeahead completions over FAQ questions and service names using a sorted array
+"""
+
+import re
+from bisect import bisect_left
+
+NON_ALNUM_PATTERN = re.compile(r"[^a-z0-9]+")
+
+# Upper bound on sorted-array entries scanned per lookup, to keep latency flat
+MAX_SCAN = 256
+
+
+def normalize_prefix(text):
+    """Lowercase and collapse punctuation/whitespace runs to single spaces"""
+    return NON_ALNUM_PATTERN.sub(" ", text.lower()).strip()
+
+
+class SuggestIndex:
+    """Prefix lookups over every word-start of each suggestion
+
+    Each suggestion is indexed once per word, by the normalized text from that
+    word onward, so "pricing" completes "What are your pricing plans?". Keys
+    live in one sorted array per scope (all suggestions, and each FAQ category),
+    so a lookup is a binary search plus a short forward scan. Completions that
+    start at the first word rank ahead of mid-sentence matches.
+    """
+
+    def __init__(self, faq_data, service_categories):
+        self.suggestions = []
+        for faq_category in faq_data:
+            for faq_item in faq_category["questions"]:
+                self.suggestions.append({
+                    "text": faq_item["question"],
+                    "type": "faq",
+                    "category": faq_category["category"]
+                })
+        for category_data in service_categories.values():
+            for service in category_data["services"]:
+                self.suggestions.append({
+                    "text": service["name"],
+                    "type": "service",
+                    "category": category_data["name"]
+                })
+
+        scopes = {None: []}
+        for suggestion_id, suggestion in enumerate(self.suggestions):
+            words = normalize_prefix(suggestion["text"]).split(" ")
+            keys = [(" ".join(words[position:]), position, suggestion_id) for position in range(len(words))]
+            scopes[None].extend(keys)
+            if suggestion["type"] == "faq":
+                scopes.setdefault(suggestion["category"].lower(), []).extend(keys)
+
+        self._keys = {}
+        self._positions = {}
+        for scope, keys in scopes.items():
+            keys.sort()
+            self._keys[scope] = [key for key, _, _ in keys]
+            self._positions[scope] = [(position, suggestion_id) for _, position, suggestion_id in keys]
+
+    def __len__(self):
+        return len(self.suggestions)
+
+    def suggest(self, prefix, limit=8, category=None):
+        """Return up to limit suggestions completing the prefix"""
+        prefix = normalize_prefix(prefix)
+        scope = category.lower() if category else None
+        keys = self._keys.get(scope)
+        if not prefix or not keys:
+            return []
+
+        positions = self._positions[scope]
+        matches = {}
+        start = bisect_left(keys, prefix)
+        for index in range(start, min(start + MAX_SCAN, len(keys))):
+            if not keys[index].startswith(prefix):
+                break
+            position, suggestion_id = positions[index]
+            if position < matches.get(suggestion_id, len(keys)):
+                matches[suggestion_id] = position
+
+        ranked = sorted(matches.items(), key=lambda item: (item[1] > 0, item[0]))
+        return [self.suggestions[suggestion_id] for suggestion_id, _ in ranked[:limit]]
@@ -0,0 +1,235 @@
+"""
+System Prompt Compilation for ReadyReserve AI Chatbot
+Renders a byte-stable core prompt once per knowledge version and retrieves the
+rest of the knowledge base per request as budgeted chunks
+"""
+
+import hashlib
+from dataclasses import dataclass, field
+
+from search_index import BM25Index, tokenize
+from token_counter import count_tokens
+from website_knowledge import get_knowledge_version
+
+# Default token budget for retrieved knowledge and FAQ context per request
+CONTEXT_TOKEN_BUDGET = 600
+
+# Chunks scoring below this fraction of the best chunk are left out even if they fit
+MIN_RELATIVE_SCORE = 0.25
+
+# Knowledge sections rendered into the core prompt, and into retrievable chunks
+CORE_SECTIONS = frozenset({"website_info", "service_categories", "contact_info", "social_media"})
+CHUNK_SECTIONS = frozenset({"service_categories", "pricing", "how_it_works", "integrations"})
+
+# Extra search terms per chunk kind, so "how much does it cost" finds pricing
+KIND_KEYWORDS = {
+    "service": "service automation solution",
+    "pricing": "price pricing plan cost much pay subscription month monthly budget afford",
+    "how_it_works": "how work process step start started begin onboarding setup",
+    "integrations": "integrate integration connect tool platform support compatible",
+}
+
+INSTRUCTIONS = """INSTRUCTIONS:
+1. Be helpful, friendly, and professional
+2. Provide accurate information based on the knowledge above
+3. If asked about specific services, provide detailed information including features and use cases
+4. If asked about pricing, explain the different plans and their benefits
+5. If asked about how it works, explain the process step by step
+6. Always encourage users to book a consultation for personalized solutions
+7. If you don't know something specific, offer to connect them with our team
+8. Use the FAQ data to provide comprehensive answers to common questions
+9. Be conversational but informative
+10. Focus on the value and benefits for the user's business
+
+Remember: You are representing {name} and should always maintain a professional, helpful tone while being enthusiastic about how AI can transform their business."""
+
+
+@dataclass(frozen=True)
+class KnowledgeChunk:
+    """One retrievable piece of the knowledge base"""
+    id: str
+    kind: str
+    text: str
+    tokens: int
+
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    """A rendered core prompt and chunk index pinned to one knowledge version"""
+    version: str
+    text: str
+    content_hash: str
+    chunks: tuple = ()
+    chunk_index: BM25Index = field(default=None, compare=False, repr=False)
+
+    def select_chunks(self, query, budget):
+        """Return the best-scoring chunks for a query that fit in the token budget"""
+        if not query or budget <= 0:
+            return []
+        ranked = self.chunk_index.search(frozenset(tokenize(query)), top_k=len(self.chunks))
+        if not ranked:
+            return []
+        cutoff = ranked[0][1] * MIN_RELATIVE_SCORE
+        selected = []
+        for chunk_id, score in ranked:
+            chunk = self.chunks[chunk_id]
+            if score >= cutoff and chunk.tokens <= budget:
+                selected.append(chunk_id)
+                budget -= chunk.tokens
+        # Catalogue order reads better and keeps equal selections byte-identical
+        return [self.chunks[chunk_id] for chunk_id in sorted(selected)]
+
+    def context(self, query, faq_matches=None, budget=CONTEXT_TOKEN_BUDGET):
+        """Render the per-request context: FAQ matches first, then retrieved knowledge"""
+        faq_text = render_faq_context(faq_matches) if faq_matches else ""
+        chunks = self.select_chunks(query, budget - count_tokens(faq_text))
+        parts = []
+        if chunks:
+            parts.append("RELEVANT KNOWLEDGE:\n")
+            parts.extend(chunk.text for chunk in chunks)
+        if faq_text:
+            if parts:
+                parts.append("\n")
+            parts.append(faq_text)
+        return "".join(parts)
+
+    def messages(self, query="", faq_matches=None, budget=CONTEXT_TOKEN_BUDGET):
+        """Return the system messages for a request
+
+        The core prompt is always the first message and is reused as-is, so the
+        prefix sent upstream is identical across requests. Retrieved knowledge and
+        FAQ context go into their own message after it, bounded by the budget.
+        """
+        messages = [{"role": "system", "content": self.text}]
+        context = self.context(query, faq_matches, budget)
+        if context:
+            messages.append({"role": "system", "content": context})
+        return messages
+
+
+def render_faq_context(faq_matches):
+    """Render the per-request FAQ context block"""
+    parts = ["RELEVANT FAQ INFORMATION:\n"]
+    for match in faq_matches:
+        parts.append(f"Q: {match['question']}\nA: {match['answer']}\n\n")
+    return "".join(parts)
+
+
+def render_core_prompt(knowledge):
+    """Render the always-included core: identity, company, catalogue outline and contact details
+
+    Fields the knowledge leaves out are left out of the prompt.
+    """
+    info = knowledge['website_info']
+    contact = knowledge['contact_info']
+    social = knowledge['social_media']
+    category_names = [category['name'] for category in knowledge['service_categories'].values()]
+
+    def fields(labels, values):
+        return [f"- {label}: {values[key]}\n" for key, label in labels if values.get(key)]
+
+    parts = [
+        f"You are the assistant for {info['name']}.\n\n",
+        "COMPANY INFORMATION:\n",
+        *fields([("name", "Name"), ("tagline", "Tagline"), ("description", "Description"), ("mission", "Mission")], info),
+        "\n",
+    ]
+    if category_names:
+        parts.append(f"SERVICE CATEGORIES: {', '.join(category_names)}\n")
+    parts.append(
+        "Details on the services, pricing, process and integrations relevant to the conversation are provided in a separate RELEVANT KNOWLEDGE message.\n"
+    )
+    contact_lines = fields(
+        [("email", "Email"), ("phone", "Phone"), ("support_email", "Support"), ("sales_email", "Sales"), ("hours", "Hours")],
+        contact,
+    )
+    if contact_lines:
+        parts += ["\nCONTACT INFORMATION:\n", *contact_lines]
+    social_lines = fields([("twitter", "Twitter"), ("linkedin", "LinkedIn")], social)
+    if social_lines:
+        parts += ["\nSOCIAL MEDIA:\n", *social_lines]
+    parts += ["\n", INSTRUCTIONS.format(name=info['name'])]
+    return "".join(parts)
+
+
+def build_chunks(knowledge):
+    """Split services, pricing, process steps and integrations into retrievable chunks
+
+    Returns (chunk, search_text) pairs in catalogue order.
+    """
+    chunks = []
+
+    def add(chunk_id, kind, text, search_text):
+        chunk = KnowledgeChunk(id=chunk_id, kind=kind, text=text, tokens=count_tokens(text))
+        chunks.append((chunk, f"{search_text} {KIND_KEYWORDS[kind]}"))
+
+    for category_key, category_data in knowledge['service_categories'].items():
+        for service in category_data['services']:
+            text = "".join([
+                f"{category_data['name']} - {service['name']}: {service['description']}\n",
+                f"  Features: {', '.join(service['features'])}\n",
+                f"  Use Cases: {', '.join(service['use_cases'])}\n",
+            ])
+            search_text = f"{category_data['name']} {category_data['description']} {service['name']} {service['name']} {text}"
+            add(f"service:{category_key}:{service['name']}", "service", text, search_text)
+
+    for plan_key, plan_data in knowledge['pricing'].items():
+        text = "".join([
+            f"Pricing plan - {plan_data['name']} ({plan_data['price']}): {plan_data['description']}\n",
+            f"  Features: {', '.join(plan_data['features'])}\n",
+        ])
+        add(f"pricing:{plan_key}", "pricing", text, text)
+
+    for number, (step_key, step) in enumerate(knowledge['how_it_works'].items(), start=1):
+        text = f"How it works, step {number} - {step['title']}: {step['description']}. {step.get('details', '')}\n"
+        add(f"how_it_works:{step_key}", "how_it_works", text, text)
+
+    for group_key, tools in knowledge['integrations'].items():
+        label = group_key.replace('_', ' ').title()
+        text = f"Integrations - {label}: {', '.join(tools)}\n"
+        add(f"integrations:{group_key}", "integrations", text, text)
+
+    return chunks
+
+
+def _core_fields(knowledge):
+    text = render_core_prompt(knowledge)
+    return {"text": text, "content_hash": hashlib.sha256(text.encode("utf-8")).hexdigest()}
+
+
+def _chunk_fields(knowledge):
+    chunks = build_chunks(knowledge)
+    return {
+        "chunks": tuple(chunk for chunk, _ in chunks),
+        "chunk_index": BM25Index((chunk.kind, tokenize(search_text)) for chunk, search_text in chunks),
+    }
+
+
+def compile_system_prompt(knowledge, version=None):
+    """Compile the prompt for a knowledge version
+
+    The result is held by the knowledge snapshot it belongs to (see
+    knowledge_base.py), so each tenant's prompt lives exactly as long as its
+    knowledge does.
+    """
+    version = version or get_knowledge_version(knowledge)
+    return CompiledPrompt(version=version, **_core_fields(knowledge), **_chunk_fields(knowledge))
+
+
+def update_system_prompt(previous, knowledge, version, changed_sections):
+    """Return the prompt for a new knowledge version, re-rendering only the parts whose sections changed
+
+    An unchanged core keeps its exact bytes, so upstream prefix caching
+    survives edits to pricing, FAQ or process content.
+    """
+    fields = {
+        "text": previous.text,
+        "content_hash": previous.content_hash,
+        "chunks": previous.chunks,
+        "chunk_index": previous.chunk_index,
+    }
+    if changed_sections & CORE_SECTIONS:
+        fields.update(_core_fields(knowledge))
+    if changed_sections & CHUNK_SECTIONS:
+        fields.update(_chunk_fields(knowledge))
+    return CompiledPrompt(version=version, **fields)
@@ -0,0 +1,232 @@
+"""
+Tenants for ReadyReserve AI Chatbot
+Per-tenant knowledge bases and answer caches, loaded on first use and evicted
+least recently used under a memory budget
+"""
+
+import asyncio
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from answer_cache import AnswerCache
+from knowledge_base import EMPTY_KNOWLEDGE, FILE_SUFFIXES, KnowledgeBase
+
+logger = logging.getLogger("uvicorn.error")
+
+DEFAULT_TENANT = "default"
+
+TENANT_ID_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+# Requests under /t/{tenant}/ are served as that tenant's view of the normal routes
+TENANT_PATH_PREFIX = "/t/"
+
+# Resident bytes per byte of canonical knowledge JSON (content, indexes, prompt
+# and encoded responses), measured on the built-in knowledge base; the semantic
+# index matrix is counted separately
+MEMORY_PER_CONTENT_BYTE = 25
+
+
+class Tenant:
+    """One tenant's live knowledge and its own answer cache partition"""
+
+    def __init__(self, tenant_id, knowledge_base, answer_cache):
+        self.id = tenant_id
+        self.knowledge_base = knowledge_base
+        self.answer_cache = answer_cache
+        self.requests = 0
+        self.loaded_at = time.time()
+        self._watcher = None
+        answer_cache.set_version(knowledge_base.current.version)
+        knowledge_base.on_swap(lambda snapshot: answer_cache.set_version(snapshot.version))
+
+    @property
+    def knowledge(self):
+        """The tenant's current knowledge snapshot"""
+        return self.knowledge_base.current
+
+    def memory_estimate(self):
+        knowledge = self.knowledge
+        estimate = knowledge.content_bytes * MEMORY_PER_CONTENT_BYTE
+        if knowledge.semantic_index is not None:
+            estimate += knowledge.semantic_index.nbytes
+        return estimate
+
+    def start_watching(self):
+        if self.knowledge_base.path is not None and self._watcher is None:
+            self._watcher = asyncio.create_task(self.knowledge_base.watch())
+
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+
+    def stats(self):
+        """Return the tenant's knowledge and cache counters"""
+        return {
+            "requests": self.requests,
+            "loaded_at": self.loaded_at,
+            "memory_estimate": self.memory_estimate(),
+            "knowledge": self.knowledge_base.stats(),
+            "answer_cache": self.answer_cache.stats(),
+        }
+
+
+class TenantRegistry:
+    """Resolves tenant ids to tenants, loading them lazily and evicting cold ones
+
+    Each tenant is a directory (one file per knowledge section) or a single
+    JSON/YAML file named after it under root. Sections a tenant leaves out are
+    empty, never the default tenant's. It is loaded, in a thread, on its
+    first request; concurrent first requests share the load. Loaded tenants are
+    kept in last-used order and the coldest are dropped, with their indexes,
+    prompt, static responses and answer cache, once the estimated memory of all
+    loaded tenants exceeds memory_budget or there are more than max_tenants.
+    The default tenant is always loaded and never evicted.
+    """
+
+    def __init__(self, default, root=None, memory_budget=256 * 1024 * 1024, max_tenants=1000,
+                 cache_size=256, cache_ttl=3600.0, poll_interval=2.0):
+        self.default = default
+        self.root = Path(root) if root else None
+        self.memory_budget = memory_budget
+        self.max_tenants = max_tenants
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.poll_interval = poll_interval
+        self._tenants = OrderedDict()
+        self._loading = {}
+        self.loads = 0
+        self.load_failures = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls, default):
+        """Build from CHATBOT_TENANTS_PATH (unset: single tenant), CHATBOT_TENANT_MEMORY_BUDGET_MB,
+        CHATBOT_MAX_TENANTS and CHATBOT_TENANT_CACHE_SIZE"""
+        return cls(
+            default,
+            root=os.getenv("CHATBOT_TENANTS_PATH") or None,
+            memory_budget=int(os.getenv("CHATBOT_TENANT_MEMORY_BUDGET_MB", "256")) * 1024 * 1024,
+            max_tenants=int(os.getenv("CHATBOT_MAX_TENANTS", "1000")),
+            cache_size=int(os.getenv("CHATBOT_TENANT_CACHE_SIZE", "256")),
+            cache_ttl=float(os.getenv("CHATBOT_CACHE_TTL", "3600")),
+            poll_interval=float(os.getenv("CHATBOT_KNOWLEDGE_POLL_INTERVAL", "2")),
+        )
+
+    @property
+    def enabled(self):
+        return self.root is not None
+
+    def _source(self, tenant_id):
+        directory = self.root / tenant_id
+        if directory.is_dir():
+            return directory
+        for suffix in FILE_SUFFIXES:
+            path = self.root / f"{tenant_id}{suffix}"
+            if path.is_file():
+                return path
+        return None
+
+    def memory_estimate(self):
+        """Estimated bytes held by the loaded (non-default) tenants"""
+        return sum(tenant.memory_estimate() for tenant in self._tenants.values())
+
+    async def get(self, tenant_id):
+        """Return the tenant for an id (the default tenant when None), or None if there is no such tenant"""
+        if not tenant_id or tenant_id == DEFAULT_TENANT:
+            return self.default
+        tenant_id = tenant_id.lower()
+        if not self.enabled or not TENANT_ID_PATTERN.match(tenant_id):
+            return None
+
+        tenant = self._tenants.get(tenant_id)
+        if tenant is not None:
+            self._tenants.move_to_end(tenant_id)
+            return tenant
+
+        loading = self._loading.get(tenant_id)
+        if loading is None:
+            source = self._source(tenant_id)
+            if source is None:
+                return None
+            loading = asyncio.create_task(self._load(tenant_id, source))
+            self._loading[tenant_id] = loading
+        # Shielded so one caller going away does not abort the load for the others
+        return await asyncio.shield(loading)
+
+    async def _load(self, tenant_id, source):
+        try:
+            knowledge_base = await asyncio.to_thread(
+                KnowledgeBase, EMPTY_KNOWLEDGE, source, self.poll_interval
+            )
+        except Exception as e:
+            self.load_failures += 1
+            logger.error("Loading tenant %s failed: %s", tenant_id, e)
+            raise
+        finally:
+            self._loading.pop(tenant_id, None)
+
+        tenant = Tenant(tenant_id, knowledge_base, AnswerCache(self.cache_size, self.cache_ttl, self.default.answer_cache.backend))
+        tenant.start_watching()
+        self._tenants[tenant_id] = tenant
+        self.loads += 1
+        self._evict()
+        return tenant
+
+    def _evict(self):
+        # The tenant just loaded is last in line and stays even if it alone is over budget
+        while len(self._tenants) > 1 and (
+            len(self._tenants) > self.max_tenants or self.memory_estimate() > self.memory_budget
+        ):
+            tenant_id, tenant = self._tenants.popitem(last=False)
+            tenant.stop_watching()
+            self.evictions += 1
+            logger.info("Evicted tenant %s", tenant_id)
+
+    def close(self):
+        """Stop every tenant's file watcher"""
+        self.default.stop_watching()
+        for tenant in self._tenants.values():
+            tenant.stop_watching()
+
+    def stats(self):
+        """Return registry counters and each loaded tenant's stats, coldest first"""
+        return {
+            "enabled": self.enabled,
+            "loaded": len(self._tenants),
+            "max_tenants": self.max_tenants,
+            "memory_estimate": self.memory_estimate(),
+            "memory_budget": self.memory_budget,
+            "loads": self.loads,
+            "load_failures": self.load_failures,
+            "evictions": self.evictions,
+            "tenants": {
+                DEFAULT_TENANT: self.default.stats(),
+                **{tenant_id: tenant.stats() for tenant_id, tenant in self._tenants.items()},
+            },
+        }
+
+
+class TenantPathMiddleware:
+    """Serves /t/{tenant}/<route> as <route> with the tenant header set
+
+    Lets clients that cannot send custom headers (or CDNs caching by URL)
+    select a tenant through the path instead.
+    """
+
+    def __init__(self, app, header="x-tenant-id"):
+        self.app = app
+        self.header = header.lower().encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(TENANT_PATH_PREFIX):
+            tenant_id, _, rest = scope["path"][len(TENANT_PATH_PREFIX):].partition("/")
+            path = "/" + rest
+            headers = [(name, value) for name, value in scope["headers"] if name != self.header]
+            headers.append((self.header, tenant_id.encode("utf-8")))
+            scope = dict(scope, path=path, raw_path=path.encode("utf-8"), headers=headers)
+        await self.app(scope, receive, send)
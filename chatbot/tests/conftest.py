@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The chatbot modules import each other by bare name, as they do when run from chatbot/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,36 @@
+import pytest
+
+from admission import AdmissionRejected, RateLimiter
+
+
+def test_new_user_ids_do_not_escape_the_address_bucket():
+    limiter = RateLimiter(rate=0.001, burst=3)
+    for user in range(3):
+        limiter.check("address:10.0.0.1", f"user:{user}")
+    with pytest.raises(AdmissionRejected) as rejected:
+        limiter.check("address:10.0.0.1", "user:fresh")
+    assert rejected.value.status_code == 429
+
+
+def test_refused_request_charges_no_bucket():
+    limiter = RateLimiter(rate=0.001, burst=1)
+    limiter.check("user:a")
+    with pytest.raises(AdmissionRejected):
+        limiter.check("address:10.0.0.1", "user:a")
+    limiter.check("address:10.0.0.1", "user:b")
+
+
+def test_batch_is_charged_per_item():
+    limiter = RateLimiter(rate=0.001, burst=10)
+    limiter.charge({"address:10.0.0.1": 4, "user:a": 4})
+    limiter.check("address:10.0.0.1", "user:b", amount=6)
+    with pytest.raises(AdmissionRejected):
+        limiter.check("address:10.0.0.1", "user:c")
+
+
+def test_batch_larger_than_burst_runs_on_a_full_bucket_and_leaves_debt():
+    limiter = RateLimiter(rate=1, burst=10)
+    limiter.check("address:10.0.0.1", amount=100)
+    with pytest.raises(AdmissionRejected) as rejected:
+        limiter.check("address:10.0.0.1")
+    assert rejected.value.retry_after >= 90
@@ -0,0 +1,28 @@
+import asyncio
+from types import SimpleNamespace
+
+from conversation_memory import ConversationMemory
+
+
+class RecordingClient:
+    def __init__(self):
+        self.calls = []
+
+    async def complete(self, messages, **kwargs):
+        self.calls.append(messages)
+        message = SimpleNamespace(content="The customer runs a bakery.")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def test_summary_is_written_on_behalf_of_the_tenant_company():
+    client = RecordingClient()
+    memory = ConversationMemory(client, token_budget=60)
+    history = [
+        {"role": "user" if turn % 2 == 0 else "assistant", "content": f"turn {turn} " + "word " * 20}
+        for turn in range(6)
+    ]
+
+    messages = asyncio.run(memory.compact(history, "conversation", "Acme Plumbing"))
+
+    assert "the Acme Plumbing assistant" in client.calls[0][0]["content"]
+    assert messages[0]["content"].endswith("The customer runs a bakery.")
@@ -0,0 +1,48 @@
+import asyncio
+from profiling import ProfilingMiddleware, SlowRequestLog, StackSampler, collapse
+
+
+def test_profile_session_collects_stack_lines():
+    async def run():
+        sampler = StackSampler(interval=0.005)
+        sampler.start()
+        try:
+            return await sampler.profile(0.2)
+        finally:
+            sampler.stop()
+
+    session = asyncio.run(run())
+    lines = collapse(session.samples).splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert "profiling.py:" in stack or "base_events.py:" in stack
+
+
+def test_label_falls_back_to_the_function_name_without_qualname():
+    class OldCode:
+        # Code objects before Python 3.11 have no co_qualname
+        co_filename = "/srv/chatbot/main.py"
+        co_name = "chat"
+
+    code = OldCode()
+    assert StackSampler()._label(code) == "main.py:chat"
+
+
+def test_tenant_admin_requests_are_not_logged_as_slow():
+    async def app(scope, receive, send):
+        await asyncio.sleep(0.02)
+        await send({"type": "http.response.start", "status": 200})
+
+    async def send(message):
+        pass
+
+    async def run():
+        slow_requests = SlowRequestLog(threshold_ms=1)
+        middleware = ProfilingMiddleware(app, StackSampler(), slow_requests)
+        for path in ("/t/acme/admin/profile", "/admin/profile", "/t/acme/chat"):
+            await middleware({"type": "http", "method": "GET", "path": path}, None, send)
+        return slow_requests
+
+    slow_requests = asyncio.run(run())
+    assert [entry["path"] for entry in slow_requests.summaries()] == ["/t/acme/chat"]
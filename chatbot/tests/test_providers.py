@@ -0,0 +1,31 @@
+import asyncio
+from types import SimpleNamespace
+
+from providers import Backend, CircuitBreaker, ProviderPool
+
+
+def backend(name):
+    return Backend(name, SimpleNamespace(name=name), CircuitBreaker())
+
+
+def test_attempt_finishing_after_the_winner_is_discarded():
+    primary, secondary = backend("primary"), backend("secondary")
+    pool = ProviderPool([primary, secondary], hedge_initial_delay=0.01)
+    discarded = []
+
+    async def call(backend):
+        if backend is secondary:
+            return "secondary result"
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            # Its response arrived as it was being cancelled
+            return "primary result"
+
+    async def discard(result):
+        discarded.append(result)
+
+    winner, result = asyncio.run(pool._race("complete", call, discard))
+
+    assert (winner, result) == (secondary, "secondary result")
+    assert discarded == ["primary result"]
@@ -0,0 +1,39 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from knowledge_base import KnowledgeSnapshot
+from website_knowledge import get_website_knowledge
+
+
+@pytest.fixture
+def snapshot(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHATBOT_SEMANTIC_INDEX_DIR", str(tmp_path))
+    return KnowledgeSnapshot.build(get_website_knowledge())
+
+
+def test_paraphrase_without_shared_words_ranks_next_to_the_lexical_match(snapshot):
+    # The README example: "pricing plans" shares no words with the question
+    results = snapshot.search_faq("How much does it cost")
+    assert [result["question"] for result in results[:2]] == [
+        "Are there any setup fees?",
+        "What are your pricing plans?",
+    ]
+
+
+def test_new_content_version_replaces_the_matrix_file(snapshot, tmp_path):
+    knowledge = dict(get_website_knowledge())
+    knowledge["faq"] = [
+        {**category, "questions": [dict(entry) for entry in category["questions"]]} for category in knowledge["faq"]
+    ]
+    knowledge["faq"][0]["questions"][0]["answer"] += " Updated."
+    updated = KnowledgeSnapshot.build(knowledge, snapshot)
+
+    assert list(tmp_path.glob("*.npy")) == [updated.semantic_index.path]
+
+
+def test_description_finds_a_service_by_similarity_alone(snapshot):
+    # The search_services docstring example: no service name is close to it
+    match = snapshot.get_service_info("score incoming prospects")
+    assert match["service"]["name"] == "Lead Qualification"
+    assert snapshot.search_services("score incoming prospects")[0]["semantic"]
@@ -0,0 +1,38 @@
+import gzip
+
+import pytest
+from starlette.datastructures import Headers
+
+from static_responses import StaticResponses
+from website_knowledge import get_website_knowledge
+
+
+class FakeRequest:
+    def __init__(self, **headers):
+        self.headers = Headers({name.replace("_", "-"): value for name, value in headers.items()})
+
+
+@pytest.fixture
+def responses():
+    return StaticResponses(get_website_knowledge(), "test")
+
+
+def test_brotli_variant_for_accept_encoding_br(responses):
+    brotli = pytest.importorskip("brotli")
+    response = responses.respond("pricing", FakeRequest(accept_encoding="gzip, deflate, br"))
+
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["etag"].endswith('-br"')
+    assert brotli.decompress(response.body) == responses.responses["pricing"].body
+
+    revalidated = responses.respond(
+        "pricing", FakeRequest(accept_encoding="br", if_none_match=response.headers["etag"])
+    )
+    assert revalidated.status_code == 304
+
+
+def test_gzip_variant_when_br_is_not_accepted(responses):
+    response = responses.respond("pricing", FakeRequest(accept_encoding="gzip, br;q=0"))
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(response.body) == responses.responses["pricing"].body
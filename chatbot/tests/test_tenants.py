@@ -0,0 +1,44 @@
+import asyncio
+import json
+
+import pytest
+
+from answer_cache import AnswerCache
+from knowledge_base import KnowledgeBase
+from tenants import Tenant, TenantRegistry
+from website_knowledge import get_website_knowledge
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHATBOT_SEMANTIC_SEARCH", "0")
+    default = Tenant("default", KnowledgeBase(get_website_knowledge()), AnswerCache(16, 60))
+    return TenantRegistry(default, root=tmp_path)
+
+
+def load(registry, tenant_id):
+    async def run():
+        tenant = await registry.get(tenant_id)
+        if tenant is not None and tenant._watcher is not None:
+            tenant._watcher.cancel()
+        return tenant
+
+    return asyncio.run(run())
+
+
+def test_tenant_speaks_for_its_own_company_and_not_the_default(registry, tmp_path):
+    (tmp_path / "acme.json").write_text(json.dumps({"website_info": {"name": "Acme Plumbing"}}))
+    knowledge = load(registry, "acme").knowledge
+
+    prompt = knowledge.system_prompt.text
+    assert "You are the assistant for Acme Plumbing." in prompt
+    assert "Remember: You are representing Acme Plumbing" in prompt
+    assert "ReadyReserve" not in prompt
+    assert knowledge.knowledge["contact_info"] == {}
+    assert knowledge.knowledge["pricing"] == {}
+
+
+def test_tenant_without_a_company_name_fails_to_load(registry, tmp_path):
+    (tmp_path / "nameless.json").write_text(json.dumps({"faq": []}))
+    with pytest.raises(ValueError):
+        load(registry, "nameless")
@@ -0,0 +1,20 @@
+"""
+Token Counting for ReadyReserve AI Chatbot
+Cheap, dependency-free token estimates used for prompt budgeting
+"""
+
+# English text averages about four characters per token for GPT tokenizers
+CHARS_PER_TOKEN = 4
+
+# Role and separator tokens added by the chat format for each message
+MESSAGE_OVERHEAD = 4
+
+
+def count_tokens(text):
+    """Estimate the number of tokens in a piece of text"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def count_message_tokens(messages):
+    """Estimate the number of prompt tokens for a list of chat messages"""
+    return sum(MESSAGE_OVERHEAD + count_tokens(message["content"]) for message in messages)
@@ -3,6 +3,9 @@ Website Knowledge Base for ReadyReserve AI Chatbot
 Contains comprehensive information about the website, services, and FAQ
 """
 
+import hashlib
+import json
+
 # Website Information
 WEBSITE_INFO = {
     "name": "ReadyReserve AI",
@@ -363,33 +366,8 @@ def get_website_knowledge():
         "social_media": SOCIAL_MEDIA
     }
 
-def search_faq(question, category=None):
-    """Search FAQ for relevant answers"""
-    results = []
-    question_lower = question.lower()
-    
-    for faq_category in FAQ_DATA:
-        if category and faq_category["category"].lower() != category.lower():
-            continue
-            
-        for faq_item in faq_category["questions"]:
-            if (question_lower in faq_item["question"].lower() or 
-                question_lower in faq_item["answer"].lower()):
-                results.append({
-                    "category": faq_category["category"],
-                    "question": faq_item["question"],
-                    "answer": faq_item["answer"]
-                })
-    
-    return results
-
-def get_service_info(service_name):
-    """Get detailed information about a specific service"""
-    for category, data in SERVICE_CATEGORIES.items():
-        for service in data["services"]:
-            if service_name.lower() in service["name"].lower():
-                return {
-                    "category": data["name"],
-                    "service": service
-                }
-    return None
+def get_knowledge_version(knowledge=None):
+    """Return a stable content hash identifying a version of the website knowledge"""
+    knowledge = knowledge if knowledge is not None else get_website_knowledge()
+    canonical = json.dumps(knowledge, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
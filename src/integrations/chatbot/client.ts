@@ -9,12 +9,21 @@ export interface ChatMessage {
 export interface ChatRequest {
   messages: ChatMessage[];
   user_id?: string;
+  // When set, messages holds only the new turn; the service keeps the history
+  session_id?: string;
 }
 
 export interface ChatResponse {
   content: string;
   sources?: string[];
   faq_matches?: FAQMatch[];
+  llm_bypassed?: boolean;
+  session_id?: string;
+}
+
+export interface SessionResponse {
+  session_id: string;
+  messages: number;
 }
 
 export interface FAQMatch {
@@ -80,6 +89,21 @@ class ChatbotClient {
     });
   }
 
+  // Start a server-side session, optionally seeded with existing history
+  async createSession(messages: ChatMessage[] = [], userId?: string): Promise<SessionResponse> {
+    return this.request<SessionResponse>('/sessions', {
+      method: 'POST',
+      body: JSON.stringify({ messages, user_id: userId }),
+    });
+  }
+
+  // End a server-side session
+  async deleteSession(sessionId: string): Promise<{ session_id: string; deleted: boolean }> {
+    return this.request<{ session_id: string; deleted: boolean }>(`/sessions/${sessionId}`, {
+      method: 'DELETE',
+    });
+  }
+
   // FAQ search
   async searchFAQ(request: FAQSearchRequest): Promise<FAQSearchResponse> {
     return this.request<FAQSearchResponse>('/search-faq', {
@@ -108,6 +108,7 @@ export type Database = {
       automation_usage: {
         Row: {
           automation_id: string | null
+          chat_counter: boolean
           created_at: string | null
           id: string
           month: string
@@ -116,6 +117,7 @@ export type Database = {
         }
         Insert: {
           automation_id?: string | null
+          chat_counter?: boolean
           created_at?: string | null
           id?: string
           month: string
@@ -124,6 +126,7 @@ export type Database = {
         }
         Update: {
           automation_id?: string | null
+          chat_counter?: boolean
           created_at?: string | null
           id?: string
           month?: string
@@ -325,6 +328,10 @@ export type Database = {
         }
         Returns: boolean
       }
+      increment_chat_usage: {
+        Args: { _usage: Json }
+        Returns: undefined
+      }
     }
     Enums: {
       app_role: "admin" | "user"
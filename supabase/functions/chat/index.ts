@@ -5,27 +5,71 @@ const corsHeaders = {
   "Access-Control-Allow-Headers": "authorization, x-client-info, apikey, content-type",
 };
 
+// The visitor's address: the last X-Forwarded-For entry, added by the platform's proxy.
+// Earlier entries come from the client and can be forged.
+const clientIp = (req: Request) => {
+  const hop = (req.headers.get("x-forwarded-for") ?? "").split(",").pop()?.trim() ?? "";
+  return /^[0-9A-Fa-f:.]{2,45}$/.test(hop) ? hop : "";
+};
+
 serve(async (req) => {
   if (req.method === "OPTIONS") return new Response(null, { headers: corsHeaders });
 
   try {
-    const { messages } = await req.json();
+    // With a session_id, messages holds only the new turn; the chatbot service keeps the history
+    const { messages, session_id } = await req.json();
     
     // Get chatbot service URL from environment or use default
     const CHATBOT_SERVICE_URL = Deno.env.get("CHATBOT_SERVICE_URL") || "http://localhost:8001";
     
+    const headers = {
+      "Content-Type": "application/json",
+      // Lets the service rate-limit per visitor (CHATBOT_TRUST_FORWARDED_FOR=1)
+      "X-Forwarded-For": clientIp(req),
+    };
+
+    // Without a session_id (first turn, or the old session expired) start a session
+    // seeded with the earlier history, so later turns only carry the new message
+    let sessionId = session_id;
+    let turn = messages;
+    if (!sessionId) {
+      const created = await fetch(`${CHATBOT_SERVICE_URL}/sessions`, {
+        method: "POST",
+        headers,
+        body: JSON.stringify({ messages: messages.slice(0, -1), user_id: "supabase_user" }),
+      });
+      if (created.ok) {
+        sessionId = (await created.json()).session_id;
+        turn = messages.slice(-1);
+      }
+    }
+
     // Forward request to Python chatbot service
     const response = await fetch(`${CHATBOT_SERVICE_URL}/chat`, {
       method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-      },
+      headers,
       body: JSON.stringify({
-        messages: messages,
-        user_id: "supabase_user"
+        messages: turn,
+        user_id: "supabase_user",
+        session_id: sessionId
       }),
     });
 
+    if (response.status === 404 && sessionId) {
+      return new Response(JSON.stringify({ error: "Session not found or expired" }), {
+        status: 404,
+        headers: { ...corsHeaders, "Content-Type": "application/json" },
+      });
+    }
+
+    if (response.status === 429 || response.status === 503) {
+      const retryAfter = response.headers.get("Retry-After") ?? "1";
+      return new Response(JSON.stringify({ error: "Chatbot is busy, please retry shortly" }), {
+        status: response.status,
+        headers: { ...corsHeaders, "Content-Type": "application/json", "Retry-After": retryAfter },
+      });
+    }
+
     if (!response.ok) {
       console.error("Chatbot service error:", response.status);
       return new Response(JSON.stringify({ error: "Chatbot service unavailable" }), {
@@ -40,7 +84,8 @@ serve(async (req) => {
     return new Response(JSON.stringify({ 
       content: chatbotResponse.content,
       sources: chatbotResponse.sources,
-      faq_matches: chatbotResponse.faq_matches
+      faq_matches: chatbotResponse.faq_matches,
+      session_id: chatbotResponse.session_id
     }), {
       headers: { ...corsHeaders, "Content-Type": "application/json" },
     });
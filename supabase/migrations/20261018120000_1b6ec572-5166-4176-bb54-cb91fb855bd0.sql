@@ -0,0 +1,30 @@
+-- One chat usage counter per user and month, incremented by the chatbot's analytics writer
+
+-- Existing rows are left as they are; only rows marked chat_counter are unique per
+-- user and month, so the index cannot conflict with rows written by anything else
+ALTER TABLE public.automation_usage
+  ADD COLUMN chat_counter BOOLEAN NOT NULL DEFAULT false;
+
+CREATE UNIQUE INDEX automation_usage_chat_user_month
+  ON public.automation_usage (user_id, month)
+  WHERE chat_counter;
+
+-- Add each {user_id, month, tasks_count} item to that user's counter for the month
+CREATE OR REPLACE FUNCTION public.increment_chat_usage(_usage JSONB)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = ''
+AS $$
+BEGIN
+  INSERT INTO public.automation_usage (user_id, month, tasks_count, chat_counter)
+  SELECT (item->>'user_id')::UUID, item->>'month', (item->>'tasks_count')::INTEGER, true
+  FROM jsonb_array_elements(_usage) AS item
+  ON CONFLICT (user_id, month) WHERE chat_counter
+  DO UPDATE SET tasks_count = COALESCE(public.automation_usage.tasks_count, 0) + EXCLUDED.tasks_count;
+END;
+$$;
+
+-- Only the service role (the chatbot service) may count usage
+REVOKE EXECUTE ON FUNCTION public.increment_chat_usage(JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.increment_chat_usage(JSONB) TO service_role;